@@ -0,0 +1,51 @@
+import argparse
+import json
+import subprocess
+import sys
+
+# Modules a scoring process imports before it knows which model it will load, and the libraries they must not
+# pull in by themselves
+MODULES = ['src.models.models', 'src.models.ensemble', 'src.models.registry', 'src.utils.eval']
+HEAVY_MODULES = ['xgboost', 'lightgbm', 'statsmodels', 'sklearn', 'optbinning']
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{'seconds': seconds, 'heavy': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module, repeat=3):
+    # A fresh interpreter per run (nothing cached in sys.modules); the best of the runs is reported
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', PROBE.format(module=module, heavy=HEAVY_MODULES)],
+                             capture_output=True, text=True, check=True)
+        runs.append(json.loads(out.stdout))
+
+    return {'seconds': min(irun['seconds'] for irun in runs), 'heavy': runs[0]['heavy']}
+
+
+def run(modules, budget, repeat):
+    ok = True
+    for imodule in modules:
+        ires = measure(imodule, repeat=repeat)
+        ipassed = ires['seconds'] <= budget and not ires['heavy']
+        ok &= ipassed
+
+        heavy = f" imports {', '.join(ires['heavy'])}" if ires['heavy'] else ''
+        print(f"{'ok  ' if ipassed else 'FAIL'} {imodule:<24s} {ires['seconds']:6.3f}s{heavy}")
+
+    return ok
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Import-time budget for the model modules")
+    parser.add_argument('--modules', nargs='+', default=MODULES)
+    parser.add_argument('--budget', type=float, default=0.3, help="seconds per module")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    sys.exit(0 if run(args.modules, args.budget, args.repeat) else 1)
@@ -0,0 +1,238 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from src.benchmarks.synthetic import write_synthetic_csv
+from src.data.transforms import simple_transform
+from src.data.transforms.null_transform import null_transform
+from src.data.utils import get_xy, read_df
+from src.models.ensemble import Ensemble
+from src.models.fit import kfold_fit
+from src.models.registry import get_model_class
+from src.utils.eval import eval_auc
+
+TRANSFORMS = {
+    'null_transform': null_transform,
+    'drop_correlated_vars_impute_transform': simple_transform.drop_correlated_vars_impute_transform,
+    'log_balance_vars_transform': simple_transform.log_balance_vars_transform,
+    'log_almost_all_vars_transform': simple_transform.log_almost_all_vars_transform,
+    'log_almost_all_vars_transform_v2': simple_transform.log_almost_all_vars_transform_v2,
+    'log_almost_all_vars_transform_v3': simple_transform.log_almost_all_vars_transform_v3,
+}
+
+
+def measure(fn, *args, repeat=3, memory=True):
+    # Best wall time of `repeat` runs, then one more run under tracemalloc for the peak of Python and numpy
+    # allocations (work done in child processes or inside native libraries' own allocators is not seen)
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        res = fn(*args)
+        seconds.append(time.perf_counter() - start)
+
+    out = {'seconds': min(seconds), 'seconds_all': seconds}
+
+    if memory:
+        tracemalloc.start()
+        try:
+            fn(*args)
+            out['peak_mb'] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally:
+            tracemalloc.stop()
+
+    return out, res
+
+
+class Suite(object):
+    def __init__(self, repeat=3, memory=True, only=None):
+        self.repeat = repeat
+        self.memory = memory
+        self.only = only
+        self.results = {}
+
+    def selected(self, name):
+        return not self.only or any(name.startswith(iprefix) for iprefix in self.only)
+
+    def bench(self, name, fn, *args, rows=None):
+        # Cases that are filtered out still run once when a later case needs their result
+        if not self.selected(name):
+            return fn(*args)
+
+        res, value = measure(fn, *args, repeat=self.repeat, memory=self.memory)
+        res['rows'] = rows
+        self.results[name] = res
+
+        peak = f" peak={res['peak_mb']:9.1f}MB" if 'peak_mb' in res else ''
+        print(f"{name:<56s} {res['seconds']:9.4f}s{peak}")
+
+        return value
+
+
+def _fit(model_class, X, y):
+    model = model_class()
+    model.fit(X, y)
+
+    return model
+
+
+def _woe_fit(transform_class, df):
+    transform = transform_class()
+    transform.woe_fit(df, n_jobs=1)
+
+    return transform
+
+
+def run_suite(rows=150_000, seed=0, repeat=3, memory=True, only=None, n_splits=3, workdir=None):
+    # optbinning (and its solvers) is only needed to run the suite, not to compare results
+    from src.data.transforms.woe_transform import WoETransform, WoETransformV2
+
+    suite = Suite(repeat=repeat, memory=memory, only=only)
+
+    with tempfile.TemporaryDirectory(dir=workdir) as tmpdir:
+        csv_path = write_synthetic_csv(os.path.join(tmpdir, 'synthetic.csv'), rows, seed=seed)
+
+        suite.bench('read_df/csv', lambda: read_df(csv_path, cache=False), rows=rows)
+        read_df(csv_path)  # Populates the columnar cache
+        df = suite.bench('read_df/cached', lambda: read_df(csv_path), rows=rows)
+        df = df.copy()
+
+        for iname, itransform in TRANSFORMS.items():
+            suite.bench(f"transform/{iname}", itransform, df, rows=rows)
+
+        woe_transforms = {}
+        for itransform_class in (WoETransform, WoETransformV2):
+            iname = itransform_class.__name__
+            woe_transforms[iname] = suite.bench(f"transform/{iname}/fit", _woe_fit, itransform_class, df, rows=rows)
+            suite.bench(f"transform/{iname}", woe_transforms[iname], df, rows=rows)
+
+        # Each model on the inputs it is used with in the notebooks
+        model_inputs = {
+            'StatsModelsLogisticRegression': woe_transforms['WoETransformV2'],
+            'XGBoostClassifier': null_transform,
+            'LightGBMClassifier': null_transform,
+        }
+
+        ensemble = Ensemble()
+        for iname, itransform in model_inputs.items():
+            X, y = get_xy(itransform(df)[0])
+            imodel = suite.bench(f"fit/{iname}", _fit, get_model_class(iname), X, y, rows=rows)
+            suite.bench(f"predict/{iname}", imodel.predict, X, rows=rows)
+            ensemble.add_model(imodel, transform=itransform)
+
+        X, y = get_xy(df)
+        suite.bench('ensemble/predict', ensemble.predict, X, rows=rows)
+        suite.bench('eval_auc', eval_auc, ensemble, X, y, rows=rows)
+
+        null_df = null_transform(df)[0]
+        suite.bench(f"kfold_fit/XGBoostClassifier/k={n_splits}", kfold_fit, null_df, n_splits,
+                    get_model_class('XGBoostClassifier'), None, 1, rows=rows)
+
+    return {
+        'meta': {
+            'rows': rows,
+            'seed': seed,
+            'repeat': repeat,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+        },
+        'results': suite.results,
+    }
+
+
+def compare(baseline, current, tolerance=0.15, memory_tolerance=0.15, min_seconds=0.005):
+    # A case regresses when it is slower (or peaks higher) than the baseline by more than the tolerance; changes
+    # of less than min_seconds are timer noise on the fast cases
+    regressions = []
+
+    for iname, icur in current['results'].items():
+        ibase = baseline['results'].get(iname)
+        if ibase is None:
+            print(f"{iname:<56s} {'new':>9s}")
+            continue
+
+        iratio = icur['seconds'] / ibase['seconds'] if ibase['seconds'] > 0 else np.inf
+        islower = iratio > 1 + tolerance and icur['seconds'] - ibase['seconds'] > min_seconds
+
+        imem = ''
+        iheavier = False
+        if 'peak_mb' in icur and 'peak_mb' in ibase:
+            imem_ratio = icur['peak_mb'] / ibase['peak_mb'] if ibase['peak_mb'] > 0 else np.inf
+            iheavier = imem_ratio > 1 + memory_tolerance and icur['peak_mb'] - ibase['peak_mb'] > 1
+            imem = f" memory x{imem_ratio:5.2f}"
+
+        if islower or iheavier:
+            regressions.append(iname)
+
+        print(f"{iname:<56s} {ibase['seconds']:9.4f}s -> {icur['seconds']:9.4f}s x{iratio:5.2f}{imem}"
+              f"{'  REGRESSION' if islower or iheavier else ''}")
+
+    for iname in baseline['results']:
+        if iname not in current['results']:
+            print(f"{iname:<56s} {'missing':>9s}")
+
+    return regressions
+
+
+def save_results(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=1)
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Timing and peak-memory benchmarks on synthetic data")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run')
+    run_parser.add_argument('--rows', type=int, default=150_000)
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--repeat', type=int, default=3)
+    run_parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc run")
+    run_parser.add_argument('--only', nargs='+', default=None, help="case name prefixes, e.g. fit/ transform/")
+    run_parser.add_argument('--n-splits', type=int, default=3)
+    run_parser.add_argument('--workdir', default=None, help="where the synthetic CSV is written")
+    run_parser.add_argument('--out', default=None, help="results JSON")
+
+    compare_parser = subparsers.add_parser('compare')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--tolerance', type=float, default=0.15)
+    compare_parser.add_argument('--memory-tolerance', type=float, default=0.15)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        results = run_suite(rows=args.rows, seed=args.seed, repeat=args.repeat, memory=not args.no_memory,
+                            only=args.only, n_splits=args.n_splits, workdir=args.workdir)
+        if args.out is not None:
+            save_results(results, args.out)
+            print(f"Saved to {args.out}")
+
+        return 0
+
+    regressions = compare(load_results(args.baseline), load_results(args.current), tolerance=args.tolerance,
+                          memory_tolerance=args.memory_tolerance)
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+
+from src.data.utils import RAW_COLUMNS
+
+# Rates observed on the 150k-row training set
+POSITIVE_RATE = 0.0668
+MONTHLY_INCOME_NA_RATE = 0.1982
+NUMBER_OF_DEPENDENTS_NA_RATE = 0.0262
+
+
+def make_synthetic_df(n_rows, seed=0, start_id=1):
+    rng = np.random.default_rng(seed)
+
+    # Latent credit risk drives both the features and the label so the models have some signal to find
+    risk = rng.standard_normal(n_rows)
+
+    age = np.clip(np.round(52 - 6 * risk + 14 * rng.standard_normal(n_rows)), 21, 103).astype(np.int64)
+
+    utilization = np.exp(-1.6 + 0.9 * risk + 0.8 * rng.standard_normal(n_rows))
+    utilization[rng.random(n_rows) < 0.002] *= 1000  # A few wild outliers as in the real data
+
+    debt_ratio = np.exp(-1.0 + 0.3 * risk + 0.7 * rng.standard_normal(n_rows))
+    debt_ratio[rng.random(n_rows) < 0.15] *= 2000  # Debt amounts reported without an income
+
+    monthly_income = np.round(np.exp(8.6 - 0.15 * risk + 0.6 * rng.standard_normal(n_rows)))
+
+    late_rate = np.exp(-2.5 + 1.1 * risk)
+    past_due_30_59 = rng.poisson(late_rate)
+    past_due_60_89 = rng.poisson(late_rate / 3)
+    past_due_90 = rng.poisson(late_rate / 2.5)
+
+    # Sentinel codes 96/98 reported by the bureau
+    sentinel = rng.random(n_rows) < 0.0018
+    past_due_30_59[sentinel] = 98
+    past_due_60_89[sentinel] = 98
+    past_due_90[sentinel] = 98
+
+    open_lines = rng.poisson(np.exp(2.1 - 0.1 * risk))
+    real_estate = rng.poisson(np.exp(-0.05 - 0.1 * risk))
+    dependents = rng.poisson(0.75, n_rows).astype(np.float64)
+
+    # Intercept solved numerically so that E[sigmoid(intercept + 1.5 * risk)] == POSITIVE_RATE
+    logits = -3.484 + 1.5 * risk
+    y = (rng.random(n_rows) < 1 / (1 + np.exp(-logits))).astype(np.int64)
+
+    monthly_income[rng.random(n_rows) < MONTHLY_INCOME_NA_RATE] = np.nan
+    dependents[rng.random(n_rows) < NUMBER_OF_DEPENDENTS_NA_RATE] = np.nan
+
+    df = pd.DataFrame({
+        'id': np.arange(start_id, start_id + n_rows, dtype=np.int64),
+        'SeriousDlqin2yrs': y,
+        'RevolvingUtilizationOfUnsecuredLines': utilization,
+        'age': age,
+        'NumberOfTime30-59DaysPastDueNotWorse': past_due_30_59,
+        'DebtRatio': debt_ratio,
+        'MonthlyIncome': monthly_income,
+        'NumberOfOpenCreditLinesAndLoans': open_lines,
+        'NumberOfTimes90DaysLate': past_due_90,
+        'NumberRealEstateLoansOrLines': real_estate,
+        'NumberOfTime60-89DaysPastDueNotWorse': past_due_60_89,
+        'NumberOfDependents': dependents,
+    }, columns=RAW_COLUMNS)
+
+    return df
+
+
+def iter_synthetic_chunks(n_rows, seed=0, chunk_rows=1_000_000):
+    # Each chunk has its own stream, so any size is generated in bounded memory and a prefix of a large file
+    # is the same whatever its total size
+    for ichunk, istart in enumerate(range(0, n_rows, chunk_rows)):
+        yield make_synthetic_df(min(chunk_rows, n_rows - istart), seed=(seed, ichunk), start_id=istart + 1)
+
+
+def write_synthetic_csv(path, n_rows, seed=0, chunk_rows=1_000_000):
+    # Same layout as cs-training.csv: an unnamed leading id column that read_df renames to 'id'
+    for ichunk, idf in enumerate(iter_synthetic_chunks(n_rows, seed=seed, chunk_rows=chunk_rows)):
+        idf.rename(columns={'id': ''}).to_csv(path, mode='w' if ichunk == 0 else 'a', header=ichunk == 0,
+                                              index=False)
+
+    return path
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Write a synthetic Give Me Some Credit CSV")
+    parser.add_argument('path')
+    parser.add_argument('--rows', type=int, default=150_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk-rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    write_synthetic_csv(args.path, args.rows, seed=args.seed, chunk_rows=args.chunk_rows)
@@ -0,0 +1,275 @@
+import functools
+import json
+import os
+import shutil
+import time
+import types
+
+import numpy as np
+import pandas as pd
+
+from src.data.utils import read_columnar, read_manifest, write_columnar
+from src.utils.instrument import span
+from src.utils.misc import file_fingerprint, file_stat, fingerprint
+
+# Bump when a cached output could differ for the same transform state, e.g. a change in Pipeline evaluation
+TRANSFORM_CACHE_VERSION = 2
+
+# Default size bound of a cache directory
+MAX_BYTES = 4 << 30
+
+ID_COLUMN = '__id_col__'
+INDEX_COLUMN = '__index__'
+
+PLAIN_TYPES = (type(None), bool, int, float, str, bytes)
+ARRAY_TYPES = (np.ndarray, np.generic, pd.Series, pd.Index, pd.DataFrame)
+
+
+def _unkeyed(value, versioned):
+    # Something fingerprint can't hash by content: refused, unless an explicit version stands in for it
+    if versioned:
+        return ['unkeyed', type(value).__module__, type(value).__qualname__]
+
+    raise ValueError(f"Can't fingerprint a {type(value).__name__} that the transform depends on; pass version= to "
+                     f"CachedTransform to key the transform on that instead")
+
+
+def _value_state(value, versioned, seen):
+    # A value a callable depends on (closure cell, default, global), reduced to something fingerprint hashes by
+    # content
+    if isinstance(value, PLAIN_TYPES):
+        return value
+
+    if isinstance(value, ARRAY_TYPES) and getattr(value, 'dtype', None) != object:
+        return ['array', fingerprint(value)]
+
+    if isinstance(value, np.dtype):
+        return ['dtype', value.str]
+
+    if isinstance(value, type):
+        return ['type', value.__module__, value.__qualname__]
+
+    if isinstance(value, (list, tuple)):
+        return [_value_state(ivalue, versioned, seen) for ivalue in value]
+
+    if isinstance(value, dict) and all(isinstance(ikey, str) for ikey in value):
+        return {ikey: _value_state(ivalue, versioned, seen) for ikey, ivalue in value.items()}
+
+    if callable(value):
+        return _transform_state(value, versioned, seen)
+
+    return _unkeyed(value, versioned)
+
+
+def _code_state(code):
+    # co_consts holds the code of nested functions and lambdas, whose repr carries a memory address
+    consts = [_code_state(iconst) if isinstance(iconst, types.CodeType) else repr(iconst) for iconst in code.co_consts]
+    return [code.co_code, consts, list(code.co_names)]
+
+
+def _transform_state(transform, versioned, seen):
+    if hasattr(transform, 'to_spec'):
+        return ['pipeline', transform.to_spec()]
+
+    compiled = getattr(transform, 'compiled', None)
+    if compiled is not None:
+        parts = ['woe', list(transform.vars_to_exclude)]
+        for icol, itable in compiled.tables.items():
+            parts += [icol, fingerprint(itable['splits'], itable['woe'], float(itable['missing_woe']),
+                                        itable['special_codes'], itable['special_woe'])]
+
+        return parts
+
+    if isinstance(transform, functools.partial):
+        return ['partial', _transform_state(transform.func, versioned, seen),
+                _value_state(list(transform.args), versioned, seen),
+                _value_state(dict(transform.keywords), versioned, seen)]
+
+    if not isinstance(transform, types.FunctionType):
+        # Builtins and ufuncs (e.g. np.log) don't change between runs; other callable objects can't be looked into
+        if isinstance(transform, (types.BuiltinFunctionType, np.ufunc)):
+            return ['builtin', getattr(transform, '__module__', None), transform.__name__]
+
+        return _unkeyed(transform, versioned)
+
+    # A function reached again (recursion, or a helper used twice) is keyed by name the second time
+    name = ['callable', transform.__module__, transform.__qualname__]
+    if id(transform) in seen:
+        return name
+    seen = seen | {id(transform)}
+
+    cells = []
+    for icell in transform.__closure__ or ():
+        try:
+            icontents = icell.cell_contents
+        except ValueError:  # Not assigned yet
+            cells.append(['empty'])
+            continue
+
+        cells.append(_value_state(icontents, versioned, seen))
+
+    # Globals the code reads by name (co_names also lists attribute names, which are simply not found); modules
+    # are keyed by name only
+    global_values = {}
+    for iname in transform.__code__.co_names:
+        ivalue = transform.__globals__.get(iname)
+        if iname in transform.__globals__ and not isinstance(ivalue, types.ModuleType):
+            global_values[iname] = _value_state(ivalue, versioned, seen)
+
+    return name + [_code_state(transform.__code__), cells,
+                   _value_state(list(transform.__defaults__ or ()), versioned, seen),
+                   _value_state(dict(transform.__kwdefaults__ or {}), versioned, seen), global_values]
+
+
+def transform_state(transform, versioned=False):
+    # Everything that determines a transform's output besides its input: a Pipeline's spec, a fitted WoE
+    # transform's compiled tables, and for plain functions their code, closure cells, defaults and the globals
+    # they read. Anything that can't be fingerprinted raises ValueError, unless versioned=True (the caller's
+    # explicit version stands in for it)
+    return _transform_state(transform, versioned, frozenset())
+
+
+class CachedTransform(object):
+    # Memoizes a transform on disk: the output frame and id column are stored with write_columnar under a key
+    # of the transform state, version and the input, and read back memory-mapped. Entries are directories whose
+    # mtime is their last use; the least recently used go first once the cache is over max_bytes.
+    #
+    # Keying a frame means hashing all of it, which costs about as much as the vectorized Pipelines themselves.
+    # from_csv keys on the file's content hash instead (recomputed only when its size or mtime change) and skips
+    # reading the raw data altogether, which is where repeated runs save the most
+    def __init__(self, transform, cache_dir, version=None, max_bytes=MAX_BYTES):
+        self.transform = transform
+        self.cache_dir = cache_dir
+        self.version = version
+        self.max_bytes = max_bytes
+
+        self.state_key = fingerprint(TRANSFORM_CACHE_VERSION, version,
+                                     *transform_state(transform, versioned=version is not None))
+
+    def _entry_dir(self, input_key):
+        return os.path.join(self.cache_dir, fingerprint(self.state_key, input_key))
+
+    def __call__(self, df):
+        # The index too: it comes back with the cached output, and id_col is aligned on it
+        with span('transform_cache_key', rows=len(df)):
+            input_key = fingerprint(df.index, df)
+
+        return self._cached(input_key, lambda: df)
+
+    def from_csv(self, path):
+        # Same as self(read_df(path)) on a hit, without reading the CSV
+        from src.data.utils import read_df
+
+        return self._cached(['csv', self._source_fingerprint(path)], lambda: read_df(path))
+
+    def _source_fingerprint(self, path):
+        # Content hashes of source files, remembered against their size and mtime
+        sources_path = os.path.join(self.cache_dir, 'sources.json')
+        sources = {}
+        if os.path.exists(sources_path):
+            with open(sources_path) as f:
+                sources = json.load(f)
+
+        key = os.path.abspath(path)
+        stat = file_stat(path)
+        if key in sources and sources[key]['stat'] == stat:
+            return sources[key]['fingerprint']
+
+        sources[key] = {'stat': stat, 'fingerprint': file_fingerprint(path)}
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = sources_path + f".tmp{os.getpid()}"
+        with open(tmp_path, 'w') as f:
+            json.dump(sources, f, indent=1)
+        os.replace(tmp_path, sources_path)
+
+        return sources[key]['fingerprint']
+
+    def _cached(self, input_key, load_input):
+        directory = self._entry_dir(input_key)
+
+        manifest = read_manifest(directory)
+        if manifest is not None:
+            with span('transform_cache_hit', rows=manifest['n_rows']):
+                os.utime(directory)
+                return self._read(directory, manifest)
+
+        df = load_input()
+        res_df, id_col = self.transform(df)
+
+        self._write(directory, res_df, id_col)
+        self.evict()
+
+        return res_df, id_col
+
+    @staticmethod
+    def _write(directory, df, id_col):
+        extra = {}
+        if id_col is not None:
+            extra[ID_COLUMN] = id_col.to_numpy()
+
+        # A RangeIndex from 0 is the only index rebuilt without being stored
+        default_index = isinstance(df.index, pd.RangeIndex) and df.index.start == 0 and df.index.step == 1
+        if not default_index:
+            extra[INDEX_COLUMN] = df.index.to_numpy()
+
+        stored = df.assign(**extra) if extra else df
+        manifest = {
+            'kind': 'transform_output',
+            'columns_out': list(map(str, df.columns)),
+            'id_name': None if id_col is None else id_col.name,
+            'has_index': not default_index,
+            'index_name': df.index.name,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+
+        # No downcasting: a hit must return the same dtypes as the transform
+        write_columnar(stored, directory, manifest=manifest, downcast=False)
+
+    @staticmethod
+    def _read(directory, manifest):
+        stored = read_columnar(directory, manifest)
+
+        index = None
+        if manifest['has_index']:
+            index = pd.Index(stored[INDEX_COLUMN].to_numpy(), name=manifest['index_name'])
+
+        df = stored[manifest['columns_out']]
+        if index is not None:
+            df.index = index
+
+        id_col = None
+        if ID_COLUMN in stored.columns:
+            id_col = pd.Series(stored[ID_COLUMN].to_numpy(), index=df.index, name=manifest['id_name'])
+
+        return df, id_col
+
+    def entries(self):
+        # (mtime, bytes, directory) of every cached output, oldest use first
+        res = []
+        if not os.path.isdir(self.cache_dir):
+            return res
+
+        for iname in os.listdir(self.cache_dir):
+            idirectory = os.path.join(self.cache_dir, iname)
+            if not os.path.isdir(idirectory) or read_manifest(idirectory) is None:
+                continue
+
+            ibytes = sum(os.path.getsize(os.path.join(idirectory, ifile)) for ifile in os.listdir(idirectory))
+            res.append((os.stat(idirectory).st_mtime_ns, ibytes, idirectory))
+
+        return sorted(res)
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(ibytes for _, ibytes, _ in entries)
+
+        removed = []
+        for _, ibytes, idirectory in entries:
+            if total <= self.max_bytes:
+                break
+
+            shutil.rmtree(idirectory, ignore_errors=True)
+            total -= ibytes
+            removed.append(idirectory)
+
+        return removed
@@ -0,0 +1,175 @@
+import numpy as np
+import pandas as pd
+
+from src.utils.instrument import span
+
+
+# Each output column is planned as {'sources': [...], 'reduce': None | 'max', 'steps': [...]} where a source is
+# either an input column name or another plan. Nothing touches the data until the whole plan is known.
+def _input_plan(icol):
+    return {'sources': [icol], 'reduce': None, 'steps': []}
+
+
+def _copy_plan(plan):
+    # Plans are mutated by later ops (steps appended), so a plan used as a source must not be shared
+    return {'sources': [_copy_plan(isource) if isinstance(isource, dict) else isource for isource in plan['sources']],
+            'reduce': plan['reduce'], 'steps': list(plan['steps'])}
+
+
+def _is_touched(plan):
+    return plan['reduce'] is not None or len(plan['steps']) > 0
+
+
+class Drop(object):
+    def __init__(self, columns):
+        self.columns = list(columns)
+
+    def plan(self, plans):
+        for icol in self.columns:
+            del plans[icol]
+
+    def to_spec(self):
+        return {'op': 'drop', 'columns': self.columns}
+
+
+class Impute(object):
+    def __init__(self, columns, value=0):
+        self.columns = list(columns)
+        self.value = value
+
+    def plan(self, plans):
+        for icol in self.columns:
+            plans[icol]['steps'].append(('impute', self.value))
+
+    def to_spec(self):
+        return {'op': 'impute', 'columns': self.columns, 'value': self.value}
+
+
+class SignedLog1p(object):
+    # sign(x) * log(1 + |x|): a log that handles 0 and negative values. Applies to `columns`, or to every
+    # column present at this point of the pipeline except `exclude`
+    def __init__(self, columns=None, exclude=()):
+        self.columns = None if columns is None else list(columns)
+        self.exclude = list(exclude)
+
+    def plan(self, plans):
+        columns = self.columns if self.columns is not None else list(plans.keys())
+
+        for icol in columns:
+            if icol not in self.exclude:
+                plans[icol]['steps'].append(('signed_log1p',))
+
+    def to_spec(self):
+        return {'op': 'signed_log1p', 'columns': self.columns, 'exclude': self.exclude}
+
+
+class MaxOf(object):
+    # Row-wise max of `columns` (NaNs skipped, as DataFrame.max) appended as `name`; the sources are dropped
+    def __init__(self, name, columns, drop=True):
+        self.name = name
+        self.columns = list(columns)
+        self.drop = drop
+
+    def plan(self, plans):
+        plans[self.name] = {'sources': [_copy_plan(plans[icol]) for icol in self.columns], 'reduce': 'max',
+                            'steps': []}
+
+        if self.drop:
+            for icol in self.columns:
+                del plans[icol]
+
+    def to_spec(self):
+        return {'op': 'max_of', 'name': self.name, 'columns': self.columns, 'drop': self.drop}
+
+
+OPS = {
+    'drop': Drop,
+    'impute': Impute,
+    'signed_log1p': SignedLog1p,
+    'max_of': MaxOf,
+}
+
+
+class Pipeline(object):
+    def __init__(self, ops, name=None, id_column='id', dtype=np.float64):
+        self.ops = list(ops)
+        self.name = name
+        self.id_column = id_column
+        self.dtype = dtype
+
+    def plan(self, columns):
+        plans = {icol: _input_plan(icol) for icol in columns if icol != self.id_column}
+
+        for iop in self.ops:
+            iop.plan(plans)
+
+        return plans
+
+    def _evaluate(self, df, plan, out, tmp):
+        isource = plan['sources'][0]
+        if isinstance(isource, dict):
+            self._evaluate(df, isource, out, tmp)
+        else:
+            out[:] = df[isource].to_numpy()
+
+        for isource in plan['sources'][1:]:
+            if isinstance(isource, dict):
+                # Nested plans need their own scratch column; MaxOf over transformed columns is rare enough
+                ivalues = np.empty_like(out)
+                self._evaluate(df, isource, ivalues, tmp)
+            else:
+                ivalues = df[isource].to_numpy()
+
+            np.fmax(out, ivalues, out=out)
+
+        for istep in plan['steps']:
+            if istep[0] == 'impute':
+                out[np.isnan(out)] = istep[1]
+
+            elif istep[0] == 'signed_log1p':
+                # Kept as log(1 + |x|) rather than np.log1p so outputs stay bit-identical to the earlier transforms
+                np.abs(out, out=tmp)
+                tmp += 1
+                np.log(tmp, out=tmp)
+                np.copysign(tmp, out, out=out)
+
+    def __call__(self, df):
+        with span('transform', rows=len(df), transform=self.name or 'Pipeline'):
+            return self._apply(df)
+
+    def _apply(self, df):
+        id_col = df[self.id_column] if self.id_column in df.columns else None
+
+        plans = self.plan(df.columns)
+        touched = [icol for icol, iplan in plans.items() if _is_touched(iplan)]
+
+        # The only full-size allocation: one block for the columns the pipeline rewrites, plus one scratch column
+        block = np.empty((len(df), len(touched)), dtype=self.dtype, order='F')
+        tmp = np.empty(len(df), dtype=self.dtype)
+        for j, icol in enumerate(touched):
+            self._evaluate(df, plans[icol], block[:, j], tmp)
+
+        data = {}
+        for icol, iplan in plans.items():
+            if _is_touched(iplan):
+                data[icol] = block[:, touched.index(icol)]
+
+            else:
+                data[icol] = df[iplan['sources'][0]]
+
+        df = pd.DataFrame(data, index=df.index, copy=False)
+
+        return df, id_col
+
+    def to_spec(self):
+        return {'name': self.name, 'id_column': self.id_column, 'dtype': np.dtype(self.dtype).name,
+                'ops': [iop.to_spec() for iop in self.ops]}
+
+    @classmethod
+    def from_spec(cls, spec):
+        ops = []
+        for iop in spec['ops']:
+            iop = dict(iop)
+            ops.append(OPS[iop.pop('op')](**iop))
+
+        return cls(ops, name=spec['name'], id_column=spec['id_column'], dtype=np.dtype(spec['dtype']))
@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+
+from src.utils.instrument import span
+
+
+def compile_binning(optb):
+    splits = np.asarray(optb.splits, dtype=np.float64)
+
+    # Probe the fitted binner with one representative value per bin (bins are [s_i-1, s_i)), so the compiled
+    # table reproduces whatever metric_missing / metric_special semantics optbinning applies
+    representatives = np.concatenate([[-np.inf], splits])
+    woe = np.asarray(optb.transform(representatives, metric="woe"), dtype=np.float64)
+    missing_woe = float(optb.transform(np.array([np.nan]), metric="woe")[0])
+
+    special_codes = optb.special_codes
+    if isinstance(special_codes, dict):
+        special_codes = [code for codes in special_codes.values()
+                         for code in (codes if isinstance(codes, (list, np.ndarray)) else [codes])]
+
+    if special_codes:
+        special_codes = np.asarray(special_codes, dtype=np.float64)
+        special_woe = np.asarray(optb.transform(special_codes, metric="woe"), dtype=np.float64)
+
+    else:
+        special_codes = np.empty(0, dtype=np.float64)
+        special_woe = np.empty(0, dtype=np.float64)
+
+    return {
+        'splits': splits,
+        'woe': woe,
+        'missing_woe': missing_woe,
+        'special_codes': special_codes,
+        'special_woe': special_woe,
+    }
+
+
+# Below this many splits, counting comparisons is branch-free and beats the binary search on unsorted input
+SEARCHSORTED_MIN_SPLITS = 32
+
+
+def bin_indices(splits, x):
+    # Same as np.digitize(x, splits, right=False); NaNs land in an arbitrary bin and must be masked by the caller
+    if len(splits) >= SEARCHSORTED_MIN_SPLITS:
+        return np.searchsorted(splits, x, side='right')
+
+    indices = np.zeros(len(x), dtype=np.uint8)
+    for isplit in splits:
+        np.add(indices, x >= isplit, out=indices, casting='unsafe')
+
+    return indices
+
+
+def lookup_woe(table, x):
+    res = table['woe'].take(bin_indices(table['splits'], x))
+
+    res[np.isnan(x)] = table['missing_woe']
+
+    for icode, iwoe in zip(table['special_codes'], table['special_woe']):
+        res[x == icode] = iwoe
+
+    return res
+
+
+def n_bin_codes(table):
+    return len(table['splits']) + 2 + len(table['special_codes'])
+
+
+def bin_codes(table, x):
+    # One code per WoE bin: the regular bins first, then missing, then each special code
+    n_regular = len(table['splits']) + 1
+
+    codes = bin_indices(table['splits'], x).astype(np.intp)
+    codes[np.isnan(x)] = n_regular
+
+    for j, icode in enumerate(table['special_codes']):
+        codes[x == icode] = n_regular + 1 + j
+
+    return codes
+
+
+class CompiledWoETable(object):
+    def __init__(self, tables):
+        self.tables = tables
+        self.columns = list(tables.keys())
+
+    @classmethod
+    def from_binnings(cls, binnings):
+        return cls({icol: compile_binning(ioptb) for icol, ioptb in binnings.items()})
+
+    def transform_matrix(self, X):
+        # X is a contiguous (n_rows, n_columns) float block ordered as self.columns; results are written in place
+        for j, icol in enumerate(self.columns):
+            X[:, j] = lookup_woe(self.tables[icol], X[:, j])
+
+        return X
+
+    def to_matrix(self, df):
+        X = np.empty((len(df), len(self.columns)), dtype=np.float64, order='F')
+        for j, icol in enumerate(self.columns):
+            X[:, j] = df[icol].to_numpy()
+
+        return X
+
+    def transform(self, df, drop_columns=()):
+        X = self.transform_matrix(self.to_matrix(df))
+
+        data = {}
+        for icol in df.columns:
+            if icol in drop_columns:
+                continue
+
+            if icol in self.tables:
+                data[icol] = X[:, self.columns.index(icol)]
+
+            else:
+                data[icol] = df[icol]
+
+        return pd.DataFrame(data, index=df.index)
+
+
+class CompiledWoETransform(object):
+    # A fitted WoE transform reduced to its bin tables, e.g. as loaded from a model bundle. Called like
+    # WoETransformBase, without optbinning
+    def __init__(self, compiled, drop_columns=()):
+        self.compiled = compiled
+        self.vars_to_exclude = list(drop_columns)
+
+    def __call__(self, df):
+        id_col = df['id']
+        with span('transform', rows=len(df), transform=type(self).__name__):
+            df = self.compiled.transform(df, drop_columns=self.vars_to_exclude)
+
+        return df, id_col
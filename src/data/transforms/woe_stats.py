@@ -0,0 +1,220 @@
+import json
+import os
+
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor
+
+# Fine pre-bins kept per column; the solve coarsens them to at most MAX_N_PREBINS like optbinning's own CART
+# prebinning (max_n_prebins=20, min_prebin_size=0.05)
+N_FINE_PREBINS = 256
+MAX_N_PREBINS = 20
+MIN_PREBIN_SIZE = 0.05
+
+
+def fine_edges(x, n_prebins=N_FINE_PREBINS, user_splits=None):
+    # Every distinct value when there are few (count columns, sentinel codes), quantiles otherwise. Any user
+    # splits from the spec become edges too, so that no pre-bin straddles them
+    x = np.asarray(x, dtype=np.float64)
+    x = x[~np.isnan(x)]
+
+    uniques = np.unique(x)
+    if len(uniques) <= n_prebins:
+        edges = uniques[1:]
+    else:
+        edges = np.unique(np.quantile(x, np.linspace(0, 1, n_prebins + 1)[1:-1]))
+
+    if user_splits is not None:
+        edges = np.union1d(edges, np.asarray(user_splits, dtype=np.float64))
+
+    return edges
+
+
+class ColumnStats(object):
+    # Event / non-event counts of one column over fixed pre-bins [edges[i - 1], edges[i]), plus each pre-bin's
+    # smallest observed value and the counts of missing values. Everything is a sum or a min, so it merges
+    def __init__(self, edges, events=None, totals=None, minimum=None, missing_events=0, missing_totals=0):
+        self.edges = np.asarray(edges, dtype=np.float64)
+        n_bins = len(self.edges) + 1
+
+        self.events = np.zeros(n_bins, dtype=np.int64) if events is None else np.asarray(events, dtype=np.int64)
+        self.totals = np.zeros(n_bins, dtype=np.int64) if totals is None else np.asarray(totals, dtype=np.int64)
+        self.minimum = np.full(n_bins, np.inf) if minimum is None else np.asarray(minimum, dtype=np.float64)
+        self.missing_events = int(missing_events)
+        self.missing_totals = int(missing_totals)
+
+    def update(self, x, y):
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y) != 0
+
+        missing = np.isnan(x)
+        if missing.any():
+            self.missing_events += int(y[missing].sum())
+            self.missing_totals += int(missing.sum())
+            x, y = x[~missing], y[~missing]
+
+        index = np.searchsorted(self.edges, x, side='right')
+        n_bins = len(self.totals)
+
+        self.events += np.bincount(index[y], minlength=n_bins)
+        self.totals += np.bincount(index, minlength=n_bins)
+        np.minimum.at(self.minimum, index, x)
+
+        return self
+
+    def merge(self, other):
+        assert np.array_equal(self.edges, other.edges), "Only stats over the same pre-bins can be merged"
+
+        return ColumnStats(self.edges, self.events + other.events, self.totals + other.totals,
+                           np.minimum(self.minimum, other.minimum), self.missing_events + other.missing_events,
+                           self.missing_totals + other.missing_totals)
+
+    def weighted_rows(self):
+        # Two rows per non-empty pre-bin (its smallest value, labelled 1 and 0, weighted by the event and
+        # non-event counts) and two for the missing values. OptimalBinning fitted on these rows with
+        # sample_weight sees the same per-bin counts as on the raw column, for any splits on the pre-bin edges
+        used = self.totals > 0
+        x = np.concatenate([self.minimum[used], self.minimum[used], [np.nan, np.nan]])
+        y = np.concatenate([np.ones(used.sum()), np.zeros(used.sum()), [1, 0]]).astype(np.int64)
+        weights = np.concatenate([self.events[used], (self.totals - self.events)[used],
+                                  [self.missing_events, self.missing_totals - self.missing_events]])
+
+        keep = weights > 0
+        return x[keep], y[keep], weights[keep].astype(np.float64)
+
+    def prebin_splits(self, max_n_prebins=MAX_N_PREBINS, min_prebin_size=MIN_PREBIN_SIZE):
+        # Weighted CART over the pre-bin representatives, as optbinning prebins raw data. Thresholds are moved
+        # to the pre-bin edge they fall in front of, so they split the raw values the same way
+        from sklearn.tree import DecisionTreeClassifier
+
+        used = np.flatnonzero(self.totals > 0)
+        if len(used) < 2:
+            return np.empty(0)
+
+        x = np.concatenate([self.minimum[used], self.minimum[used]])
+        y = np.concatenate([np.ones(len(used)), np.zeros(len(used))])
+        weights = np.concatenate([self.events[used], (self.totals - self.events)[used]])
+
+        tree = DecisionTreeClassifier(min_weight_fraction_leaf=min_prebin_size, max_leaf_nodes=max_n_prebins)
+        tree.fit(x[:, None], y, sample_weight=weights)
+        thresholds = tree.tree_.threshold[tree.tree_.feature >= 0]
+
+        first_above = np.searchsorted(self.minimum[used], thresholds, side='right')
+        return np.unique(self.edges[used[first_above] - 1])
+
+
+class WoEStats(object):
+    # ColumnStats for every column of a WoE spec. Built in one pass over chunks (or shards in worker
+    # processes) and merged; stored counts can be topped up with new data without touching the old rows
+    def __init__(self, columns, ycol='SeriousDlqin2yrs'):
+        self.columns = columns
+        self.ycol = ycol
+
+    @classmethod
+    def from_sample(cls, df, spec, ycol='SeriousDlqin2yrs', n_prebins=N_FINE_PREBINS):
+        # Pre-bin edges come from a sample (e.g. the first chunk) and are then fixed: values outside its range
+        # fall in the end pre-bins
+        return cls({xcol: ColumnStats(fine_edges(df[xcol], n_prebins, col_spec.get('user_splits')))
+                    for xcol, col_spec in spec.items()}, ycol=ycol)
+
+    def empty(self):
+        return WoEStats({xcol: ColumnStats(istats.edges) for xcol, istats in self.columns.items()}, ycol=self.ycol)
+
+    def update(self, df):
+        y = df[self.ycol].to_numpy()
+        for xcol, istats in self.columns.items():
+            istats.update(df[xcol].to_numpy(), y)
+
+        return self
+
+    def merge(self, other):
+        assert set(self.columns) == set(other.columns)
+
+        return WoEStats({xcol: istats.merge(other.columns[xcol]) for xcol, istats in self.columns.items()},
+                        ycol=self.ycol)
+
+    def __add__(self, other):
+        return self.merge(other)
+
+    @property
+    def n_rows(self):
+        istats = next(iter(self.columns.values()))
+        return int(istats.totals.sum()) + istats.missing_totals
+
+    def solve(self, spec):
+        # Same OptimalBinning settings as fit_binnings, fitted on each column's weighted pre-bin rows. Columns with
+        # user splits, or with at most N_FINE_PREBINS distinct values, get the same bins as on the raw rows (the
+        # splits sit on the next value instead of halfway). Elsewhere a split can only fall on a pre-bin edge,
+        # so it may land on a neighbouring one (e.g. MonthlyIncome 3538.0 vs 3395.5): on the training data the
+        # IV of such columns is within 3% of the raw fit at 20k rows, and within 1% at 150k
+        from src.data.transforms.woe_transform import _fit_binning
+
+        binnings = {}
+        for xcol, col_spec in spec.items():
+            istats = self.columns[xcol]
+
+            user_splits = col_spec.get('user_splits')
+            if user_splits is None:
+                user_splits = istats.prebin_splits()
+
+            x, y, weights = istats.weighted_rows()
+            binnings[xcol] = _fit_binning(x, y, xcol, col_spec['monotonic_trend'], col_spec['gamma'],
+                                          user_splits=user_splits, sample_weight=weights)
+
+        return binnings
+
+    def save(self, path):
+        arrays = {}
+        meta = {'ycol': self.ycol, 'columns': {}}
+
+        for i, (xcol, istats) in enumerate(self.columns.items()):
+            meta['columns'][xcol] = {'index': i, 'missing_events': istats.missing_events,
+                                     'missing_totals': istats.missing_totals}
+            for ikey in ('edges', 'events', 'totals', 'minimum'):
+                arrays[f"{i}_{ikey}"] = getattr(istats, ikey)
+
+        np.savez(path, meta=np.array(json.dumps(meta)), **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+
+            columns = {}
+            for xcol, imeta in meta['columns'].items():
+                arrays = [data[f"{imeta['index']}_{ikey}"] for ikey in ('edges', 'events', 'totals', 'minimum')]
+                columns[xcol] = ColumnStats(*arrays, missing_events=imeta['missing_events'],
+                                            missing_totals=imeta['missing_totals'])
+
+        return cls(columns, ycol=meta['ycol'])
+
+
+def _csv_stats(path, stats, chunksize):
+    from src.utils.score import iter_csv_chunks
+
+    stats = stats.empty()
+    for ichunk in iter_csv_chunks(path, chunksize):
+        stats.update(ichunk)
+
+    return stats
+
+
+def stats_from_csvs(paths, stats, chunksize=1_000_000, n_jobs=None):
+    # One pass over each CSV in bounded memory; files (e.g. one per month) are read in parallel and their
+    # counts merged. stats fixes the pre-bins (see WoEStats.from_sample) and is not modified
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+    n_jobs = min(n_jobs, len(paths))
+
+    if n_jobs > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            parts = list(executor.map(_csv_stats, paths, [stats] * len(paths), [chunksize] * len(paths)))
+
+    else:
+        parts = [_csv_stats(ipath, stats, chunksize) for ipath in paths]
+
+    res = parts[0]
+    for ipart in parts[1:]:
+        res = res.merge(ipart)
+
+    return res
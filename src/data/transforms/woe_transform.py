@@ -1,21 +1,47 @@
-import copy
+import os
+import re
 import joblib
+import optbinning
 
+from concurrent.futures import ProcessPoolExecutor
 from optbinning import OptimalBinning
+from src.data.transforms.woe_compiled import CompiledWoETable
 from src.nb_utils.misc import is_notebook
+from src.utils.instrument import span
+from src.utils.misc import fingerprint
+
+# Per-column OptimalBinning settings, in the order the columns are binned
+WOE_SPEC = {
+    'NumberOfDependents': {'monotonic_trend': 'ascending', 'gamma': 0},
+    'DebtRatio': {'monotonic_trend': 'ascending', 'gamma': 0},
+    'MonthlyIncome': {'monotonic_trend': 'descending', 'gamma': 0},
+    'age': {'monotonic_trend': 'descending', 'gamma': 0.1},
+    'RevolvingUtilizationOfUnsecuredLines': {'monotonic_trend': 'ascending', 'gamma': 0.2},
+    'NumberOfOpenCreditLinesAndLoans': {'monotonic_trend': 'descending', 'gamma': 0},
+    'NumberRealEstateLoansOrLines': {'monotonic_trend': None, 'gamma': 0, 'user_splits': [1, 2, 3]},
+    'NumberOfTime30-59DaysPastDueNotWorse': {'monotonic_trend': None, 'gamma': 0, 'user_splits': [0, 1, 2]},
+}
+
+WOE_V2_SPEC = dict(WOE_SPEC, **{
+    'NumberOfTime60-89DaysPastDueNotWorse': {'monotonic_trend': None, 'gamma': 0, 'user_splits': [0, 1, 2]},
+    'NumberOfTimes90DaysLate': {'monotonic_trend': None, 'gamma': 0, 'user_splits': [0, 1, 2]},
+})
+
+
+def _fit_binning(x, y, xcol, monotonic_trend, gamma, user_splits=None, sample_weight=None):
+    optb = OptimalBinning(name=xcol, dtype="numerical", solver="cp", monotonic_trend=monotonic_trend,
+                          gamma=gamma, user_splits=user_splits)
+    optb.fit(x, y, sample_weight=sample_weight)
+    assert optb.status == 'OPTIMAL'
+
+    return optb
 
 
 def forced_binning(df, xcol, ycol, monotonic_trend, gamma, user_splits=None, silent=False):
     if silent is False:
         print(f"x={xcol}, y={ycol}")
 
-    x = df[xcol]
-    y = df[ycol]
-
-    optb = OptimalBinning(name=xcol, dtype="numerical", solver="cp", monotonic_trend=monotonic_trend,
-                          gamma=gamma, user_splits=user_splits)
-    optb.fit(x, y)
-    assert optb.status == 'OPTIMAL'
+    optb = _fit_binning(df[xcol], df[ycol], xcol, monotonic_trend, gamma, user_splits=user_splits)
 
     binning_table = optb.binning_table
     binning_df = binning_table.build()
@@ -28,184 +54,85 @@ def forced_binning(df, xcol, ycol, monotonic_trend, gamma, user_splits=None, sil
     return optb
 
 
-class WoETransform(object):
-    def __init__(self):
-        self.NumberOfDependentsBins = None
-        self.DebtRatioBins = None
-        self.MonthlyIncomeBins = None
-        self.ageBins = None
-        self.RevolvingUtilizationOfUnsecuredLinesBins = None
-        self.NumberOfOpenCreditLinesAndLoansBins = None
-        self.NumberRealEstateLoansOrLinesBins = None
-        self.NumberOfTime3059DaysPastDueNotWorseBins = None
-        self.inited = False
-        self.vars_to_exclude = [
-            'NumberOfTime60-89DaysPastDueNotWorse',
-            'NumberOfTimes90DaysLate'
-        ]
+def _cache_path(cache_dir, xcol, x, y, col_spec):
+    key = fingerprint(xcol, col_spec, optbinning.__version__, x, y)
+    return os.path.join(cache_dir, f"{re.sub(r'[^A-Za-z0-9]', '', xcol)}-{key}.pckl")
 
-    def woe_fit(self, df):
-        self.NumberOfDependentsBins = forced_binning(
-            df, 'NumberOfDependents', 'SeriousDlqin2yrs',
-            'ascending', 0, silent=True)
 
-        self.DebtRatioBins = forced_binning(
-            df, 'DebtRatio', 'SeriousDlqin2yrs',
-            'ascending', 0, silent=True)
+def fit_binnings(df, spec, ycol='SeriousDlqin2yrs', n_jobs=None, cache_dir=None):
+    y = df[ycol].to_numpy()
 
-        self.MonthlyIncomeBins = forced_binning(
-            df, 'MonthlyIncome', 'SeriousDlqin2yrs',
-            'descending', 0, silent=True)
+    binnings = {}
+    to_fit = {}
+    for xcol, col_spec in spec.items():
+        x = df[xcol].to_numpy()
 
-        self.ageBins = forced_binning(
-            df, 'age', 'SeriousDlqin2yrs',
-            'descending', 0.1, silent=True)
+        path = None
+        if cache_dir is not None:
+            path = _cache_path(cache_dir, xcol, x, y, col_spec)
+            if os.path.exists(path):
+                binnings[xcol] = joblib.load(path)
+                continue
 
-        self.RevolvingUtilizationOfUnsecuredLinesBins = forced_binning(
-            df, 'RevolvingUtilizationOfUnsecuredLines', 'SeriousDlqin2yrs',
-            'ascending', 0.2, silent=True)
+        to_fit[xcol] = (x, col_spec, path)
 
-        self.NumberOfOpenCreditLinesAndLoansBins = forced_binning(
-            df, 'NumberOfOpenCreditLinesAndLoans', 'SeriousDlqin2yrs',
-            'descending', 0, silent=True)
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+    n_jobs = min(n_jobs, len(to_fit))
 
-        self.NumberRealEstateLoansOrLinesBins = forced_binning(
-            df, 'NumberRealEstateLoansOrLines', 'SeriousDlqin2yrs',
-            None, 0, user_splits=[1, 2, 3], silent=True)
+    if n_jobs > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            futures = {xcol: executor.submit(_fit_binning, x, y, xcol, **col_spec)
+                       for xcol, (x, col_spec, _) in to_fit.items()}
+            fitted = {xcol: ifuture.result() for xcol, ifuture in futures.items()}
 
-        self.NumberOfTime3059DaysPastDueNotWorseBins = forced_binning(
-            df, 'NumberOfTime30-59DaysPastDueNotWorse', 'SeriousDlqin2yrs',
-            None, 0, user_splits=[0, 1, 2], silent=True)
+    else:
+        fitted = {xcol: _fit_binning(x, y, xcol, **col_spec) for xcol, (x, col_spec, _) in to_fit.items()}
 
-        self.inited = True
+    for xcol, optb in fitted.items():
+        path = to_fit[xcol][2]
+        if path is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            joblib.dump(optb, path)
 
-    def save(self, path):
-        assert self.inited is True
-
-        save_dict = {
-            'NumberOfDependentsBins': self.NumberOfDependentsBins,
-            'DebtRatioBins': self.DebtRatioBins,
-            'MonthlyIncomeBins': self.MonthlyIncomeBins,
-            'ageBins': self.ageBins,
-            'RevolvingUtilizationOfUnsecuredLinesBins': self.RevolvingUtilizationOfUnsecuredLinesBins,
-            'NumberOfOpenCreditLinesAndLoansBins': self.NumberOfOpenCreditLinesAndLoansBins,
-            'NumberRealEstateLoansOrLinesBins': self.NumberRealEstateLoansOrLinesBins,
-            'NumberOfTime3059DaysPastDueNotWorseBins': self.NumberOfTime3059DaysPastDueNotWorseBins
-        }
+    # Keep the spec's column order regardless of which columns came from the cache
+    return {xcol: binnings.get(xcol, fitted.get(xcol)) for xcol in spec}
 
-        joblib.dump(save_dict, path)
-        print(f"Saved to {path}")
 
-    def load(self, path):
-        load_dict = joblib.load(path)
+class WoETransformBase(object):
+    spec = {}
+    vars_to_exclude = []
 
-        self.NumberOfDependentsBins = load_dict['NumberOfDependentsBins']
-        self.DebtRatioBins = load_dict['DebtRatioBins']
-        self.MonthlyIncomeBins = load_dict['MonthlyIncomeBins']
-        self.ageBins = load_dict['ageBins']
-        self.RevolvingUtilizationOfUnsecuredLinesBins = load_dict['RevolvingUtilizationOfUnsecuredLinesBins']
-        self.NumberOfOpenCreditLinesAndLoansBins = load_dict['NumberOfOpenCreditLinesAndLoansBins']
-        self.NumberRealEstateLoansOrLinesBins = load_dict['NumberRealEstateLoansOrLinesBins']
-        self.NumberOfTime3059DaysPastDueNotWorseBins = load_dict['NumberOfTime3059DaysPastDueNotWorseBins']
-
-        self.inited = True
-
-    def __call__(self, df):
-        assert self.inited is True
+    def __init__(self, spec=None):
+        if spec is not None:
+            self.spec = spec
 
-        df = copy.deepcopy(df)
-
-        id_col = df['id']
-        df = df.drop(columns=self.vars_to_exclude)
-
-        df['NumberOfDependents'] = self.NumberOfDependentsBins.transform(df['NumberOfDependents'], metric="woe")
-        df['DebtRatio'] = self.DebtRatioBins.transform(df['DebtRatio'], metric="woe")
-        df['MonthlyIncome'] = self.MonthlyIncomeBins.transform(df['MonthlyIncome'], metric="woe")
-        df['age'] = self.ageBins.transform(df['age'], metric="woe")
-        df['RevolvingUtilizationOfUnsecuredLines'] = self.RevolvingUtilizationOfUnsecuredLinesBins.transform(
-            df['RevolvingUtilizationOfUnsecuredLines'], metric="woe")
-        df['NumberOfOpenCreditLinesAndLoans'] = self.NumberOfOpenCreditLinesAndLoansBins.transform(
-            df['NumberOfOpenCreditLinesAndLoans'], metric="woe")
-        df['NumberRealEstateLoansOrLines'] = self.NumberRealEstateLoansOrLinesBins.transform(
-            df['NumberRealEstateLoansOrLines'], metric="woe")
-        df['NumberOfTime30-59DaysPastDueNotWorse'] = self.NumberOfTime3059DaysPastDueNotWorseBins.transform(
-            df['NumberOfTime30-59DaysPastDueNotWorse'], metric="woe")
-
-        return df, id_col
-
-
-class WoETransformV2(object):
-    def __init__(self):
-        self.NumberOfDependentsBins = None
-        self.DebtRatioBins = None
-        self.MonthlyIncomeBins = None
-        self.ageBins = None
-        self.RevolvingUtilizationOfUnsecuredLinesBins = None
-        self.NumberOfOpenCreditLinesAndLoansBins = None
-        self.NumberRealEstateLoansOrLinesBins = None
-        self.NumberOfTime3059DaysPastDueNotWorseBins = None
-        self.NumberOfTime6089DaysPastDueNotWorseBins = None
-        self.NumberOfTimes90DaysLateBins = None
+        self.bins = {}
+        self.compiled = None
         self.inited = False
 
-    def woe_fit(self, df):
-        self.NumberOfDependentsBins = forced_binning(
-            df, 'NumberOfDependents', 'SeriousDlqin2yrs',
-            'ascending', 0, silent=True)
-
-        self.DebtRatioBins = forced_binning(
-            df, 'DebtRatio', 'SeriousDlqin2yrs',
-            'ascending', 0, silent=True)
-
-        self.MonthlyIncomeBins = forced_binning(
-            df, 'MonthlyIncome', 'SeriousDlqin2yrs',
-            'descending', 0, silent=True)
-
-        self.ageBins = forced_binning(
-            df, 'age', 'SeriousDlqin2yrs',
-            'descending', 0.1, silent=True)
-
-        self.RevolvingUtilizationOfUnsecuredLinesBins = forced_binning(
-            df, 'RevolvingUtilizationOfUnsecuredLines', 'SeriousDlqin2yrs',
-            'ascending', 0.2, silent=True)
-
-        self.NumberOfOpenCreditLinesAndLoansBins = forced_binning(
-            df, 'NumberOfOpenCreditLinesAndLoans', 'SeriousDlqin2yrs',
-            'descending', 0, silent=True)
+    def woe_fit(self, df, n_jobs=None, cache_dir=None):
+        self.bins = fit_binnings(df, self.spec, n_jobs=n_jobs, cache_dir=cache_dir)
 
-        self.NumberRealEstateLoansOrLinesBins = forced_binning(
-            df, 'NumberRealEstateLoansOrLines', 'SeriousDlqin2yrs',
-            None, 0, user_splits=[1, 2, 3], silent=True)
-
-        self.NumberOfTime3059DaysPastDueNotWorseBins = forced_binning(
-            df, 'NumberOfTime30-59DaysPastDueNotWorse', 'SeriousDlqin2yrs',
-            None, 0, user_splits=[0, 1, 2], silent=True)
-
-        self.NumberOfTime6089DaysPastDueNotWorseBins = forced_binning(
-            df, 'NumberOfTime60-89DaysPastDueNotWorse', 'SeriousDlqin2yrs',
-            None, 0, user_splits=[0, 1, 2], silent=True)
+        self.compile()
+        self.inited = True
 
-        self.NumberOfTimes90DaysLateBins = forced_binning(
-            df, 'NumberOfTimes90DaysLate', 'SeriousDlqin2yrs',
-            None, 0, user_splits=[0, 1, 2], silent=True)
+    def woe_fit_stats(self, stats):
+        # Fit from pre-binned counts (src/data/transforms/woe_stats.py) instead of raw rows
+        self.bins = stats.solve(self.spec)
 
+        self.compile()
         self.inited = True
 
+    @staticmethod
+    def _save_key(xcol):
+        # Keys of the pickles written before the spec existed, e.g. 'NumberOfTime3059DaysPastDueNotWorseBins'
+        return xcol.replace('-', '') + 'Bins'
+
     def save(self, path):
         assert self.inited is True
 
-        save_dict = {
-            'NumberOfDependentsBins': self.NumberOfDependentsBins,
-            'DebtRatioBins': self.DebtRatioBins,
-            'MonthlyIncomeBins': self.MonthlyIncomeBins,
-            'ageBins': self.ageBins,
-            'RevolvingUtilizationOfUnsecuredLinesBins': self.RevolvingUtilizationOfUnsecuredLinesBins,
-            'NumberOfOpenCreditLinesAndLoansBins': self.NumberOfOpenCreditLinesAndLoansBins,
-            'NumberRealEstateLoansOrLinesBins': self.NumberRealEstateLoansOrLinesBins,
-            'NumberOfTime3059DaysPastDueNotWorseBins': self.NumberOfTime3059DaysPastDueNotWorseBins,
-            'NumberOfTime6089DaysPastDueNotWorseBins': self.NumberOfTime6089DaysPastDueNotWorseBins,
-            'NumberOfTimes90DaysLateBins': self.NumberOfTimes90DaysLateBins
-        }
+        save_dict = {self._save_key(xcol): optb for xcol, optb in self.bins.items()}
 
         joblib.dump(save_dict, path)
         print(f"Saved to {path}")
@@ -213,41 +140,31 @@ class WoETransformV2(object):
     def load(self, path):
         load_dict = joblib.load(path)
 
-        self.NumberOfDependentsBins = load_dict['NumberOfDependentsBins']
-        self.DebtRatioBins = load_dict['DebtRatioBins']
-        self.MonthlyIncomeBins = load_dict['MonthlyIncomeBins']
-        self.ageBins = load_dict['ageBins']
-        self.RevolvingUtilizationOfUnsecuredLinesBins = load_dict['RevolvingUtilizationOfUnsecuredLinesBins']
-        self.NumberOfOpenCreditLinesAndLoansBins = load_dict['NumberOfOpenCreditLinesAndLoansBins']
-        self.NumberRealEstateLoansOrLinesBins = load_dict['NumberRealEstateLoansOrLinesBins']
-        self.NumberOfTime3059DaysPastDueNotWorseBins = load_dict['NumberOfTime3059DaysPastDueNotWorseBins']
-        self.NumberOfTime6089DaysPastDueNotWorseBins = load_dict['NumberOfTime6089DaysPastDueNotWorseBins']
-        self.NumberOfTimes90DaysLateBins = load_dict['NumberOfTimes90DaysLateBins']
+        self.bins = {xcol: load_dict[self._save_key(xcol)] for xcol in self.spec}
 
+        self.compile()
         self.inited = True
 
+    def compile(self):
+        self.compiled = CompiledWoETable.from_binnings(self.bins)
+
     def __call__(self, df):
         assert self.inited is True
 
-        df = copy.deepcopy(df)
-
         id_col = df['id']
-
-        df['NumberOfDependents'] = self.NumberOfDependentsBins.transform(df['NumberOfDependents'], metric="woe")
-        df['DebtRatio'] = self.DebtRatioBins.transform(df['DebtRatio'], metric="woe")
-        df['MonthlyIncome'] = self.MonthlyIncomeBins.transform(df['MonthlyIncome'], metric="woe")
-        df['age'] = self.ageBins.transform(df['age'], metric="woe")
-        df['RevolvingUtilizationOfUnsecuredLines'] = self.RevolvingUtilizationOfUnsecuredLinesBins.transform(
-            df['RevolvingUtilizationOfUnsecuredLines'], metric="woe")
-        df['NumberOfOpenCreditLinesAndLoans'] = self.NumberOfOpenCreditLinesAndLoansBins.transform(
-            df['NumberOfOpenCreditLinesAndLoans'], metric="woe")
-        df['NumberRealEstateLoansOrLines'] = self.NumberRealEstateLoansOrLinesBins.transform(
-            df['NumberRealEstateLoansOrLines'], metric="woe")
-        df['NumberOfTime30-59DaysPastDueNotWorse'] = self.NumberOfTime3059DaysPastDueNotWorseBins.transform(
-            df['NumberOfTime30-59DaysPastDueNotWorse'], metric="woe")
-        df['NumberOfTime60-89DaysPastDueNotWorse'] = self.NumberOfTime6089DaysPastDueNotWorseBins.transform(
-            df['NumberOfTime60-89DaysPastDueNotWorse'], metric="woe")
-        df['NumberOfTimes90DaysLate'] = self.NumberOfTimes90DaysLateBins.transform(
-            df['NumberOfTimes90DaysLate'], metric="woe")
+        with span('transform', rows=len(df), transform=type(self).__name__):
+            df = self.compiled.transform(df, drop_columns=self.vars_to_exclude)
 
         return df, id_col
+
+
+class WoETransform(WoETransformBase):
+    spec = WOE_SPEC
+    vars_to_exclude = [
+        'NumberOfTime60-89DaysPastDueNotWorse',
+        'NumberOfTimes90DaysLate'
+    ]
+
+
+class WoETransformV2(WoETransformBase):
+    spec = WOE_V2_SPEC
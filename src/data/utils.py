@@ -1,13 +1,183 @@
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
 import pandas as pd
 
+from src.utils.instrument import span
+from src.utils.misc import file_fingerprint, file_stat
+
+COLUMNAR_VERSION = 1
+
+# Columns of the Give Me Some Credit CSVs once read_df has renamed the unnamed index column
+RAW_COLUMNS = [
+    'id',
+    'SeriousDlqin2yrs',
+    'RevolvingUtilizationOfUnsecuredLines',
+    'age',
+    'NumberOfTime30-59DaysPastDueNotWorse',
+    'DebtRatio',
+    'MonthlyIncome',
+    'NumberOfOpenCreditLinesAndLoans',
+    'NumberOfTimes90DaysLate',
+    'NumberRealEstateLoansOrLines',
+    'NumberOfTime60-89DaysPastDueNotWorse',
+    'NumberOfDependents',
+]
+
+
+def _downcast(values, downcast_floats):
+    if values.dtype.kind in 'iu':
+        if len(values) == 0:
+            return values
+
+        lo, hi = values.min(), values.max()
+        for idtype in (np.int8, np.int16, np.int32):
+            if np.iinfo(idtype).min <= lo and hi <= np.iinfo(idtype).max:
+                return values.astype(idtype)
+
+    elif values.dtype == np.float64:
+        values32 = values.astype(np.float32)
+
+        # Counters with N/As (e.g. NumberOfDependents) and whole-dollar incomes survive float32 exactly; ratios
+        # only lose precision, so those are narrowed only when asked for
+        if downcast_floats or np.array_equal(values32.astype(np.float64), values, equal_nan=True):
+            return values32
+
+    return values
+
+
+def write_columnar(df, directory, manifest=None, downcast=True, downcast_floats=False):
+    with span('write_columnar', rows=len(df)):
+        return _write_columnar(df, directory, manifest, downcast, downcast_floats)
+
+
+def _write_columnar(df, directory, manifest, downcast, downcast_floats):
+    # One .npy per column plus a manifest, written to a scratch directory and moved into place at the end
+    parent = os.path.dirname(os.path.abspath(directory))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent)
+
+    columns = []
+    for i, icol in enumerate(df.columns):
+        values = df[icol].to_numpy()
+        if downcast:
+            values = _downcast(values, downcast_floats)
+
+        assert values.dtype != object, f"Column {icol} is not numeric"
+
+        ifile = f"col_{i:04d}.npy"
+        np.save(os.path.join(tmp_dir, ifile), values, allow_pickle=False)
+        columns.append({'name': icol, 'file': ifile, 'dtype': values.dtype.str})
+
+    manifest = dict(manifest or {}, version=COLUMNAR_VERSION, n_rows=len(df), columns=columns)
+    with open(os.path.join(tmp_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=1)
+
+    if os.path.exists(directory):
+        shutil.rmtree(directory)
+    os.replace(tmp_dir, directory)
+
+    return manifest
+
+
+def read_manifest(directory):
+    path = os.path.join(directory, 'manifest.json')
+    if not os.path.exists(path):
+        return None
+
+    with open(path) as f:
+        manifest = json.load(f)
+
+    if manifest.get('version') != COLUMNAR_VERSION:
+        return None
 
-def read_df(path):
+    return manifest
+
+
+def read_columnar(directory, manifest=None, mmap=True):
+    if manifest is None:
+        manifest = read_manifest(directory)
+
+    with span('read_columnar', rows=manifest['n_rows']):
+        return _read_columnar(directory, manifest, mmap)
+
+
+def _read_columnar(directory, manifest, mmap):
+
+    # Copy-on-write maps: pages are shared with the OS cache and a caller writing to the frame never
+    # touches the files
+    mmap_mode = 'c' if mmap else None
+    data = {}
+    for icol in manifest['columns']:
+        values = np.load(os.path.join(directory, icol['file']), mmap_mode=mmap_mode, allow_pickle=False)
+        data[icol['name']] = values.view(np.ndarray)
+
+    return pd.DataFrame(data, copy=False)
+
+
+def _read_csv(path):
     raw_df = pd.read_csv(path)
     raw_df.rename(columns={raw_df.columns.values[0]: 'id'}, inplace=True)
 
     return raw_df
 
 
+def read_df(path, cache=True, cache_dir=None, downcast=False, downcast_floats=False):
+    # The cached frame has the dtypes of a plain CSV read. downcast=True narrows integer columns to their range
+    # (e.g. int8 counters, which wrap around in later arithmetic) and float64 columns where float32 is lossless;
+    # downcast_floats=True narrows every float64 column
+    with span('read_df') as s:
+        df = _read_df(path, cache, cache_dir, downcast or downcast_floats, downcast_floats)
+        s.rows = len(df)
+
+    return df
+
+
+def _read_df(path, cache, cache_dir, downcast, downcast_floats):
+    if cache is False:
+        return _read_csv(path)
+
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(path)), '.cache')
+
+    suffix = '.f32' if downcast_floats else '.small' if downcast else ''
+    directory = os.path.join(cache_dir, os.path.basename(path) + suffix)
+
+    # The content hash is only recomputed when the file's size or mtime differ from what the cache saw.
+    # Caches written with other downcast settings (or before the setting was recorded) are rewritten
+    stat = file_stat(path)
+    manifest = read_manifest(directory)
+    if manifest is not None and manifest.get('downcast') == downcast:
+        if manifest['source_stat'] == stat:
+            return read_columnar(directory, manifest)
+
+        if manifest['source_fingerprint'] == file_fingerprint(path):
+            manifest['source_stat'] = stat
+            try:
+                with open(os.path.join(directory, 'manifest.json'), 'w') as f:
+                    json.dump(manifest, f, indent=1)
+            except OSError:
+                pass
+
+            return read_columnar(directory, manifest)
+
+    raw_df = _read_csv(path)
+    try:
+        manifest = write_columnar(raw_df, directory, manifest={'source_stat': stat,
+                                                              'source_fingerprint': file_fingerprint(path),
+                                                              'downcast': downcast},
+                                  downcast=downcast, downcast_floats=downcast_floats)
+
+    except OSError:
+        # e.g. a read-only data directory: the CSV read is all we get
+        return raw_df
+
+    return read_columnar(directory, manifest)
+
+
 def get_xy(df):
     X = df.drop(columns=['SeriousDlqin2yrs'])
     y = df['SeriousDlqin2yrs']
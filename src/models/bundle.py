@@ -0,0 +1,302 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from src.data.utils import RAW_COLUMNS
+
+BUNDLE_FORMAT = 'credit-model-bundle'
+BUNDLE_VERSION = 1
+
+DEFAULT_INPUT_COLUMNS = [icol for icol in RAW_COLUMNS if icol != 'SeriousDlqin2yrs']
+
+TREE_META = ('feature_names', 'max_depth', 'base_margin', 'strict', 'float32_inputs')
+SCORECARD_ARRAYS = ('splits', 'points', 'special_codes', 'special_points')
+WOE_ARRAYS = ('splits', 'woe', 'special_codes', 'special_woe')
+
+
+class _ArrayWriter(object):
+    # Every numeric payload becomes its own .npy, so a loader can memory-map it; the manifest refers to them by
+    # name and records dtype and shape for validation
+    def __init__(self, directory):
+        self.directory = directory
+        self.arrays = {}
+
+    def add(self, values):
+        values = np.ascontiguousarray(values)
+        assert values.dtype != object
+
+        name = f"a_{len(self.arrays):04d}"
+        np.save(os.path.join(self.directory, 'arrays', name + '.npy'), values, allow_pickle=False)
+        self.arrays[name] = {'dtype': values.dtype.str, 'shape': list(values.shape)}
+
+        return name
+
+
+def _compile_member(model):
+    # Members are stored as the numpy-only scorers: GBM wrappers as CompiledTrees, a fitted logistic
+    # regression as a Scorecard with only linear terms (logit = const + sum of coef * x, as GLM.predict)
+    from src.models.scorecard import Scorecard
+    from src.models.trees import CompiledTrees, compile_lightgbm, compile_xgboost
+
+    if isinstance(model, (Scorecard, CompiledTrees)):
+        return model
+
+    library = getattr(model, 'dataset_library', None)
+    if library == 'xgboost':
+        return compile_xgboost(model)
+
+    if library == 'lightgbm':
+        return compile_lightgbm(model)
+
+    params = getattr(getattr(model, 'model', None), 'params', None)
+    if params is not None:
+        linear = {icol: float(icoef) for icol, icoef in params.items() if icol != 'const'}
+        return Scorecard(params.get('const', 0.0), {}, linear=linear)
+
+    raise ValueError(f"Can't bundle a member of type {type(model).__name__}")
+
+
+def _member_entry(model, writer):
+    from src.models.scorecard import Scorecard
+
+    model = _compile_member(model)
+
+    if isinstance(model, Scorecard):
+        features = {}
+        for icol, ifeature in model.features.items():
+            features[icol] = {ikey: writer.add(ifeature[ikey]) for ikey in SCORECARD_ARRAYS}
+            features[icol]['missing_points'] = float(ifeature['missing_points'])
+
+        return {'kind': 'scorecard', 'intercept': model.intercept, 'linear': model.linear, 'features': features}
+
+    entry = {'kind': 'trees', 'arrays': {ikey: writer.add(getattr(model, ikey)) for ikey in model.ARRAYS}}
+    entry.update({ikey: getattr(model, ikey) for ikey in TREE_META})
+
+    return entry
+
+
+def _transform_entry(transform, writer):
+    from src.data.transforms.cache import CachedTransform
+    from src.data.transforms.pipeline import Pipeline
+
+    if isinstance(transform, CachedTransform):
+        transform = transform.transform
+
+    if transform is None:
+        return {'kind': 'none'}
+
+    if isinstance(transform, Pipeline):
+        return {'kind': 'pipeline', 'spec': transform.to_spec()}
+
+    # WoETransformBase or CompiledWoETransform: only the compiled bin tables are kept, not the OptimalBinning
+    # objects, so loading doesn't import optbinning
+    if getattr(transform, 'compiled', None) is not None:
+        tables = {}
+        for icol, itable in transform.compiled.tables.items():
+            tables[icol] = {ikey: writer.add(itable[ikey]) for ikey in WOE_ARRAYS}
+            tables[icol]['missing_woe'] = float(itable['missing_woe'])
+
+        return {'kind': 'woe', 'tables': tables, 'drop_columns': list(transform.vars_to_exclude)}
+
+    raise ValueError(f"Can't bundle a transform of type {type(transform).__name__}")
+
+
+def save_bundle(model, directory, input_columns=None, metadata=None):
+    # model: an Ensemble, or a single model scored on untransformed inputs. Written to a scratch directory and
+    # moved into place at the end, as write_columnar
+    from src.models.ensemble import Ensemble
+
+    if not isinstance(model, Ensemble):
+        ensemble = Ensemble(n_jobs=1)
+        ensemble.add_model(model)
+        model = ensemble
+
+    parent = os.path.dirname(os.path.abspath(directory))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent)
+    os.makedirs(os.path.join(tmp_dir, 'arrays'))
+
+    writer = _ArrayWriter(tmp_dir)
+
+    # Transforms shared by several members (by identity, as Ensemble.plan) are stored once
+    transforms, members = [], []
+    for itransform, imodels in model.plan():
+        transforms.append(_transform_entry(itransform, writer))
+        for imodel in imodels:
+            members.append(dict(_member_entry(imodel['model'], writer), weight=float(imodel['weight']),
+                                transform=len(transforms) - 1, stage=imodel.get('stage', 0)))
+
+    manifest = {
+        'format': BUNDLE_FORMAT,
+        'version': BUNDLE_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'numpy_version': np.__version__,
+        'metadata': metadata or {},
+        'input_columns': list(DEFAULT_INPUT_COLUMNS if input_columns is None else input_columns),
+        'n_jobs': model.n_jobs,
+        'cascade_band': None if model.cascade_band is None else list(model.cascade_band),
+        'cascade_maps': None if model.cascade_maps is None else [[writer.add(x_knots), writer.add(y_knots)]
+                                                                 for x_knots, y_knots in model.cascade_maps],
+        'transforms': transforms,
+        'members': members,
+        'arrays': writer.arrays,
+    }
+    with open(os.path.join(tmp_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=1)
+
+    if os.path.exists(directory):
+        shutil.rmtree(directory)
+    os.replace(tmp_dir, directory)
+
+    return manifest
+
+
+def _output_columns(entry, input_columns):
+    from src.data.transforms.pipeline import Pipeline
+
+    if entry['kind'] == 'pipeline':
+        return list(Pipeline.from_spec(entry['spec']).plan(input_columns).keys())
+
+    if entry['kind'] == 'woe':
+        return [icol for icol in input_columns if icol not in entry['drop_columns']]
+
+    return list(input_columns)
+
+
+def validate_manifest(manifest, directory):
+    # Everything that would otherwise fail at the first predict: format, array files, references between
+    # entries, and that every member's features come out of its transform
+    if manifest.get('format') != BUNDLE_FORMAT or manifest.get('version') != BUNDLE_VERSION:
+        raise ValueError(f"{directory} is not a version {BUNDLE_VERSION} model bundle")
+
+    for iname in manifest['arrays']:
+        if not os.path.exists(os.path.join(directory, 'arrays', iname + '.npy')):
+            raise ValueError(f"Array {iname} is missing from {directory}")
+
+    for itransform in manifest['transforms']:
+        if itransform['kind'] not in ('none', 'pipeline', 'woe'):
+            raise ValueError(f"Unknown transform kind {itransform['kind']}")
+        if itransform['kind'] == 'woe':
+            missing = set(itransform['tables']) - set(manifest['input_columns'])
+            if missing:
+                raise ValueError(f"WoE tables for columns that are not inputs: {sorted(missing)}")
+
+    if not manifest['members']:
+        raise ValueError(f"{directory} has no members")
+
+    for i, imember in enumerate(manifest['members']):
+        if imember['kind'] not in ('trees', 'scorecard'):
+            raise ValueError(f"Unknown member kind {imember['kind']}")
+        if not 0 <= imember['transform'] < len(manifest['transforms']):
+            raise ValueError(f"Member {i} refers to transform {imember['transform']}")
+
+        if imember['kind'] == 'trees':
+            required = imember['feature_names']
+        else:
+            required = list(imember['features']) + list(imember['linear'])
+
+        available = _output_columns(manifest['transforms'][imember['transform']], manifest['input_columns'])
+        missing = set(required) - set(available)
+        if missing:
+            raise ValueError(f"Member {i} needs columns its transform doesn't produce: {sorted(missing)}")
+
+
+class ModelBundle(object):
+    # A loaded bundle: an Ensemble of numpy-only members whose arrays are memory-mapped read-only, so worker
+    # processes loading the same bundle share their pages. Pickles as its path; a worker reloads it from disk
+    def __init__(self, directory, mmap=True):
+        self.directory = directory
+        self.mmap = mmap
+
+        with open(os.path.join(directory, 'manifest.json')) as f:
+            self.manifest = json.load(f)
+
+        validate_manifest(self.manifest, directory)
+
+        self.arrays = self._load_arrays()
+        self.model = self._build()
+
+    def _load_arrays(self):
+        mmap_mode = 'r' if self.mmap else None
+
+        arrays = {}
+        for iname, ispec in self.manifest['arrays'].items():
+            values = np.load(os.path.join(self.directory, 'arrays', iname + '.npy'), mmap_mode=mmap_mode,
+                             allow_pickle=False)
+            if values.dtype.str != ispec['dtype'] or list(values.shape) != ispec['shape']:
+                raise ValueError(f"Array {iname} is {values.dtype.str} {values.shape}, the manifest says "
+                                 f"{ispec['dtype']} {tuple(ispec['shape'])}")
+
+            arrays[iname] = values.view(np.ndarray)
+
+        return arrays
+
+    def _build_transform(self, entry):
+        from src.data.transforms.pipeline import Pipeline
+        from src.data.transforms.woe_compiled import CompiledWoETable, CompiledWoETransform
+
+        if entry['kind'] == 'none':
+            return None
+
+        if entry['kind'] == 'pipeline':
+            return Pipeline.from_spec(entry['spec'])
+
+        tables = {}
+        for icol, itable in entry['tables'].items():
+            tables[icol] = {ikey: self.arrays[itable[ikey]] for ikey in WOE_ARRAYS}
+            tables[icol]['missing_woe'] = itable['missing_woe']
+
+        return CompiledWoETransform(CompiledWoETable(tables), drop_columns=entry['drop_columns'])
+
+    def _build_member(self, entry):
+        from src.models.scorecard import Scorecard
+        from src.models.trees import CompiledTrees
+
+        if entry['kind'] == 'trees':
+            arrays = {ikey: self.arrays[iname] for ikey, iname in entry['arrays'].items()}
+            return CompiledTrees(**{ikey: entry[ikey] for ikey in TREE_META}, **arrays)
+
+        features = {}
+        for icol, ifeature in entry['features'].items():
+            features[icol] = {ikey: self.arrays[ifeature[ikey]] for ikey in SCORECARD_ARRAYS}
+            features[icol]['missing_points'] = ifeature['missing_points']
+
+        return Scorecard(entry['intercept'], features, linear=entry['linear'])
+
+    def _build(self):
+        from src.models.ensemble import Ensemble
+
+        transforms = [self._build_transform(ientry) for ientry in self.manifest['transforms']]
+
+        cascade_maps = self.manifest.get('cascade_maps')
+        if cascade_maps is not None:
+            cascade_maps = [(self.arrays[x_knots], self.arrays[y_knots]) for x_knots, y_knots in cascade_maps]
+
+        ensemble = Ensemble(n_jobs=self.manifest['n_jobs'], cascade_band=self.manifest.get('cascade_band'),
+                            cascade_maps=cascade_maps)
+        for imember in self.manifest['members']:
+            ensemble.add_model(self._build_member(imember), weight=imember['weight'],
+                               transform=transforms[imember['transform']], stage=imember.get('stage', 0))
+
+        return ensemble
+
+    @property
+    def input_columns(self):
+        return self.manifest['input_columns']
+
+    def predict(self, X):
+        return self.model.predict(X)
+
+    def __getstate__(self):
+        return {'directory': self.directory, 'mmap': self.mmap}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+
+def load_bundle(directory, mmap=True):
+    return ModelBundle(directory, mmap=mmap)
@@ -0,0 +1,94 @@
+import importlib
+import os
+
+import numpy as np
+
+from src.utils.misc import fingerprint
+
+EXTENSIONS = {'xgboost': '.dmatrix', 'lightgbm': '.lgb.bin'}
+
+
+class PreparedDataset(object):
+    # A training matrix converted once into the library's own dataset (xgb.DMatrix, or lgb.Dataset, whose bins
+    # are computed once); folds, trials and refits take row subsets of it instead of converting pandas frames
+    # again. With cache_dir the dataset is kept on disk under a key of its content, reused by later runs, and
+    # worker processes reload it from there instead of receiving it pickled
+    def __init__(self, library, handle=None, path=None, params=None):
+        assert library in EXTENSIONS, f"Unknown library {library}"
+
+        self.library = library
+        self.path = path
+        self.params = {} if params is None else params
+        self._handle = handle
+
+    @classmethod
+    def from_frame(cls, library, X, y, cache_dir=None, params=None):
+        # params: dataset construction parameters, e.g. {'max_bin': 63} for LightGBM. Training must use the same
+        params = {} if params is None else dict(params)
+
+        path = None
+        if cache_dir is not None:
+            module = importlib.import_module(library)
+            key = fingerprint(library, module.__version__, X, y, params)
+            path = os.path.join(cache_dir, key + EXTENSIONS[library])
+
+            if os.path.exists(path):
+                return cls(library, path=path, params=params)
+
+        dataset = cls(library, handle=cls._build(library, X, y, params), params=params)
+        if path is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            dataset.save(path)
+
+        return dataset
+
+    @classmethod
+    def for_model(cls, model_class, X, y, cache_dir=None, params=None):
+        return cls.from_frame(model_class.dataset_library, X, y, cache_dir=cache_dir, params=params)
+
+    @staticmethod
+    def _build(library, X, y, params):
+        if library == 'xgboost':
+            import xgboost as xgb
+            return xgb.DMatrix(X, label=y, **params)
+
+        import lightgbm as lgb
+        # Raw data is kept so that subsets can be taken after construction
+        return lgb.Dataset(X, label=y, params=dict({'verbose': -1}, **params), free_raw_data=False).construct()
+
+    def save(self, path):
+        tmp_path = path + f".tmp{os.getpid()}"
+        self.handle.save_binary(tmp_path)
+        os.replace(tmp_path, path)
+        self.path = path
+
+    @property
+    def handle(self):
+        if self._handle is None:
+            if self.library == 'xgboost':
+                import xgboost as xgb
+                self._handle = xgb.DMatrix(self.path)
+            else:
+                import lightgbm as lgb
+                self._handle = lgb.Dataset(self.path, params=dict({'verbose': -1}, **self.params)).construct()
+
+        return self._handle
+
+    def subset(self, index=None):
+        if index is None:
+            return self.handle
+
+        # Both libraries keep their own row order; fold indices come sorted already
+        index = np.sort(np.asarray(index)).astype(np.int32)
+        if self.library == 'xgboost':
+            return self.handle.slice(index)
+
+        return self.handle.subset(index)
+
+    def __getstate__(self):
+        if self.path is None:
+            raise ValueError("A PreparedDataset needs a cache_dir to be sent to another process")
+
+        state = self.__dict__.copy()
+        state['_handle'] = None
+        return state
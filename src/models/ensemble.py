@@ -1,45 +1,195 @@
-import copy
 import numpy as np
 
+from concurrent.futures import ThreadPoolExecutor
+from src.utils.instrument import span
+from src.utils.misc import InlineExecutor
+
 
 class Ensemble(object):
-    def __init__(self):
+    # cascade_band=(low, high) turns on cascade scoring: members run stage by stage (see add_model), and after
+    # each stage only the rows whose running ensemble score lies inside [low, high] go on to the next. Rows
+    # that stop early keep the score of the stages they went through (mapped by fit_cascade when it was run);
+    # rows that reach the last stage get the same score as without the cascade (bit for bit when the members
+    # were added in stage order)
+    def __init__(self, n_jobs=None, cascade_band=None, cascade_maps=None):
         self.models = []
+        self.n_jobs = n_jobs
+        self.cascade_band = cascade_band
+        self.cascade_maps = cascade_maps
 
-    def add_model(self, model, weight=1.0, transform=None):
+    def add_model(self, model, weight=1.0, transform=None, stage=0):
+        # stage only matters in cascade mode: cheap members (e.g. the WoE scorecard) at 0, the GBMs after
         self.models.append({
             'model': model,
             'weight': weight,
             'transform': transform,
+            'stage': stage,
         })
 
+    def plan(self, models=None):
+        # Members grouped by transform (by identity), so each distinct transform runs once per predict
+        groups = {}
+        for imodel in self.models if models is None else models:
+            itr = imodel['transform']
+            groups.setdefault(id(itr), (itr, []))[1].append(imodel)
+
+        return list(groups.values())
+
+    @property
+    def stages(self):
+        return sorted(set(imodel['stage'] for imodel in self.models))
+
+    @staticmethod
+    def _transform(transform, X):
+        if transform is None:
+            return X
+
+        Xc, _ = transform(X)
+        return Xc
+
+    @staticmethod
+    def _predict_member(imodel, transformed):
+        ires = imodel['model'].predict(transformed.result())
+        if not isinstance(ires, np.ndarray):
+            ires = ires.to_numpy()
+
+        return ires
+
     def predict(self, X):
-        results = None
-        weights = 0
+        with span('predict', rows=len(X), model='Ensemble'):
+            if self.cascade_band is not None:
+                return self._predict_cascade(X, self.cascade_band)[0]
 
-        for imodel in self.models:
-            imodel_mdl = imodel['model']
-            imodel_tr = imodel['transform']
-            iweight = imodel['weight']
+            results, weights = self._weighted_sum(self.models, X)
+            results /= weights
 
-            if imodel_tr is not None:
-                Xc = copy.deepcopy(X)
-                Xc, _ = imodel_tr(Xc)
+            return results
 
-            ires = imodel_mdl.predict(Xc)
-            if not isinstance(ires, np.ndarray):
-                ires = ires.to_numpy()
+    def _weighted_sum(self, models, X, results=None, weights=0):
+        # results / weights: running totals to add the members to (a cascade's earlier stages), so that the floats
+        # add up in member order across stages too
+        plan = self.plan(models)
 
-            iwres = iweight * ires
+        n_jobs = self.n_jobs or len(models)
+        executor = ThreadPoolExecutor(max_workers=n_jobs) if n_jobs > 1 else InlineExecutor()
 
-            if results is None:
-                results = iwres
+        # XGBoost, LightGBM and numpy release the GIL, so threads are enough to overlap members. Transforms are
+        # submitted first; the pool is FIFO so a member only ever waits on a transform that has already started
+        with executor:
+            transformed = [executor.submit(self._transform, itr, X) for itr, _ in plan]
 
-            else:
+            futures = {}
+            for itransformed, (_, imodels) in zip(transformed, plan):
+                for imodel in imodels:
+                    futures[id(imodel)] = executor.submit(self._predict_member, imodel, itransformed)
+
+            results = np.zeros(len(X), dtype=np.float64) if results is None else results.copy()
+            iwres = np.empty_like(results)
+
+            # Summed in member order, not transform-group order, so the floats add up as in the serial loop
+            for imodel in models:
+                np.multiply(futures[id(imodel)].result(), imodel['weight'], out=iwres)
                 results += iwres
+                weights += imodel['weight']
+
+        return results, weights
+
+    def _running_score(self, i, score):
+        # Stage i's running score on the scale of the full ensemble, once fit_cascade has been run
+        if self.cascade_maps is None:
+            return score
+
+        x_knots, y_knots = self.cascade_maps[i]
+        return np.interp(score, x_knots, y_knots)
+
+    def _predict_cascade(self, X, band):
+        # Also returns the number of rows that went through each stage
+        low, high = band
+        stages = self.stages
+
+        # totals: running weighted sums of the rows still going, all of which have been through the same members
+        totals = np.zeros(len(X), dtype=np.float64)
+        weights = 0
+        results = np.empty(len(X), dtype=np.float64)
+        rows = np.arange(len(X))
+        n_rows = []
+
+        for i, istage in enumerate(stages):
+            if i > 0:
+                iscore = self._running_score(i - 1, totals / weights)
+                iescalate = (iscore >= low) & (iscore <= high)
+
+                results[rows[~iescalate]] = iscore[~iescalate]
+                rows, totals = rows[iescalate], totals[iescalate]
+
+            n_rows.append(len(rows))
+            if len(rows) == 0:
+                continue
+
+            with span('cascade_stage', rows=len(rows), stage=istage):
+                iX = X if len(rows) == len(X) else X.iloc[rows]
+                totals, weights = self._weighted_sum([imodel for imodel in self.models
+                                                      if imodel['stage'] == istage], iX, totals, weights)
+
+        if len(rows):
+            results[rows] = totals / weights
+
+        return results, n_rows
+
+    def fit_cascade(self, X, max_rows=200_000, random_state=0):
+        # Maps each stage's running score to the full ensemble score with an isotonic fit on (a sample of) X,
+        # so rows that stop early are ranked and banded on the same scale as the rows that go on. Without it a
+        # cheap member's probabilities (e.g. a class-weighted logistic regression) don't compare with the
+        # blended ones
+        from sklearn.isotonic import IsotonicRegression
+
+        if len(X) > max_rows:
+            X = X.iloc[np.sort(np.random.default_rng(random_state).choice(len(X), max_rows, replace=False))]
+
+        stages = self.stages
+        totals = np.zeros(len(X), dtype=np.float64)
+        weights = 0
+        running = []
+        for istage in stages:
+            totals, weights = self._weighted_sum([imodel for imodel in self.models if imodel['stage'] == istage],
+                                                 X, totals, weights)
+            running.append(totals / weights)
+
+        self.cascade_maps = []
+        for iscore in running[:-1]:
+            iso = IsotonicRegression(out_of_bounds='clip').fit(iscore, running[-1])
+            self.cascade_maps.append((iso.X_thresholds_, iso.y_thresholds_))
+
+        return self
+
+    def cascade_report(self, X, y, cascade_band=None):
+        # Cascade against full ensembling on labelled rows: share of rows reaching each stage, member
+        # predictions saved, and the AUC of both
+        from sklearn.metrics import roc_auc_score
+
+        band = self.cascade_band if cascade_band is None else cascade_band
+        assert band is not None, "No cascade_band to report on"
+
+        full, weights = self._weighted_sum(self.models, X)
+        full /= weights
+
+        cascade, n_rows = self._predict_cascade(X, band)
 
-            weights += iweight
+        stages = self.stages
+        n_members = [sum(imodel['stage'] == istage for imodel in self.models) for istage in stages]
+        member_rows = sum(in_rows * in_members for in_rows, in_members in zip(n_rows, n_members))
 
-        results = results / weights
+        auc_full = roc_auc_score(y, full)
+        auc_cascade = roc_auc_score(y, cascade)
 
-        return results
+        return {
+            'rows': len(X),
+            'cascade_band': list(band),
+            'stage_rows': dict(zip(stages, n_rows)),
+            'stage_fraction': {istage: in_rows / max(len(X), 1) for istage, in_rows in zip(stages, n_rows)},
+            'member_predict_fraction': member_rows / max(len(X) * sum(n_members), 1),
+            'auc_full': auc_full,
+            'auc_cascade': auc_cascade,
+            'auc_difference': auc_cascade - auc_full,
+            'max_abs_difference': float(np.max(np.abs(cascade - full))) if len(X) else 0.0,
+        }
@@ -1,38 +1,188 @@
-import copy
+import os
+import time
 import numpy as np
 
-from sklearn.model_selection import StratifiedKFold, train_test_split
+from concurrent.futures import ProcessPoolExecutor
 from src.data.utils import get_xy
+from src.models.registry import get_model_class
+from src.models.shared_frame import SharedFrame
+from src.utils.instrument import span
 from src.utils.eval import eval_auc
 
 
-def kfold_fit(df, n_splits, model_class, model_kwargs=None):
-    if model_kwargs is None:
-        model_kwargs = {}
+def _take(obj, index):
+    if isinstance(obj, SharedFrame):
+        return obj.take(index)
 
-    X, y = get_xy(df)
-    skf = StratifiedKFold(n_splits=n_splits, shuffle=True)
+    return obj if index is None else obj.iloc[index]
 
-    print(f"kfold x-val for k={skf.get_n_splits(X, y)}")
 
-    for irun, (train_index, test_index) in enumerate(skf.split(X, y)):
-        X_train, X_test = copy.deepcopy(X.iloc[train_index, :]), copy.deepcopy(X.iloc[test_index, :])
-        y_train, y_test = copy.deepcopy(y.iloc[train_index]), copy.deepcopy(y.iloc[test_index])
+def _best_iteration(model):
+    # Set by XGBoost/LightGBM when early stopping was used, None otherwise
+    for iattr in ('best_iteration', 'best_iteration_'):
+        try:
+            res = getattr(model.model, iattr)
+        except AttributeError:
+            continue
 
-        lg_model = model_class(**model_kwargs)
-        lg_model.fit(X_train, y_train)
-        iauc = eval_auc(lg_model, X_test, y_test)
+        if res is not None and res >= 0:
+            return int(res)
 
-        print(f"run {irun + 1} - class [0 1] for train={np.bincount(y_train)}, "
-              f"test={np.bincount(y_test)} --> AUC={iauc:.3f}")
+    return None
 
-    final_model = model_class()
-    final_model.fit(X, y)
 
-    return final_model
+def _fit_fold(model_class, model_kwargs, X, y, train_index, test_index, early_stopping_rounds=None, dataset=None,
+              valid_index=None, n_threads=None):
+    X_test = None if test_index is None else _take(X, test_index)
+
+    # With a PreparedDataset the model trains on row subsets of it; predictions still come from the frame
+    if dataset is not None:
+        X_train, y_train = dataset.subset(train_index), None
+    else:
+        X_train, y_train = _take(X, train_index), _take(y, train_index)
+
+    # Early stopping, when asked for, watches valid_index, or else the fold's own test rows
+    fit_params = {}
+    if early_stopping_rounds is not None and test_index is not None:
+        eval_index = test_index if valid_index is None else valid_index
+        if dataset is not None:
+            eval_set = [(dataset.subset(eval_index), None)]
+        elif valid_index is None:
+            eval_set = [(X_test, _take(y, test_index))]
+        else:
+            eval_set = [(_take(X, valid_index), _take(y, valid_index))]
+        fit_params = {'eval_set': eval_set, 'early_stopping_rounds': early_stopping_rounds}
+
+    start = time.perf_counter()
+    model = model_class(**model_kwargs)
+
+    # XGBoost/LightGBM use every core by default: n_jobs worker processes doing so would run cores^2 threads. Each
+    # worker gets its share of the cores instead, unless model_kwargs sets n_jobs; the refit model gets it back after
+    limit_threads = n_threads is not None and 'n_jobs' not in model_kwargs and hasattr(model.model, 'set_params')
+    if limit_threads:
+        default_threads = model.model.get_params()['n_jobs']
+        model.model.set_params(n_jobs=n_threads)
+
+    model.fit(X_train, y_train, **fit_params)
+    fit_time = time.perf_counter() - start
+
+    # A native Booster (PreparedDataset) keeps the training thread count
+    if limit_threads and hasattr(model.model, 'set_params'):
+        model.model.set_params(n_jobs=default_threads)
+
+    if test_index is None:
+        return model, fit_time, None, None
+
+    y_pred = model.predict(X_test)
+    if not isinstance(y_pred, np.ndarray):
+        y_pred = y_pred.to_numpy()
+
+    return None, fit_time, y_pred, _best_iteration(model) if fit_params else None
+
+
+def cross_validate(df, n_splits, model_class, model_kwargs=None, n_jobs=None, random_state=None,
+                   early_stopping_rounds=None, refit=True, dataset=None, validation_fraction=None):
+    # dataset: a PreparedDataset of the same rows, see src/models/datasets.py. By default early stopping watches
+    # each fold's test rows, which makes the OOF AUC optimistic; validation_fraction holds out that share of
+    # each fold's training rows (stratified) for early stopping instead
+    if model_kwargs is None:
+        model_kwargs = {}
+
+    if isinstance(model_class, str):
+        model_class = get_model_class(model_class)
+
+    # Fits in worker processes are not recorded, only the time spent waiting for them
+    with span('cross_validate', rows=len(df), model=model_class.__name__):
+        return _cross_validate(df, n_splits, model_class, model_kwargs, n_jobs, random_state, early_stopping_rounds,
+                               refit, dataset, validation_fraction)
+
+
+def _cross_validate(df, n_splits, model_class, model_kwargs, n_jobs, random_state, early_stopping_rounds, refit,
+                    dataset, validation_fraction):
+    from sklearn.metrics import roc_auc_score
+    from sklearn.model_selection import StratifiedKFold, train_test_split
+
+    X, y = get_xy(df)
+    skf = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=random_state)
+    folds = list(skf.split(X, y))
+
+    # The folds and the final model (test_index=None) are independent jobs: (train, test, early stopping) rows
+    jobs = []
+    for train_index, test_index in folds:
+        if early_stopping_rounds is not None and validation_fraction is not None:
+            train_index, valid_index = train_test_split(train_index, test_size=validation_fraction,
+                                                        stratify=y.to_numpy()[train_index],
+                                                        random_state=random_state)
+            jobs.append((np.sort(train_index), test_index, np.sort(valid_index)))
+        else:
+            jobs.append((train_index, test_index, None))
+
+    if refit:
+        jobs.append((None, None, None))
+
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+    n_jobs = min(n_jobs, len(jobs))
+    n_threads = max((os.cpu_count() or 1) // n_jobs, 1)
+
+    if n_jobs > 1:
+        # X and y go to shared memory once; each job only ships its index arrays to the worker
+        X_shared, y_shared = SharedFrame(X), SharedFrame(y)
+        try:
+            with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+                futures = [executor.submit(_fit_fold, model_class, model_kwargs, X_shared, y_shared, itrain, itest,
+                                           early_stopping_rounds, dataset, ivalid, n_threads)
+                           for itrain, itest, ivalid in jobs]
+                results = [ifuture.result() for ifuture in futures]
+
+        finally:
+            X_shared.close()
+            y_shared.close()
+
+    else:
+        results = [_fit_fold(model_class, model_kwargs, X, y, itrain, itest, early_stopping_rounds, dataset, ivalid)
+                   for itrain, itest, ivalid in jobs]
+
+    y_values = y.to_numpy()
+    oof_pred = np.full(len(y), np.nan)
+    fold_auc, fold_fit_time, fold_best_iteration = [], [], []
+
+    for (_, test_index), (_, fit_time, y_pred, best_iteration) in zip(folds, results):
+        oof_pred[test_index] = y_pred
+        fold_auc.append(roc_auc_score(y_values[test_index], y_pred))
+        fold_fit_time.append(fit_time)
+        fold_best_iteration.append(best_iteration)
+
+    final_model, final_fit_time = results[-1][:2] if refit else (None, None)
+
+    return {
+        'final_model': final_model,
+        'final_fit_time': final_fit_time,
+        'folds': folds,
+        'fold_auc': fold_auc,
+        'fold_fit_time': fold_fit_time,
+        'fold_best_iteration': fold_best_iteration,
+        'oof_pred': oof_pred,
+        'oof_auc': roc_auc_score(y_values, oof_pred),
+    }
+
+
+def kfold_fit(df, n_splits, model_class, model_kwargs=None, n_jobs=None, dataset=None):
+    print(f"kfold x-val for k={n_splits}")
+
+    cv = cross_validate(df, n_splits, model_class, model_kwargs=model_kwargs, n_jobs=n_jobs, dataset=dataset)
+
+    y = df['SeriousDlqin2yrs'].to_numpy()
+    for irun, ((train_index, test_index), iauc) in enumerate(zip(cv['folds'], cv['fold_auc'])):
+        print(f"run {irun + 1} - class [0 1] for train={np.bincount(y[train_index])}, "
+              f"test={np.bincount(y[test_index])} --> AUC={iauc:.3f}")
+
+    return cv['final_model']
 
 
 def df_train_test_stratify_split(df, test_size=0.3):
+    from sklearn.model_selection import train_test_split
+
     X, y = get_xy(df)
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, stratify=y)
 
@@ -43,6 +193,9 @@ def fit_and_eval(model_class, X_train, X_test, y_train, y_test, model_kwargs=Non
     if model_kwargs is None:
         model_kwargs = {}
 
+    if isinstance(model_class, str):
+        model_class = get_model_class(model_class)
+
     final_model = model_class(**model_kwargs)
     final_model.fit(X_train, y_train)
     iauc = eval_auc(final_model, X_test, y_test)
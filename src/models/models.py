@@ -1,13 +1,10 @@
-import joblib
-import lightgbm as lgb
 import numpy as np
-import statsmodels.api as sm
-import xgboost as xgb
 
 from abc import ABC, abstractmethod
-from statsmodels.genmod.generalized_linear_model import GLM
-from statsmodels.genmod.families import Binomial
-from statsmodels.genmod.families.links import logit
+from src.utils.instrument import n_rows, span
+
+# Model libraries are imported where they are first needed (see src/models/registry.py): a process that only
+# scores with one model type should not pay for importing the other two
 
 
 class ModelAbstractClass(ABC):
@@ -26,32 +23,78 @@ class ModelAbstractClass(ABC):
     def _predict(self, X):
         pass
 
-    def fit(self, X, y):
-        self._fit(X, y)
+    def fit(self, X, y, **fit_params):
+        with span('fit', rows=n_rows(X), model=type(self).__name__):
+            self._fit(X, y, **fit_params)
+
         self.__fitted = True
 
     def predict(self, X):
         assert self.__fitted is True
-        return self._predict(X)
+
+        with span('predict', rows=n_rows(X), model=type(self).__name__):
+            return self._predict(X)
 
     def save(self, path):
+        import joblib
+
         assert self.__fitted is True
         joblib.dump(self.model, path)
 
     def load(self, path):
+        import joblib
+
         self.model = joblib.load(path)
         self.__fitted = True
 
 
+def compress_design(X, y, weights):
+    import pandas as pd
+
+    # Collapse identical (features, label) rows into one row whose frequency weight is the sum of theirs.
+    # After WoE binning a few thousand distinct rows stand in for the whole training set
+    columns = [X[icol].to_numpy() for icol in X.columns] + [np.asarray(y)]
+
+    # Mixed-radix row key from the per-column codes; falls back to pandas grouping if it would overflow
+    key = np.zeros(len(X), dtype=np.int64)
+    radix = 1
+    for icolumn in columns:
+        icodes, iuniques = pd.factorize(icolumn, use_na_sentinel=False)
+        radix *= max(len(iuniques), 1)
+        if radix >= 2 ** 62:
+            key = pd.MultiIndex.from_arrays(columns).factorize()[0]
+            break
+
+        key = key * len(iuniques) + icodes
+
+    _, first, inverse = np.unique(key, return_index=True, return_inverse=True)
+
+    X_compressed = X.iloc[first].reset_index(drop=True)
+    y_compressed = pd.Series(np.asarray(y)[first], name=getattr(y, 'name', None))
+    weights_compressed = np.bincount(inverse.reshape(-1), weights=weights)
+
+    return X_compressed, y_compressed, weights_compressed
+
+
 class StatsModelsLogisticRegression(ModelAbstractClass):
-    def __init__(self, path=None):
+    def __init__(self, path=None, compress=False):
         super().__init__(path=path)
+        self.compress = compress
 
     def _fit(self, X, y):
-        y_count = np.bincount(y)
+        import statsmodels.api as sm
+        from statsmodels.genmod.generalized_linear_model import GLM
+        from statsmodels.genmod.families import Binomial
+        from statsmodels.genmod.families.links import logit
+
+        y_values = np.asarray(y)
+        y_count = np.bincount(y_values)
 
         y_w01 = y_count[0] / y_count[1]
-        y_w01_weights = [1 + k * (y_w01 - 1) for k in y]  # Upweight if class 1
+        y_w01_weights = 1 + y_values * (y_w01 - 1)  # Upweight if class 1
+
+        if self.compress:
+            X, y, y_w01_weights = compress_design(X, y, y_w01_weights)
 
         X = sm.add_constant(X)
 
@@ -59,45 +102,103 @@ class StatsModelsLogisticRegression(ModelAbstractClass):
         self.model = model.fit()
 
     def _predict(self, X):
-        X = sm.add_constant(X)
-        res = self.model.predict(X)
+        import pandas as pd
 
-        return res
+        # GLMResults.predict's arithmetic on [1, X], column-major as the frame it used to get (same bits), without
+        # sm.add_constant, whose per-column constant checks cost more than the prediction on small batches
+        exog = np.empty((len(X), X.shape[1] + 1), dtype=np.float64, order='F')
+        exog[:, 0] = 1
+        exog[:, 1:] = X
+        res = 1.0 / (1.0 + np.exp(-np.dot(exog, np.asarray(self.model.params))))
+
+        return pd.Series(res, index=X.index) if hasattr(X, 'index') else res
 
 
 class XGBoostClassifier(ModelAbstractClass):
-    def __init__(self, path=None, n_estimators=100, max_depth=3):
+    dataset_library = 'xgboost'
+
+    # Any other xgb.XGBClassifier parameter can be passed through params
+    def __init__(self, path=None, n_estimators=100, max_depth=3, **params):
         super().__init__(path=path)
 
         if self.model is None:
-            self.model = xgb.XGBClassifier(use_label_encoder=False,
-                                           eval_metric='logloss',
-                                           n_estimators=n_estimators,
-                                           max_depth=max_depth)
+            import xgboost as xgb
+
+            params = dict({'use_label_encoder': False, 'eval_metric': 'logloss'}, **params)
+            self.model = xgb.XGBClassifier(n_estimators=n_estimators,
+                                           max_depth=max_depth,
+                                           **params)
             self.__fitted = False
 
-    def _fit(self, X, y):
-        self.model.fit(X, y)
+    def _fit(self, X, y, eval_set=None, early_stopping_rounds=None):
+        import xgboost as xgb
+
+        # A DMatrix (e.g. from PreparedDataset) trains through the native API; the model becomes a Booster
+        if isinstance(X, xgb.DMatrix):
+            params = {k: v for k, v in self.model.get_xgb_params().items() if k != 'use_label_encoder'}
+            evals = [(ieval_X, f"validation_{i}") for i, (ieval_X, _) in enumerate(eval_set or [])]
+
+            self.model = xgb.train(params, X, num_boost_round=self.model.n_estimators, evals=evals,
+                                   early_stopping_rounds=early_stopping_rounds, verbose_eval=False)
+            return
+
+        # Early stopping watches the last eval_set; predict_proba then stops at the best iteration
+        if early_stopping_rounds is not None:
+            self.model.set_params(early_stopping_rounds=early_stopping_rounds)
+
+        self.model.fit(X, y, eval_set=eval_set, verbose=False)
         self.__fitted = True
 
     def _predict(self, X):
-        res = self.model.predict_proba(X)[:, 1]
+        if hasattr(self.model, 'predict_proba'):
+            return self.model.predict_proba(X)[:, 1]
+
+        import xgboost as xgb
 
-        return res
+        best_iteration = self.model.attr('best_iteration')
+        iteration_range = (0, int(best_iteration) + 1) if best_iteration is not None else (0, 0)
+        X = X if isinstance(X, xgb.DMatrix) else xgb.DMatrix(X)
+
+        return self.model.predict(X, iteration_range=iteration_range)
 
 
 class LightGBMClassifier(ModelAbstractClass):
-    def __init__(self, path=None, boosting_type='gbdt', n_estimators=100):
+    dataset_library = 'lightgbm'
+
+    # Any other lgb.LGBMClassifier parameter can be passed through params
+    def __init__(self, path=None, boosting_type='gbdt', n_estimators=100, **params):
         super().__init__(path=path)
         if self.model is None:
+            import lightgbm as lgb
+
             self.model = lgb.LGBMClassifier(boosting_type=boosting_type,
-                                            n_estimators=n_estimators)
+                                            n_estimators=n_estimators,
+                                            **params)
             self.__fitted = False
 
-    def _fit(self, X, y):
-        self.model.fit(X, y)
+    def _fit(self, X, y, eval_set=None, early_stopping_rounds=None):
+        import lightgbm as lgb
+
+        callbacks = None
+        if early_stopping_rounds is not None:
+            # Ignored by LightGBM for boosting_type='dart'
+            callbacks = [lgb.early_stopping(early_stopping_rounds, verbose=False)]
+
+        # An lgb.Dataset (e.g. from PreparedDataset) trains through the native API; the model becomes a Booster
+        if isinstance(X, lgb.Dataset):
+            params = {k: v for k, v in self.model.get_params().items()
+                      if v is not None and k not in ('n_estimators', 'class_weight', 'importance_type')}
+            params['objective'] = params.get('objective') or 'binary'
+
+            self.model = lgb.train(params, X, num_boost_round=self.model.n_estimators,
+                                   valid_sets=[ieval_X for ieval_X, _ in eval_set or []], callbacks=callbacks)
+            return
+
+        self.model.fit(X, y, eval_set=eval_set, callbacks=callbacks)
 
     def _predict(self, X):
-        res = self.model.predict_proba(X)[:, 1]
+        if hasattr(self.model, 'predict_proba'):
+            return self.model.predict_proba(X)[:, 1]
 
-        return res
+        # A Booster predicts probabilities for the binary objective, up to its best iteration when early stopped
+        return self.model.predict(X)
@@ -0,0 +1,34 @@
+import importlib
+
+# Model name -> (module, attribute). Nothing is imported until a model is asked for, and the model modules
+# import their library (xgboost, lightgbm, statsmodels) only when a model is built, fitted or loaded
+MODEL_REGISTRY = {
+    'StatsModelsLogisticRegression': ('src.models.models', 'StatsModelsLogisticRegression'),
+    'XGBoostClassifier': ('src.models.models', 'XGBoostClassifier'),
+    'LightGBMClassifier': ('src.models.models', 'LightGBMClassifier'),
+}
+
+MODEL_ALIASES = {
+    'logistic': 'StatsModelsLogisticRegression',
+    'statsmodels': 'StatsModelsLogisticRegression',
+    'xgboost': 'XGBoostClassifier',
+    'xgb': 'XGBoostClassifier',
+    'lightgbm': 'LightGBMClassifier',
+    'lgb': 'LightGBMClassifier',
+}
+
+
+def register_model(name, module, attribute=None, aliases=()):
+    MODEL_REGISTRY[name] = (module, name if attribute is None else attribute)
+    for ialias in aliases:
+        MODEL_ALIASES[ialias] = name
+
+
+def get_model_class(name):
+    key = MODEL_ALIASES.get(name.lower(), name)
+    if key not in MODEL_REGISTRY:
+        raise KeyError(f"Unknown model {name}; expected one of {sorted(MODEL_REGISTRY) + sorted(MODEL_ALIASES)}")
+
+    module, attribute = MODEL_REGISTRY[key]
+
+    return getattr(importlib.import_module(module), attribute)
@@ -0,0 +1,118 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from src.data.transforms.woe_compiled import bin_indices
+from src.utils.instrument import span
+
+
+class Scorecard(object):
+    # A fitted WoE logistic regression flattened into additive points: logit = intercept + sum of one points
+    # value per binned feature (+ coef * x for features that were not binned). Scoring needs numpy only
+    def __init__(self, intercept, features, linear=None):
+        self.intercept = float(intercept)
+        self.features = features
+        self.linear = {} if linear is None else linear
+
+    @classmethod
+    def from_model(cls, model, woe_transform):
+        params = model.model.params
+        tables = woe_transform.compiled.tables
+
+        features, linear = {}, {}
+        for icol, icoef in params.items():
+            if icol == 'const':
+                continue
+
+            icoef = float(icoef)
+            if icol in tables:
+                itable = tables[icol]
+                features[icol] = {
+                    'splits': itable['splits'],
+                    'points': icoef * itable['woe'],
+                    'missing_points': icoef * itable['missing_woe'],
+                    'special_codes': itable['special_codes'],
+                    'special_points': icoef * itable['special_woe'],
+                }
+
+            else:
+                linear[icol] = icoef
+
+        return cls(params.get('const', 0.0), features, linear=linear)
+
+    def decision_function(self, df):
+        logit = np.full(len(df), self.intercept)
+
+        for icol, ifeature in self.features.items():
+            x = np.asarray(df[icol], dtype=np.float64)
+
+            ipoints = ifeature['points'].take(bin_indices(ifeature['splits'], x))
+            ipoints[np.isnan(x)] = ifeature['missing_points']
+            for icode, ispecial in zip(ifeature['special_codes'], ifeature['special_points']):
+                ipoints[x == icode] = ispecial
+
+            logit += ipoints
+
+        for icol, icoef in self.linear.items():
+            logit += icoef * np.asarray(df[icol], dtype=np.float64)
+
+        return logit
+
+    def predict(self, df):
+        with span('predict', rows=len(df), model=type(self).__name__):
+            return 1 / (1 + np.exp(-self.decision_function(df)))
+
+    def to_frame(self, pdo=None, base_score=600, base_odds=50):
+        # Raw logit contributions per bin; with pdo, also the usual scaled points where a higher score is a
+        # better applicant: score = offset - factor * logit, factor = pdo / ln(2)
+        rows = [{'Variable': 'Intercept', 'Bin': '', 'Points': self.intercept}]
+
+        for icol, ifeature in self.features.items():
+            edges = np.concatenate([[-np.inf], ifeature['splits'], [np.inf]])
+            for i, ipoints in enumerate(ifeature['points']):
+                rows.append({'Variable': icol, 'Bin': f"[{edges[i]:.6g}, {edges[i + 1]:.6g})", 'Points': ipoints})
+
+            for icode, ipoints in zip(ifeature['special_codes'], ifeature['special_points']):
+                rows.append({'Variable': icol, 'Bin': f"Special {icode:.6g}", 'Points': ipoints})
+
+            rows.append({'Variable': icol, 'Bin': 'Missing', 'Points': ifeature['missing_points']})
+
+        for icol, icoef in self.linear.items():
+            rows.append({'Variable': icol, 'Bin': 'x (linear)', 'Points': icoef})
+
+        table = pd.DataFrame(rows)
+
+        if pdo is not None:
+            factor = pdo / np.log(2)
+            offset = base_score - factor * np.log(base_odds)
+
+            table['Scaled Points'] = -factor * table['Points']
+            table.loc[table['Variable'] == 'Intercept', 'Scaled Points'] += offset
+
+        return table
+
+    def save(self, path):
+        arrays = {}
+        meta = {'intercept': self.intercept, 'linear': self.linear, 'features': {}}
+
+        for i, (icol, ifeature) in enumerate(self.features.items()):
+            meta['features'][icol] = {'index': i, 'missing_points': ifeature['missing_points']}
+            for ikey in ('splits', 'points', 'special_codes', 'special_points'):
+                arrays[f"{i}_{ikey}"] = ifeature[ikey]
+
+        np.savez(path, meta=np.array(json.dumps(meta)), **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+
+            features = {}
+            for icol, imeta in meta['features'].items():
+                i = imeta['index']
+                features[icol] = {ikey: data[f"{i}_{ikey}"] for ikey in
+                                  ('splits', 'points', 'special_codes', 'special_points')}
+                features[icol]['missing_points'] = imeta['missing_points']
+
+        return cls(meta['intercept'], features, linear=meta['linear'])
@@ -0,0 +1,223 @@
+import json
+import math
+import os
+import time
+
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor
+from src.models.fit import cross_validate
+from src.models.registry import get_model_class
+from src.models.shared_frame import SharedFrame
+from src.utils.misc import InlineExecutor, fingerprint
+
+
+class Uniform(object):
+    def __init__(self, low, high):
+        self.low, self.high = low, high
+
+    def sample(self, rng):
+        return float(rng.uniform(self.low, self.high))
+
+
+class LogUniform(Uniform):
+    def sample(self, rng):
+        return float(np.exp(rng.uniform(np.log(self.low), np.log(self.high))))
+
+
+class IntUniform(Uniform):
+    # Both ends included
+    def sample(self, rng):
+        return int(rng.integers(self.low, self.high + 1))
+
+
+def sample_configs(space, n, seed=0):
+    # space: parameter -> list of choices, or a distribution above. The same seed gives the same configs,
+    # which is what lets a search resume from its trial log
+    rng = np.random.default_rng(seed)
+
+    configs = []
+    for _ in range(n):
+        iconfig = {}
+        for iparam, ivalues in space.items():
+            if hasattr(ivalues, 'sample'):
+                iconfig[iparam] = ivalues.sample(rng)
+            else:
+                iconfig[iparam] = ivalues[rng.integers(len(ivalues))]
+                if isinstance(iconfig[iparam], np.generic):
+                    iconfig[iparam] = iconfig[iparam].item()
+
+        configs.append(iconfig)
+
+    return configs
+
+
+class TrialLog(object):
+    # One JSON line per finished trial; a trial already in the log is not run again
+    def __init__(self, path=None):
+        self.path = path
+        self.trials = {}
+
+        if path is not None and os.path.exists(path):
+            with open(path) as f:
+                for iline in f:
+                    if iline.strip():
+                        itrial = json.loads(iline)
+                        self.trials[itrial['key']] = itrial
+
+    def get(self, key):
+        return self.trials.get(key)
+
+    def append(self, trial):
+        self.trials[trial['key']] = trial
+
+        if self.path is not None:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(trial) + '\n')
+
+
+def _run_trial(model_name, params, shared_df, n_splits, random_state, early_stopping_rounds, dataset,
+               validation_fraction):
+    df = shared_df.take() if isinstance(shared_df, SharedFrame) else shared_df
+
+    start = time.perf_counter()
+    cv = cross_validate(df, n_splits, get_model_class(model_name), model_kwargs=params, n_jobs=1,
+                        random_state=random_state, early_stopping_rounds=early_stopping_rounds, refit=False,
+                        dataset=dataset, validation_fraction=validation_fraction)
+
+    return {
+        'auc': cv['oof_auc'],
+        'fold_auc': cv['fold_auc'],
+        'fold_best_iteration': cv['fold_best_iteration'],
+        'seconds': time.perf_counter() - start,
+    }
+
+
+class HyperparameterSearch(object):
+    # Successive halving (and Hyperband on top of it) over one of the model wrappers. The budget of a trial is
+    # its n_estimators; each rung runs its trials across a process pool, every trial is a cross_validate on the
+    # same folds, and the best 1 / eta of the rung go on with eta times the budget. Early stopping watches
+    # validation_fraction of each fold's training rows, so the fold AUCs that rank the trials are not the ones
+    # it stopped on (None stops on the test fold, which flatters every trial)
+    def __init__(self, df, model_name, space, base_params=None, budget_param='n_estimators', n_splits=3,
+                 early_stopping_rounds=20, eta=3, n_jobs=None, random_state=0, log_path=None, dataset=None,
+                 validation_fraction=0.2):
+        # dataset: a PreparedDataset of df shared by every trial; it needs a cache_dir when n_jobs > 1
+        if budget_param in space:
+            raise ValueError(f"{budget_param} is the budget parameter, set by the search; remove it from space")
+
+        self.df = df
+        self.model_name = model_name
+        self.space = space
+        self.base_params = {} if base_params is None else base_params
+        self.budget_param = budget_param
+        self.n_splits = n_splits
+        self.early_stopping_rounds = early_stopping_rounds
+        self.eta = eta
+        self.n_jobs = (os.cpu_count() or 1) if n_jobs is None else n_jobs
+        self.random_state = random_state
+        self.log = TrialLog(log_path)
+        self.dataset = dataset
+        self.validation_fraction = validation_fraction
+
+        # Trials are keyed by everything that determines their result, so a log is only reused when it matches
+        self.data_key = fingerprint(df)
+
+    def trial_key(self, params):
+        return fingerprint(self.model_name, params, self.data_key, self.n_splits, self.random_state,
+                           self.early_stopping_rounds, self.validation_fraction)
+
+    def run_rung(self, configs, budget, executor, shared_df, rung=None, bracket=None):
+        trials, pending = [None] * len(configs), {}
+
+        for i, iconfig in enumerate(configs):
+            iparams = dict(self.base_params, **iconfig)
+            iparams[self.budget_param] = int(budget)
+            ikey = self.trial_key(iparams)
+
+            if self.log.get(ikey) is not None:
+                trials[i] = self.log.get(ikey)
+            else:
+                pending[i] = (ikey, iparams, executor.submit(_run_trial, self.model_name, iparams, shared_df,
+                                                             self.n_splits, self.random_state,
+                                                             self.early_stopping_rounds, self.dataset,
+                                                             self.validation_fraction))
+
+        for i, (ikey, iparams, ifuture) in pending.items():
+            itrial = dict(ifuture.result(), key=ikey, model=self.model_name, config=configs[i], params=iparams,
+                          budget=int(budget), rung=rung, bracket=bracket)
+            self.log.append(itrial)
+            trials[i] = itrial
+
+            print(f"budget={int(budget):5d} auc={itrial['auc']:.4f} ({itrial['seconds']:.1f}s) {configs[i]}")
+
+        return trials
+
+    def _successive_halving(self, configs, min_budget, max_budget, executor, shared_df, bracket=None):
+        n_rungs = int(math.floor(math.log(max_budget / min_budget, self.eta) + 1e-9)) + 1
+
+        trials = []
+        for irung in range(n_rungs):
+            ibudget = min(max_budget, min_budget * self.eta ** irung)
+            itrials = self.run_rung(configs, ibudget, executor, shared_df, rung=irung, bracket=bracket)
+            trials += itrials
+
+            if irung == n_rungs - 1:
+                break
+
+            n_keep = max(1, len(configs) // self.eta)
+            order = np.argsort([-itrial['auc'] for itrial in itrials], kind='stable')
+            configs = [configs[i] for i in order[:n_keep]]
+
+        return trials
+
+    def _executor(self):
+        if self.n_jobs > 1:
+            return ProcessPoolExecutor(max_workers=self.n_jobs)
+
+        return InlineExecutor()
+
+    def _run(self, brackets):
+        # brackets: (configs, min_budget, max_budget) for each successive halving run
+        shared_df = SharedFrame(self.df) if self.n_jobs > 1 else self.df
+        try:
+            trials = []
+            with self._executor() as executor:
+                for ibracket, (iconfigs, imin_budget, imax_budget) in enumerate(brackets):
+                    trials += self._successive_halving(iconfigs, imin_budget, imax_budget, executor, shared_df,
+                                                       bracket=ibracket)
+
+        finally:
+            if isinstance(shared_df, SharedFrame):
+                shared_df.close()
+
+        return self.results(trials)
+
+    def successive_halving(self, n_configs, min_budget, max_budget, seed=0):
+        return self._run([(sample_configs(self.space, n_configs, seed=seed), min_budget, max_budget)])
+
+    def hyperband(self, min_budget, max_budget, seed=0):
+        # Brackets trade many configs on a small budget against few configs on the full budget
+        s_max = int(math.floor(math.log(max_budget / min_budget, self.eta) + 1e-9))
+
+        brackets = []
+        for s in range(s_max, -1, -1):
+            n_configs = int(math.ceil((s_max + 1) / (s + 1) * self.eta ** s))
+            brackets.append((sample_configs(self.space, n_configs, seed=(seed, s)),
+                             max_budget / self.eta ** s, max_budget))
+
+        return self._run(brackets)
+
+    @staticmethod
+    def results(trials):
+        # Best of the trials run on the largest budget; smaller budgets only decide who gets there
+        top_budget = max(itrial['budget'] for itrial in trials)
+        finalists = [itrial for itrial in trials if itrial['budget'] == top_budget]
+        best = max(finalists, key=lambda itrial: itrial['auc'])
+
+        return {
+            'best_params': best['params'],
+            'best_auc': best['auc'],
+            'best_trial': best,
+            'trials': trials,
+        }
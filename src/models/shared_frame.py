@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+from multiprocessing import shared_memory
+
+
+class SharedFrame(object):
+    # A DataFrame/Series copied once into a single shared memory segment, column by column with its own dtype.
+    # Pickling only sends the layout, so workers attach to the same pages instead of receiving a copy
+    def __init__(self, obj):
+        self.is_series = isinstance(obj, pd.Series)
+        df = obj.to_frame() if self.is_series else obj
+
+        self.columns = list(df.columns)
+        self.dtypes = [df[icol].to_numpy().dtype.str for icol in self.columns]
+        self.n_rows = len(df)
+
+        self.offsets = []
+        offset = 0
+        for idtype in self.dtypes:
+            self.offsets.append(offset)
+            # Keep every column 64-byte aligned
+            offset += -(-self.n_rows * np.dtype(idtype).itemsize // 64) * 64
+
+        self._shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        self.name = self._shm.name
+        self._owner = True
+
+        for icol, arr in zip(self.columns, self._arrays()):
+            arr[:] = df[icol].to_numpy()
+
+    def _arrays(self):
+        return [np.ndarray((self.n_rows,), dtype=idtype, buffer=self._shm.buf, offset=ioffset)
+                for idtype, ioffset in zip(self.dtypes, self.offsets)]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_shm']
+        state['_owner'] = False
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._shm = shared_memory.SharedMemory(name=self.name)
+
+    def take(self, index=None):
+        # Materializes the selected rows only; the full matrix stays in shared memory
+        data = {}
+        for icol, arr in zip(self.columns, self._arrays()):
+            data[icol] = arr if index is None else arr[index]
+
+        df = pd.DataFrame(data, copy=index is None)
+        if self.is_series:
+            return df[self.columns[0]]
+
+        return df
+
+    def close(self):
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
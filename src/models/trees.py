@@ -0,0 +1,259 @@
+import json
+
+import numpy as np
+
+from src.utils.instrument import span
+
+# How a node treats missing values: never missing (NaN compared as 0.0), 0.0 and NaN are missing, NaN is missing
+MISSING_NONE, MISSING_ZERO, MISSING_NAN = 0, 1, 2
+LIGHTGBM_MISSING_TYPES = {'None': MISSING_NONE, 'Zero': MISSING_ZERO, 'NaN': MISSING_NAN}
+
+# Bounds the number of (row, tree) walkers the evaluator advances at once
+MAX_BLOCK_ELEMENTS = 1 << 20
+
+
+class CompiledTrees(object):
+    # All trees of a boosted model as flat node arrays, laid out breadth first so that the right child of
+    # node i is always left[i] + 1. Leaves are marked with left == -1
+    def __init__(self, feature_names, feature, threshold, left, default_left, missing_type, value, roots,
+                 max_depth, base_margin, strict, float32_inputs):
+        self.feature_names = list(feature_names)
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.default_left = default_left
+        self.missing_type = missing_type
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.base_margin = float(base_margin)
+        # XGBoost sends 'x < threshold' left and compares in float32; LightGBM uses 'x <= threshold' on doubles
+        self.strict = bool(strict)
+        self.float32_inputs = bool(float32_inputs)
+        self.has_zero_missing = bool((missing_type == MISSING_ZERO).any())
+
+    ARRAYS = ('feature', 'threshold', 'left', 'default_left', 'missing_type', 'value', 'roots')
+
+    @classmethod
+    def from_nodes(cls, feature_names, trees, base_margin, strict, float32_inputs):
+        # trees: one list of node dicts per tree, root first, children given as indices within the tree and
+        # left == -1 for leaves
+        arrays = {ikey: [] for ikey in cls.ARRAYS}
+        max_depth = 0
+        offset = 0
+
+        for inodes in trees:
+            arrays['roots'].append(offset)
+
+            # Breadth-first renumbering puts siblings next to each other
+            order, depth = [0], {0: 0}
+            for i in order:
+                if inodes[i]['left'] >= 0:
+                    for ichild in (inodes[i]['left'], inodes[i]['right']):
+                        order.append(ichild)
+                        depth[ichild] = depth[i] + 1
+            position = {i: offset + k for k, i in enumerate(order)}
+
+            for i in order:
+                inode = inodes[i]
+                is_leaf = inode['left'] < 0
+
+                arrays['feature'].append(0 if is_leaf else inode['feature'])
+                arrays['threshold'].append(0.0 if is_leaf else inode['threshold'])
+                arrays['left'].append(-1 if is_leaf else position[inode['left']])
+                arrays['default_left'].append(False if is_leaf else inode['default_left'])
+                arrays['missing_type'].append(MISSING_NAN if is_leaf else inode['missing_type'])
+                arrays['value'].append(inode['value'] if is_leaf else 0.0)
+
+            max_depth = max(max_depth, max(depth.values()))
+            offset += len(order)
+
+        return cls(feature_names,
+                   np.asarray(arrays['feature'], dtype=np.int64),
+                   np.asarray(arrays['threshold'], dtype=np.float64),
+                   np.asarray(arrays['left'], dtype=np.int64),
+                   np.asarray(arrays['default_left'], dtype=bool),
+                   np.asarray(arrays['missing_type'], dtype=np.int8),
+                   np.asarray(arrays['value'], dtype=np.float64),
+                   np.asarray(arrays['roots'], dtype=np.int64),
+                   max_depth, base_margin, strict, float32_inputs)
+
+    def _to_matrix(self, X):
+        X = np.column_stack([np.asarray(X[icol], dtype=np.float64) for icol in self.feature_names])
+        if self.float32_inputs:
+            X = X.astype(np.float32).astype(np.float64)
+
+        return X
+
+    def _margin_block(self, X):
+        n_rows, n_features = X.shape
+        is_leaf = self.left < 0
+        X = X.reshape(-1)
+
+        # One walker per (row, tree). Walkers reaching a leaf add its value to their row and are dropped, so
+        # each step only touches the walkers still inside a tree
+        node = np.tile(self.roots, n_rows)
+        row_offset = np.repeat(np.arange(n_rows, dtype=np.int64) * n_features, len(self.roots))
+        margin = np.full(n_rows, self.base_margin)
+
+        while len(node):
+            done = is_leaf[node]
+            if done.any():
+                margin += np.bincount(row_offset[done] // n_features, weights=self.value[node[done]],
+                                      minlength=n_rows)
+                node, row_offset = node[~done], row_offset[~done]
+                if len(node) == 0:
+                    break
+
+            x = X[row_offset + self.feature[node]]
+            threshold = self.threshold[node]
+            go_right = (x >= threshold) if self.strict else (x > threshold)
+
+            # NaN compares False above; missing values are rare enough to fix up after the fact
+            isnan = np.isnan(x)
+            if isnan.any():
+                inode = node[isnan]
+                as_zero = (0.0 >= threshold[isnan]) if self.strict else (0.0 > threshold[isnan])
+                go_right[isnan] = np.where(self.missing_type[inode] == MISSING_NONE, as_zero,
+                                           ~self.default_left[inode])
+
+            if self.has_zero_missing:
+                iszero = (np.abs(x) <= 1e-35) & (self.missing_type[node] == MISSING_ZERO)
+                go_right[iszero] = ~self.default_left[node[iszero]]
+
+            node = self.left[node] + go_right
+
+        return margin
+
+    def decision_function(self, X):
+        X = self._to_matrix(X)
+
+        block_rows = max(1, MAX_BLOCK_ELEMENTS // max(len(self.roots), 1))
+        margin = np.empty(len(X), dtype=np.float64)
+        for istart in range(0, len(X), block_rows):
+            margin[istart:istart + block_rows] = self._margin_block(X[istart:istart + block_rows])
+
+        return margin
+
+    def predict(self, X):
+        with span('predict', rows=len(X), model=type(self).__name__):
+            return 1 / (1 + np.exp(-self.decision_function(X)))
+
+    def save(self, path):
+        meta = {'feature_names': self.feature_names, 'max_depth': self.max_depth, 'base_margin': self.base_margin,
+                'strict': self.strict, 'float32_inputs': self.float32_inputs}
+        np.savez(path, meta=np.array(json.dumps(meta)), **{ikey: getattr(self, ikey) for ikey in self.ARRAYS})
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            arrays = {ikey: data[ikey] for ikey in cls.ARRAYS}
+
+        return cls(meta['feature_names'], max_depth=meta['max_depth'], base_margin=meta['base_margin'],
+                   strict=meta['strict'], float32_inputs=meta['float32_inputs'], **arrays)
+
+
+def _booster(model):
+    # Accepts our wrappers, the sklearn estimators or raw boosters
+    model = getattr(model, 'model', model)
+
+    if hasattr(model, 'get_booster'):
+        return model.get_booster()
+
+    if hasattr(model, 'booster_'):
+        return model.booster_
+
+    return model
+
+
+def compile_xgboost(model):
+    booster = _booster(model)
+    learner = json.loads(booster.save_raw('json'))['learner']
+
+    objective = learner['objective']['name']
+    assert objective == 'binary:logistic', f"Unsupported objective {objective}"
+
+    # Stored as a probability ('5E-1', or '[5E-1]' since xgboost 2); the margin starts at its logit
+    base_score = float(learner['learner_model_param']['base_score'].strip('[]'))
+    base_margin = np.log(base_score / (1 - base_score))
+
+    trees = []
+    for itree in learner['gradient_booster']['model']['trees']:
+        assert not itree['categories_nodes'], "Categorical splits are not supported"
+
+        # Split conditions and leaf values are float32 inside xgboost
+        conditions = np.asarray(itree['split_conditions'], dtype=np.float32).astype(np.float64)
+
+        inodes = []
+        for i, ileft in enumerate(itree['left_children']):
+            inodes.append({
+                'feature': itree['split_indices'][i],
+                'threshold': conditions[i],
+                'left': ileft,
+                'right': itree['right_children'][i],
+                'default_left': bool(itree['default_left'][i]),
+                'missing_type': MISSING_NAN,
+                'value': conditions[i],
+            })
+
+        trees.append(inodes)
+
+    return CompiledTrees.from_nodes(learner['feature_names'], trees, base_margin, strict=True, float32_inputs=True)
+
+
+def _flatten_lightgbm_tree(structure):
+    nodes = []
+
+    def visit(inode):
+        i = len(nodes)
+        nodes.append(None)
+
+        if 'leaf_value' in inode:
+            nodes[i] = {'left': -1, 'right': -1, 'value': inode['leaf_value']}
+            return i
+
+        assert inode['decision_type'] == '<=', "Categorical splits are not supported"
+
+        ileft = visit(inode['left_child'])
+        iright = visit(inode['right_child'])
+        nodes[i] = {
+            'feature': inode['split_feature'],
+            'threshold': inode['threshold'],
+            'left': ileft,
+            'right': iright,
+            'default_left': inode['default_left'],
+            'missing_type': LIGHTGBM_MISSING_TYPES[inode['missing_type']],
+        }
+
+        return i
+
+    visit(structure)
+
+    return nodes
+
+
+def compile_lightgbm(model):
+    booster = _booster(model)
+    dump = booster.dump_model()
+
+    objective = dump['objective'].split()
+    assert objective[0] == 'binary', f"Unsupported objective {dump['objective']}"
+    assert dump['num_tree_per_iteration'] == 1
+
+    # The sigmoid scale is folded into the leaf values so that predict stays 1 / (1 + exp(-margin))
+    sigmoid = 1.0
+    for iparam in objective[1:]:
+        if iparam.startswith('sigmoid:'):
+            sigmoid = float(iparam.split(':')[1])
+
+    trees = []
+    for itree in dump['tree_info']:
+        inodes = _flatten_lightgbm_tree(itree['tree_structure'])
+        for inode in inodes:
+            if inode['left'] < 0:
+                inode['value'] *= sigmoid
+
+        trees.append(inodes)
+
+    return CompiledTrees.from_nodes(dump['feature_names'], trees, 0.0, strict=False, float32_inputs=False)
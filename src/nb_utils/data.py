@@ -1,9 +1,15 @@
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 import seaborn as sns
 
 
-def summarize_df(df):
+def summarize_df(df=None, profile=None):
+    # With a DataProfile (see src.utils.profile) the table also has min/max, moments and quantiles, and df is
+    # not needed
+    if profile is not None:
+        return profile.summary().sort_values(by=['N/A count'], ascending=False, kind='heapsort')
+
     total_rows = len(df)
 
     # Get N/A counts
@@ -22,18 +28,31 @@ def summarize_df(df):
     return na_df
 
 
-def plot_df(df):
+def plot_df(df=None, profile=None, bins=50):
+    # Per class density histograms drawn from a DataProfile; without one, df is profiled first (one pass, then
+    # every plot reads the per class samples instead of rescanning all rows)
+    if profile is None:
+        from src.utils.profile import profile_df
+        profile = profile_df(df)
+
+    # Like seaborn's hue, rows without a label are left out unless there is nothing else
+    classes = [ikey for ikey in profile.classes if ikey != 'nan'] or profile.classes
+    colors = dict(zip(classes, sns.color_palette()))
+
     fig = plt.figure(figsize=(25, 20))
 
-    i = 0
-    for icol in df.columns:
-        if icol in ('SeriousDlqin2yrs', 'id'):
-            continue
+    for i, icol in enumerate(profile.columns):
+        ax = plt.subplot(3, 4, i + 1)
 
-        plt.subplot(3, 4, i + 1)
-        i += 1
+        edges, counts = profile.histogram(icol, bins=bins)
+        for ikey in classes:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                density = counts[ikey] / (counts[ikey].sum() * np.diff(edges))
+            ax.stairs(np.nan_to_num(density), edges, color=colors[ikey], label=ikey)
 
-        sns.histplot(df, x=icol, hue="SeriousDlqin2yrs", element="step", stat="density", common_norm=False)
+        ax.set_xlabel(icol)
+        ax.set_ylabel('Density')
+        ax.legend(title=profile.ycol)
 
     fig.suptitle('Data Column Histograms')
     fig.tight_layout()
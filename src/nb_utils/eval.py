@@ -1,48 +1,52 @@
 import matplotlib.pyplot as plt
+import numpy as np
 
 from sklearn.metrics import roc_curve, RocCurveDisplay, auc, precision_recall_curve, PrecisionRecallDisplay
+from src.utils.lift import lift_table
 
 
-def plot_roc(model, X_test, y_test):
-    y_pred = model.predict(X_test)
+def plot_roc(model, X_test, y_test, y_pred=None, histogram=None):
+    # y_pred reuses predictions already made on X_test; histogram plots a ScoreHistogram instead
+    if histogram is not None:
+        fpr, tpr, _ = histogram.roc_curve()
+        roc_auc = histogram.auc()
+
+    else:
+        if y_pred is None:
+            y_pred = model.predict(X_test)
+
+        # Taken straight out of sklearn's guide
+        fpr, tpr, thresholds = roc_curve(y_test, y_pred)
+        roc_auc = auc(fpr, tpr)
 
-    # Taken straight out of sklearn's guide
-    fpr, tpr, thresholds = roc_curve(y_test, y_pred)
-    roc_auc = auc(fpr, tpr)
     display = RocCurveDisplay(fpr=fpr, tpr=tpr, roc_auc=roc_auc)
     display.plot()
     plt.show()
 
 
-def plot_pr(model, X_test, y_test):
-    y_pred = model.predict(X_test)
+def plot_pr(model, X_test, y_test, y_pred=None, histogram=None):
+    if histogram is not None:
+        prec, recall, _ = histogram.pr_curve()
 
-    # Taken straight out of sklearn's guide
-    prec, recall, _ = precision_recall_curve(y_test, y_pred, pos_label=1)
-    _ = PrecisionRecallDisplay(precision=prec, recall=recall).plot()
+    else:
+        if y_pred is None:
+            y_pred = model.predict(X_test)
 
+        # Taken straight out of sklearn's guide
+        prec, recall, _ = precision_recall_curve(y_test, y_pred, pos_label=1)
 
-def model_binning_summary(model, X, y):
-    percentiles = {k: [] for k in range(10)}
+    _ = PrecisionRecallDisplay(precision=prec, recall=recall).plot()
 
-    y_pred = model.predict(X)
 
-    for iy, iy_pred in zip(y, y_pred):
-        iperc = int(10 * iy_pred)
-        percentiles[iperc].append(iy)
+def model_binning_summary(model, X, y, bins='fixed', y_pred=None):
+    if y_pred is None:
+        y_pred = model.predict(X)
 
-    cumulative_n, cumulative_delinquent = 0, 0
+    table = lift_table(np.asarray(y), np.asarray(y_pred), bins=bins)
 
     print(f"{'bkt':4s} {'num':5s} {'num_delinquent':12s} "
           f"{'perc_delinquent':15s} {'cumulative_delinquent':20s}")
-    for ipercentile, ires in percentiles.items():
-        n = len(ires)
-        n_delinquent = sum(ires)
-
-        cumulative_n += n
-        cumulative_delinquent += n_delinquent
-        cumulative_delinquent_rate = cumulative_delinquent / cumulative_n
-
+    for irow in table.itertuples():
         print(
-            f"{ipercentile / 10:4.2f} {n:5d} {n_delinquent:12d} {100 * n_delinquent / n:15.2f} "
-            f"{100 * cumulative_delinquent_rate:20.2f}")
+            f"{irow.lower:4.2f} {irow.n:5d} {irow.bads:12d} {100 * irow.bad_rate:15.2f} "
+            f"{100 * irow.cum_bad_rate:20.2f}")
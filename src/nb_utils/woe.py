@@ -1,20 +1,29 @@
 from optbinning import OptimalBinning
 
 
-def summarize_woe_iv(df, idcol, ycol):
+def summarize_woe_iv(df, idcol, ycol, stats=None):
+    # With stats (a WoEStats from src/data/transforms/woe_stats.py) the binnings are solved from its counts and
+    # df is not needed
     splits = {}
 
-    xcols = set(df.columns) - {ycol, idcol}
+    xcols = set(stats.columns) if stats is not None else set(df.columns) - {ycol, idcol}
 
-    y = df[ycol]
+    if stats is not None:
+        fitted = stats.solve({icol: {'monotonic_trend': 'auto', 'gamma': 0} for icol in xcols})
+
+    else:
+        y = df[ycol]
 
     for icol in xcols:
         print(icol)
-        ix = df[icol]
 
-        optb = OptimalBinning(name=icol, dtype="numerical", solver="cp")
-        optb.fit(ix, y)
-        assert optb.status == 'OPTIMAL'
+        if stats is not None:
+            optb = fitted[icol]
+
+        else:
+            optb = OptimalBinning(name=icol, dtype="numerical", solver="cp")
+            optb.fit(df[icol], y)
+            assert optb.status == 'OPTIMAL'
 
         binning_table = optb.binning_table
         binning_df = binning_table.build()
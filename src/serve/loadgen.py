@@ -0,0 +1,82 @@
+import argparse
+import http.client
+import json
+import threading
+import time
+
+import numpy as np
+
+from src.benchmarks.synthetic import make_synthetic_df
+
+
+def make_payloads(n, seed=0):
+    df = make_synthetic_df(n, seed=seed).drop(columns=['SeriousDlqin2yrs'])
+    # JSON has no NaN; missing fields are simply left out, as a client would
+    return [json.dumps({k: v for k, v in irecord.items() if v == v}).encode() for irecord in df.to_dict('records')]
+
+
+def _client(host, port, payloads, n_requests, latencies, errors):
+    conn = http.client.HTTPConnection(host, port)
+
+    for i in range(n_requests):
+        body = payloads[i % len(payloads)]
+        start = time.perf_counter()
+        try:
+            conn.request('POST', '/score', body=body, headers={'Content-Type': 'application/json'})
+            resp = conn.getresponse()
+            resp.read()
+            if resp.status != 200:
+                errors.append(resp.status)
+                continue
+
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(str(e))
+            conn.close()
+            conn = http.client.HTTPConnection(host, port)
+            continue
+
+        latencies.append(time.perf_counter() - start)
+
+    conn.close()
+
+
+def run_load(host, port, n_clients=16, n_requests=1000, seed=0):
+    payloads = make_payloads(min(n_requests, 10_000), seed=seed)
+
+    latencies, errors = [], []
+    threads = [threading.Thread(target=_client, args=(host, port, payloads, n_requests, latencies, errors))
+               for _ in range(n_clients)]
+
+    start = time.perf_counter()
+    for ithread in threads:
+        ithread.start()
+    for ithread in threads:
+        ithread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array(latencies)
+    res = {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'seconds': elapsed,
+        'requests_per_second': len(latencies) / elapsed,
+        'latency_p50_ms': 1000 * float(np.percentile(latencies, 50)) if len(latencies) else None,
+        'latency_p99_ms': 1000 * float(np.percentile(latencies, 99)) if len(latencies) else None,
+    }
+
+    print(f"{res['requests']} requests ({res['errors']} errors) in {elapsed:.2f}s: "
+          f"{res['requests_per_second']:.0f} req/s, p50={res['latency_p50_ms']:.2f}ms, "
+          f"p99={res['latency_p99_ms']:.2f}ms")
+
+    return res
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Local load generator for src.serve.server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=1000, help="requests per client")
+    args = parser.parse_args()
+
+    run_load(args.host, args.port, n_clients=args.clients, n_requests=args.requests)
@@ -0,0 +1,276 @@
+import argparse
+import json
+import queue
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from src.data.utils import RAW_COLUMNS
+
+INPUT_COLUMNS = [icol for icol in RAW_COLUMNS if icol != 'SeriousDlqin2yrs']
+
+
+def coerce_records(records, columns):
+    # One list of floats per record, in the order of columns. Missing fields and nulls become NaN; anything
+    # that isn't a number (or a numeric string) raises ValueError naming the record and field
+    if not isinstance(records, list):
+        raise ValueError("records must be a list")
+
+    rows = []
+    for i, irecord in enumerate(records):
+        if not isinstance(irecord, dict):
+            raise ValueError(f"Record {i} is not an object")
+
+        irow = []
+        for icol in columns:
+            ivalue = irecord.get(icol)
+            if ivalue is None:
+                irow.append(np.nan)
+                continue
+
+            try:
+                if isinstance(ivalue, bool):
+                    raise TypeError
+                irow.append(float(ivalue))
+            except (TypeError, ValueError):
+                raise ValueError(f"Record {i}: {icol} must be a number, got {ivalue!r}") from None
+
+        rows.append(irow)
+
+    return rows
+
+
+class MicroBatcher(object):
+    # Requests are queued and a single scoring thread drains them into batches of up to max_batch_size
+    # records, waiting at most max_wait_ms after the first request of a batch for more to arrive
+    def __init__(self, model, max_batch_size=64, max_wait_ms=2.0, columns=None, latency_window=100_000):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.columns = INPUT_COLUMNS if columns is None else columns
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=latency_window)
+        self._started = time.perf_counter()
+        self._n_requests = 0
+        self._n_records = 0
+        self._n_batches = 0
+        self._n_errors = 0
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, records):
+        # Records are checked against the input schema here, in the caller's thread: a bad record fails its own
+        # request with ValueError instead of the whole batch it would have been scored in
+        rows = coerce_records(records, self.columns)
+
+        future = Future()
+        self._queue.put((time.perf_counter(), rows, future))
+        return future
+
+    def score(self, records, timeout=None):
+        return self.submit(records).result(timeout=timeout)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        n_records = len(batch[0][1])
+        deadline = time.perf_counter() + self.max_wait
+
+        while n_records < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+
+            batch.append(item)
+            n_records += len(item[1])
+
+        return batch
+
+    def _predict(self, rows):
+        X = pd.DataFrame(np.array(rows, dtype=np.float64).reshape(len(rows), len(self.columns)),
+                         columns=self.columns)
+        if X['id'].isna().any():
+            X['id'] = np.arange(len(X), dtype=np.float64)
+
+        y_pred = self.model.predict(X)
+        if not isinstance(y_pred, np.ndarray):
+            y_pred = y_pred.to_numpy()
+
+        return y_pred.tolist()
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+
+            rows = [irow for _, irows, _ in batch for irow in irows]
+            try:
+                y_pred = self._predict(rows)
+
+            except Exception:
+                # Whatever broke the batch, only the requests that fail on their own get the error
+                self._run_each(batch)
+                continue
+
+            done = time.perf_counter()
+            offset = 0
+            for istart, irows, ifuture in batch:
+                ifuture.set_result(y_pred[offset:offset + len(irows)])
+                offset += len(irows)
+
+            with self._lock:
+                self._latencies.extend(done - istart for istart, _, _ in batch)
+                self._n_requests += len(batch)
+                self._n_records += len(rows)
+                self._n_batches += 1
+
+    def _run_each(self, batch):
+        for istart, irows, ifuture in batch:
+            try:
+                iy_pred = self._predict(irows)
+
+            except Exception as e:
+                ifuture.set_exception(e)
+                with self._lock:
+                    self._n_errors += 1
+                continue
+
+            ifuture.set_result(iy_pred)
+            with self._lock:
+                self._latencies.append(time.perf_counter() - istart)
+                self._n_requests += 1
+                self._n_records += len(irows)
+                self._n_batches += 1
+
+    def stats(self):
+        with self._lock:
+            latencies = np.array(self._latencies)
+            elapsed = time.perf_counter() - self._started
+            n_requests, n_records, n_batches = self._n_requests, self._n_records, self._n_batches
+            n_errors = self._n_errors
+
+        res = {
+            'requests': n_requests,
+            'records': n_records,
+            'batches': n_batches,
+            'errors': n_errors,
+            'mean_batch_records': n_records / n_batches if n_batches else 0.0,
+            'uptime_seconds': elapsed,
+            'requests_per_second': n_requests / elapsed if elapsed > 0 else 0.0,
+            'records_per_second': n_records / elapsed if elapsed > 0 else 0.0,
+        }
+
+        if len(latencies):
+            res['latency_p50_ms'] = 1000 * float(np.percentile(latencies, 50))
+            res['latency_p99_ms'] = 1000 * float(np.percentile(latencies, 99))
+
+        return res
+
+
+class ScoringRequestHandler(BaseHTTPRequestHandler):
+    # Keep-alive connections; a new TCP connection per request would dominate the latency
+    protocol_version = 'HTTP/1.1'
+
+    # Headers and body go out in separate writes; with Nagle's algorithm the body then waits for the client's
+    # delayed ACK, about 40ms per response whatever the model costs
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/metrics':
+            self._send_json(200, self.server.batcher.stats())
+
+        elif self.path == '/health':
+            self._send_json(200, {'status': 'ok'})
+
+        else:
+            self._send_json(404, {'error': f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        if self.path != '/score':
+            self._send_json(404, {'error': f"Unknown path {self.path}"})
+            return
+
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            # Either one applicant record or {"records": [...]}
+            records = payload['records'] if 'records' in payload else [payload]
+            future = self.server.batcher.submit(records)
+
+        except (ValueError, TypeError, KeyError) as e:
+            self._send_json(400, {'error': f"Bad request: {e}"})
+            return
+
+        try:
+            probabilities = future.result(timeout=self.server.timeout_seconds)
+
+        except Exception as e:
+            self._send_json(500, {'error': str(e)})
+            return
+
+        # NaN is not valid JSON; a record the model can't score (e.g. missing fields) comes back as null
+        self._send_json(200, {'probability': [None if p != p else p for p in probabilities]})
+
+
+class ScoringServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    # listen() backlog; the default of 5 resets connections when many clients connect at once
+    request_queue_size = 128
+
+
+def make_server(model, host='127.0.0.1', port=8080, max_batch_size=64, max_wait_ms=2.0, timeout_seconds=10.0):
+    server = ScoringServer((host, port), ScoringRequestHandler)
+    server.batcher = MicroBatcher(model, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    server.timeout_seconds = timeout_seconds
+
+    return server
+
+
+def main(argv=None):
+    from src.models.bundle import load_bundle
+    from src.utils.score import load_model
+
+    parser = argparse.ArgumentParser(description="HTTP scoring service with micro-batching")
+    parser.add_argument('--bundle', default=None, help="model bundle directory (see src/models/bundle.py)")
+    parser.add_argument('--model-class', default=None, help="e.g. XGBoostClassifier")
+    parser.add_argument('--model-path', default=None)
+    parser.add_argument('--transform', default=None,
+                        help="transform preset name, e.g. null_transform, or WoETransformV2:<path>")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--max-batch-size', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=2.0)
+    args = parser.parse_args(argv)
+
+    if args.bundle is not None:
+        model = load_bundle(args.bundle)
+    else:
+        model = load_model(args.model_class, args.model_path, transform=args.transform)
+    server = make_server(model, host=args.host, port=args.port,
+                         max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms)
+
+    print(f"Serving on http://{args.host}:{server.server_address[1]}")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from concurrent.futures import ProcessPoolExecutor
+
+# Replicates are computed on this many rank bins per model (ties never split): a replicate then costs O(bins)
+# instead of O(rows). Pairs sharing a bin count as ties, which biases every replicate by about the same amount;
+# the replicates are shifted by the difference between the exact and the binned estimate
+DEFAULT_BINS = 4096
+
+# Top fractions of rows (highest scores first) for the capture rate and lift
+LIFT_FRACTIONS = (0.05, 0.1, 0.2)
+
+# Replicates per task; fixed so that results don't depend on n_jobs
+TASK_REPLICATES = 100
+
+# Bounds the (replicates, cells) blocks drawn at once
+MAX_BLOCK_ELEMENTS = 1 << 23
+
+
+def rank_bins(y_pred, n_bins=None):
+    # One stable sort of the scores. Returns each row's bin, bins numbered in ascending score order, with tied
+    # scores always in the same bin (so the AUC counts them as half, i.e. midranks), and the number of bins.
+    # n_bins=None keeps one bin per distinct score
+    y_pred = np.asarray(y_pred, dtype=np.float64)
+    n = len(y_pred)
+
+    order = np.argsort(y_pred, kind='stable')
+    sorted_scores = y_pred[order]
+
+    new_group = np.empty(n, dtype=bool)
+    new_group[:1] = True
+    np.not_equal(sorted_scores[1:], sorted_scores[:-1], out=new_group[1:])
+    group = np.cumsum(new_group) - 1
+
+    if n_bins is not None and n and group[-1] + 1 > n_bins:
+        # A tie group goes to the bin of its first row; bins left empty are dropped from the numbering
+        group_bin = np.flatnonzero(new_group) * n_bins // n
+        new_bin = np.empty(len(group_bin), dtype=bool)
+        new_bin[:1] = True
+        np.not_equal(group_bin[1:], group_bin[:-1], out=new_bin[1:])
+        group = (np.cumsum(new_bin) - 1)[group]
+
+    bins = np.empty(n, dtype=np.int64)
+    bins[order] = group
+
+    return bins, int(group[-1]) + 1 if n else 0
+
+
+def _batched_bincount(index, weights, minlength):
+    # index: (n_cells,), weights: (n_replicates, n_cells) -> (n_replicates, minlength) in one bincount
+    n_replicates = len(weights)
+    key = index[None, :] + (np.arange(n_replicates, dtype=np.int64) * minlength)[:, None]
+
+    return np.bincount(key.reshape(-1), weights=weights.reshape(-1),
+                       minlength=n_replicates * minlength).reshape(n_replicates, minlength)
+
+
+def _metrics(pos, neg, lift_fractions):
+    # pos, neg: (n_replicates, n_bins) counts in ascending score order -> one value per replicate and metric
+    n_pos, n_neg = pos.sum(axis=1), neg.sum(axis=1)
+    cum_pos, cum_neg = np.cumsum(pos, axis=1), np.cumsum(neg, axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Each positive beats the negatives in lower bins and half of those in its own
+        auc = (pos * (cum_neg - 0.5 * neg)).sum(axis=1) / (n_pos * n_neg)
+        ks = np.max(np.abs(cum_pos / n_pos[:, None] - cum_neg / n_neg[:, None]), axis=1)
+
+    res = {'auc': auc, 'gini': 2 * auc - 1, 'ks': ks}
+
+    # Capture rate of the top q rows, with the bin straddling the cut shared in proportion
+    top_rows = np.cumsum((pos + neg)[:, ::-1], axis=1)
+    top_pos = np.cumsum(pos[:, ::-1], axis=1)
+    for iq in lift_fractions:
+        icapture = np.empty(len(pos))
+        for i in range(len(pos)):
+            icapture[i] = np.interp(iq * top_rows[i, -1], np.r_[0, top_rows[i]], np.r_[0, top_pos[i]])
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            icapture /= n_pos
+
+        res[f"capture@{iq:g}"] = icapture
+        res[f"lift@{iq:g}"] = icapture / iq
+
+    return res
+
+
+def _cells(y_true, bins, n_bins):
+    # Rows that agree on the label and on their bin under every model are interchangeable for all the metrics,
+    # so a bootstrap resample is a multinomial draw over these cells
+    y_true = np.asarray(y_true) != 0
+
+    key = y_true.astype(np.int64)
+    for ibins, in_bins in zip(bins, n_bins):
+        key = key * in_bins + ibins
+
+    _, first, counts = np.unique(key, return_index=True, return_counts=True)
+
+    return {
+        'counts': counts,
+        'label': y_true[first],
+        'bins': [ibins[first] for ibins in bins],
+        'n_bins': list(n_bins),
+    }
+
+
+def _cell_metrics(cells, weights, lift_fractions):
+    # weights: (n_replicates, n_cells) -> one dict of metrics per model
+    label = cells['label']
+
+    res = []
+    for ibins, in_bins in zip(cells['bins'], cells['n_bins']):
+        ipos = _batched_bincount(ibins[label], weights[:, label], in_bins)
+        ineg = _batched_bincount(ibins[~label], weights[:, ~label], in_bins)
+        res.append(_metrics(ipos, ineg, lift_fractions))
+
+    return res
+
+
+def _replicates(cells, n_replicates, seed, lift_fractions):
+    rng = np.random.default_rng(seed)
+    n = int(cells['counts'].sum())
+    pvals = cells['counts'] / n
+
+    block = max(1, MAX_BLOCK_ELEMENTS // max(len(pvals), 1))
+
+    parts = []
+    for istart in range(0, n_replicates, block):
+        iweights = rng.multinomial(n, pvals, size=min(block, n_replicates - istart)).astype(np.float64)
+        parts.append(_cell_metrics(cells, iweights, lift_fractions))
+
+    return [{ikey: np.concatenate([ipart[j][ikey] for ipart in parts]) for ikey in parts[0][j]}
+            for j in range(len(cells['bins']))]
+
+
+def _point_metrics(y_true, bins, n_bins, lift_fractions):
+    y_true = np.asarray(y_true) != 0
+    pos = np.bincount(bins[y_true], minlength=n_bins)[None, :].astype(np.float64)
+    neg = np.bincount(bins[~y_true], minlength=n_bins)[None, :].astype(np.float64)
+
+    return {ikey: float(ivalues[0]) for ikey, ivalues in _metrics(pos, neg, lift_fractions).items()}
+
+
+def _bootstrap(y_true, y_preds, n_boot, n_bins, lift_fractions, n_jobs, seed):
+    # Exact estimates from one bin per distinct score, replicates from rank bins, shifted onto the exact values
+    exact, binned = [], []
+    for iy_pred in y_preds:
+        ibins, in_bins = rank_bins(iy_pred)
+        exact.append(_point_metrics(y_true, ibins, in_bins, lift_fractions))
+        binned.append(rank_bins(iy_pred, n_bins))
+
+    cells = _cells(y_true, [ibins for ibins, _ in binned], [in_bins for _, in_bins in binned])
+    binned_point = _cell_metrics(cells, cells['counts'][None, :].astype(np.float64), lift_fractions)
+
+    seeds = np.random.SeedSequence(seed).spawn(int(np.ceil(n_boot / TASK_REPLICATES)))
+    sizes = [min(TASK_REPLICATES, n_boot - i * TASK_REPLICATES) for i in range(len(seeds))]
+
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+    n_jobs = min(n_jobs, len(seeds))
+
+    args = ([cells] * len(seeds), sizes, seeds, [lift_fractions] * len(seeds))
+    if n_jobs > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            parts = list(executor.map(_replicates, *args))
+    else:
+        parts = [_replicates(*iargs) for iargs in zip(*args)]
+
+    replicates = []
+    for j in range(len(y_preds)):
+        jreplicates = {}
+        for ikey in exact[j]:
+            ivalues = np.concatenate([ipart[j][ikey] for ipart in parts])
+            jreplicates[ikey] = ivalues + (exact[j][ikey] - binned_point[j][ikey][0])
+
+        replicates.append(jreplicates)
+
+    return exact, replicates
+
+
+def bootstrap_metrics(y_true, y_pred, n_boot=1000, alpha=0.05, n_bins=DEFAULT_BINS, lift_fractions=LIFT_FRACTIONS,
+                      n_jobs=None, seed=0):
+    # Percentile intervals for AUC, Gini, KS and top-fraction capture / lift, one row per metric
+    exact, replicates = _bootstrap(y_true, [y_pred], n_boot, n_bins, lift_fractions, n_jobs, seed)
+
+    rows = {}
+    for ikey, iestimate in exact[0].items():
+        ivalues = replicates[0][ikey]
+        rows[ikey] = {
+            'estimate': iestimate,
+            'std': float(np.std(ivalues, ddof=1)),
+            'lower': float(np.quantile(ivalues, alpha / 2)),
+            'upper': float(np.quantile(ivalues, 1 - alpha / 2)),
+        }
+
+    return pd.DataFrame.from_dict(rows, orient='index').rename_axis('metric')
+
+
+def bootstrap_compare(y_true, y_pred_a, y_pred_b, n_boot=1000, alpha=0.05, n_bins=256,
+                      lift_fractions=LIFT_FRACTIONS, n_jobs=None, seed=0):
+    # Paired bootstrap of b - a: both models are scored on the same resamples, so the interval of the difference
+    # is much narrower than the two separate intervals suggest. Cells are joint bins of both models, hence the
+    # smaller default n_bins
+    exact, replicates = _bootstrap(y_true, [y_pred_a, y_pred_b], n_boot, n_bins, lift_fractions, n_jobs, seed)
+
+    rows = {}
+    for ikey in exact[0]:
+        idiff = replicates[1][ikey] - replicates[0][ikey]
+        rows[ikey] = {
+            'a': exact[0][ikey],
+            'b': exact[1][ikey],
+            'difference': exact[1][ikey] - exact[0][ikey],
+            'std': float(np.std(idiff, ddof=1)),
+            'lower': float(np.quantile(idiff, alpha / 2)),
+            'upper': float(np.quantile(idiff, 1 - alpha / 2)),
+            # Two-sided: how often the resampled difference falls on either side of 0
+            'p_value': float(min(1.0, 2 * min(np.mean(idiff <= 0), np.mean(idiff >= 0)))),
+        }
+
+    return pd.DataFrame.from_dict(rows, orient='index').rename_axis('metric')
@@ -1,18 +1,37 @@
-import pandas as pd
+# sklearn, pandas and the data helpers are imported in the functions that use them, so that importing this
+# module (directly, or through src.models.fit) stays cheap; src/benchmarks/import_time.py measures it
 
-from sklearn.metrics import roc_auc_score
-from src.data.transforms.null_transform import null_transform
-from src.data.utils import read_df, get_xy
 
+def eval_auc(model, X_test, y_test, y_pred=None):
+    # Pass y_pred to reuse predictions already made on X_test
+    from sklearn.metrics import roc_auc_score
 
-def eval_auc(model, X_test, y_test):
-    y_pred = model.predict(X_test)
+    if y_pred is None:
+        y_pred = model.predict(X_test)
     auc = roc_auc_score(y_test, y_pred)
 
     return auc
 
 
+def eval_auc_ci(model, X_test, y_test, y_pred=None, n_boot=1000, alpha=0.05, n_jobs=None, seed=0):
+    # (auc, lower, upper): the point estimate with a bootstrap percentile interval, see src/utils/bootstrap.py
+    from src.utils.bootstrap import bootstrap_metrics
+
+    if y_pred is None:
+        y_pred = model.predict(X_test)
+
+    table = bootstrap_metrics(y_test, y_pred, n_boot=n_boot, alpha=alpha, lift_fractions=(), n_jobs=n_jobs,
+                              seed=seed)
+
+    return tuple(float(table.loc['auc', ikey]) for ikey in ('estimate', 'lower', 'upper'))
+
+
 def generate_test_output(input_csv, model, output_csv):
+    import pandas as pd
+
+    from src.data.transforms.null_transform import null_transform
+    from src.data.utils import read_df, get_xy
+
     test_df = read_df(input_csv)
     _, tdf_id = null_transform(test_df)
 
@@ -0,0 +1,257 @@
+import json
+import os
+import re
+import threading
+import time
+import tracemalloc
+
+# Spans are no-ops until enable() is called: span() then returns one shared object whose enter / exit do
+# nothing, so instrumented code costs a function call and a global lookup per span
+_RECORDER = None
+_LOCAL = threading.local()
+
+# Whether enable() started tracemalloc, and so whether disable() should stop it
+_STARTED_TRACING = False
+
+PROMETHEUS_PREFIX = 'credit_scoring'
+
+
+def n_rows(obj):
+    # Frames, arrays, lists, and the native datasets (DMatrix.num_row, constructed lgb.Dataset.num_data)
+    try:
+        return len(obj)
+    except TypeError:
+        pass
+
+    for iattr in ('num_row', 'num_data'):
+        try:
+            return int(getattr(obj, iattr)())
+        except Exception:
+            continue
+
+    return None
+
+
+class _NoopSpan(object):
+    rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def __setattr__(self, key, value):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span(object):
+    # Wall and CPU time (of the whole process, so threads a span waits on are included), rows processed, and,
+    # when the recorder traces memory, the peak of Python-allocated memory above the span's starting point.
+    # tracemalloc has one process-wide peak: nested spans hand theirs up to the enclosing span, but spans
+    # running concurrently in other threads see each other's allocations
+    def __init__(self, recorder, name, rows=None, labels=None):
+        self.recorder = recorder
+        self.name = name
+        self.rows = rows
+        self.labels = labels or {}
+        self.peak_bytes = None
+
+    def __enter__(self):
+        stack = getattr(_LOCAL, 'stack', None)
+        if stack is None:
+            stack = _LOCAL.stack = []
+
+        if self.recorder.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1]._peak_seen = max(stack[-1]._peak_seen, peak)
+
+            tracemalloc.reset_peak()
+            self._start_memory = current
+            self._peak_seen = current
+
+        self.parent = stack[-1].name if stack else None
+        stack.append(self)
+
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.process_time()
+
+        return self
+
+    def __exit__(self, *args):
+        self.wall_seconds = time.perf_counter() - self._start_wall
+        self.cpu_seconds = time.process_time() - self._start_cpu
+
+        stack = _LOCAL.stack
+        stack.pop()
+
+        if self.recorder.memory:
+            peak = max(tracemalloc.get_traced_memory()[1], self._peak_seen)
+            self.peak_bytes = peak - self._start_memory
+            if stack:
+                stack[-1]._peak_seen = max(stack[-1]._peak_seen, peak)
+
+        self.recorder.record(self)
+
+        return False
+
+
+class Recorder(object):
+    # Per span name (and labels): number of calls, total and max wall time, total CPU time, total rows and the
+    # largest memory peak. The last max_events spans are also kept as they happened
+    def __init__(self, memory=True, max_events=10_000):
+        self.memory = memory
+        self.max_events = max_events
+
+        self.stats = {}
+        self.events = []
+        self._lock = threading.Lock()
+
+    def record(self, span):
+        key = (span.name, tuple(sorted(span.labels.items())))
+
+        with self._lock:
+            istats = self.stats.get(key)
+            if istats is None:
+                istats = self.stats[key] = {'name': span.name, 'labels': dict(span.labels), 'parent': span.parent,
+                                            'calls': 0, 'wall_seconds': 0.0, 'max_wall_seconds': 0.0,
+                                            'cpu_seconds': 0.0, 'rows': 0, 'peak_bytes': None}
+
+            istats['calls'] += 1
+            istats['wall_seconds'] += span.wall_seconds
+            istats['max_wall_seconds'] = max(istats['max_wall_seconds'], span.wall_seconds)
+            istats['cpu_seconds'] += span.cpu_seconds
+            if span.rows is not None:
+                istats['rows'] += int(span.rows)
+            if span.peak_bytes is not None:
+                istats['peak_bytes'] = max(istats['peak_bytes'] or 0, span.peak_bytes)
+
+            if len(self.events) < self.max_events:
+                self.events.append({'name': span.name, 'labels': span.labels, 'parent': span.parent,
+                                    'wall_seconds': span.wall_seconds, 'cpu_seconds': span.cpu_seconds,
+                                    'rows': span.rows, 'peak_bytes': span.peak_bytes})
+
+    def summary(self):
+        with self._lock:
+            rows = [dict(istats) for istats in self.stats.values()]
+
+        for irow in rows:
+            irow['rows_per_second'] = irow['rows'] / irow['wall_seconds'] if irow['wall_seconds'] > 0 else None
+
+        return sorted(rows, key=lambda irow: -irow['wall_seconds'])
+
+    def to_json(self, path=None, events=False):
+        res = {'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'memory': self.memory, 'spans': self.summary()}
+        if events:
+            with self._lock:
+                res['events'] = list(self.events)
+
+        if path is not None:
+            _write_atomic(path, json.dumps(res, indent=1))
+
+        return res
+
+    def to_prometheus(self, path=None, prefix=PROMETHEUS_PREFIX):
+        # Text exposition format, e.g. for node_exporter's textfile collector (which wants atomic writes)
+        metrics = [
+            ('calls_total', 'counter', 'Number of completed spans', 'calls'),
+            ('wall_seconds_total', 'counter', 'Wall time spent in spans', 'wall_seconds'),
+            ('cpu_seconds_total', 'counter', 'Process CPU time spent in spans', 'cpu_seconds'),
+            ('rows_total', 'counter', 'Rows processed by spans', 'rows'),
+            ('peak_bytes', 'gauge', 'Largest Python memory peak of a span above its start', 'peak_bytes'),
+        ]
+        summary = self.summary()
+
+        lines = []
+        for imetric, itype, ihelp, ikey in metrics:
+            iname = f"{prefix}_span_{imetric}"
+            lines += [f"# HELP {iname} {ihelp}", f"# TYPE {iname} {itype}"]
+
+            for irow in summary:
+                if irow[ikey] is None:
+                    continue
+
+                ilabels = dict(irow['labels'], span=irow['name'])
+                ilabels = ','.join(f'{_metric_name(k)}="{_escape(v)}"' for k, v in sorted(ilabels.items()))
+                lines.append(f"{iname}{{{ilabels}}} {irow[ikey]}")
+
+        text = '\n'.join(lines) + '\n'
+        if path is not None:
+            _write_atomic(path, text)
+
+        return text
+
+
+def _metric_name(name):
+    return re.sub(r'[^a-zA-Z0-9_]', '_', str(name))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _write_atomic(path, text):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+
+    tmp_path = path + f".tmp{os.getpid()}"
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def enable(memory=True, max_events=10_000):
+    # memory=True traces allocations with tracemalloc, which slows allocation-heavy Python code down noticeably
+    # A trace the caller started is left running by disable()
+    global _RECORDER, _STARTED_TRACING
+
+    if _RECORDER is not None:
+        disable()
+
+    _STARTED_TRACING = memory and not tracemalloc.is_tracing()
+    if _STARTED_TRACING:
+        tracemalloc.start()
+
+    _RECORDER = Recorder(memory=memory, max_events=max_events)
+    return _RECORDER
+
+
+def disable():
+    global _RECORDER, _STARTED_TRACING
+
+    recorder, _RECORDER = _RECORDER, None
+    if _STARTED_TRACING and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _STARTED_TRACING = False
+
+    return recorder
+
+
+def get_recorder():
+    return _RECORDER
+
+
+class recording(object):
+    # with recording() as recorder: ... ; instrumentation is off again afterwards
+    def __init__(self, memory=True, max_events=10_000):
+        self.memory = memory
+        self.max_events = max_events
+
+    def __enter__(self):
+        return enable(memory=self.memory, max_events=self.max_events)
+
+    def __exit__(self, *args):
+        disable()
+        return False
+
+
+def span(name, rows=None, **labels):
+    # with span('stage', rows=len(df)) as s: ... ; rows may also be set on s inside the block
+    if _RECORDER is None:
+        return _NOOP_SPAN
+
+    return Span(_RECORDER, name, rows=rows, labels=labels)
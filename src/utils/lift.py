@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+
+# 0.1-wide probability bands, as in the original model_binning_summary
+FIXED_EDGES = np.linspace(0, 1, 11)
+
+
+def quantile_edges(y_pred, q=10):
+    # q buckets of equal population, or buckets cut at the given quantile levels, e.g. [0.5, 0.9, 0.99].
+    # Ties can make the populations unequal; repeated edges are collapsed, down to a single bucket
+    # [v, nextafter(v)] when every prediction is v
+    y_pred = np.asarray(y_pred, dtype=np.float64)
+    y_pred = y_pred[~np.isnan(y_pred)]
+    if len(y_pred) == 0:
+        y_pred = np.zeros(1)
+
+    levels = np.linspace(0, 1, q + 1) if np.isscalar(q) else np.concatenate([[0], np.sort(q), [1]])
+
+    edges = np.unique(np.quantile(y_pred, levels))
+    if len(edges) < 2:
+        edges = np.array([edges[0], np.nextafter(edges[0], np.inf)])
+
+    return edges
+
+
+def bucket_index(edges, y_pred):
+    # Bucket i is [edges[i], edges[i + 1]); values below the first or above the last edge fall in the first or
+    # last bucket, so a prediction of exactly 1.0 lands in the top band
+    return np.searchsorted(edges[1:-1], y_pred, side='right')
+
+
+class LiftCounts(object):
+    # Per-bucket row and bad counts for fixed edges. Counts from separate chunks scored against the same edges
+    # add up, so a table over any number of rows is built one chunk at a time
+    def __init__(self, edges, n=None, bads=None):
+        self.edges = np.asarray(edges, dtype=np.float64)
+        n_buckets = len(self.edges) - 1
+
+        self.n = np.zeros(n_buckets, dtype=np.int64) if n is None else np.asarray(n, dtype=np.int64)
+        self.bads = np.zeros(n_buckets, dtype=np.int64) if bads is None else np.asarray(bads, dtype=np.int64)
+
+    @classmethod
+    def from_predictions(cls, y_true, y_pred, edges=FIXED_EDGES):
+        counts = cls(edges)
+        counts.update(y_true, y_pred)
+
+        return counts
+
+    def update(self, y_true, y_pred):
+        y_true = np.asarray(y_true)
+        y_pred = np.asarray(y_pred, dtype=np.float64)
+
+        # Unscored rows are left out of the table
+        scored = ~np.isnan(y_pred)
+        if not scored.all():
+            y_true, y_pred = y_true[scored], y_pred[scored]
+
+        index = bucket_index(self.edges, y_pred)
+        n_buckets = len(self.n)
+
+        self.n += np.bincount(index, minlength=n_buckets)
+        self.bads += np.bincount(index[y_true != 0], minlength=n_buckets)
+
+        return self
+
+    def merge(self, other):
+        assert np.array_equal(self.edges, other.edges), "Only counts over the same edges can be merged"
+
+        return LiftCounts(self.edges, self.n + other.n, self.bads + other.bads)
+
+    def __add__(self, other):
+        return self.merge(other)
+
+    def to_frame(self, ascending=True):
+        # Cumulative columns accumulate in row order: with ascending=False the riskiest bucket comes first and
+        # cum_bad_share is the usual capture rate. KS is the same either way
+        order = slice(None) if ascending else slice(None, None, -1)
+
+        n, bads = self.n[order], self.bads[order]
+        goods = n - bads
+
+        cum_n, cum_bads, cum_goods = np.cumsum(n), np.cumsum(bads), np.cumsum(goods)
+        total_n, total_bads, total_goods = cum_n[-1], cum_bads[-1], cum_goods[-1]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            bad_rate = bads / n
+            cum_bad_share = cum_bads / total_bads
+            cum_good_share = cum_goods / total_goods
+
+            table = pd.DataFrame({
+                'lower': self.edges[:-1][order],
+                'upper': self.edges[1:][order],
+                'n': n,
+                'bads': bads,
+                'goods': goods,
+                'bad_rate': bad_rate,
+                'lift': bad_rate / (total_bads / total_n),
+                'cum_n': cum_n,
+                'cum_bads': cum_bads,
+                'cum_bad_rate': cum_bads / cum_n,
+                'cum_n_share': cum_n / total_n,
+                'cum_bad_share': cum_bad_share,
+                'cum_good_share': cum_good_share,
+                'ks': np.abs(cum_bad_share - cum_good_share),
+            }, index=pd.RangeIndex(len(self.n))[order])
+
+        table.index.name = 'bucket'
+
+        return table
+
+
+def lift_table(y_true, y_pred, bins='fixed', ascending=True):
+    # bins: 'fixed' for 0.1 bands, 'deciles', an int for that many equal-population buckets, a list of
+    # quantile levels in (0, 1), or explicit edges via LiftCounts
+    if not isinstance(bins, str):
+        edges = quantile_edges(y_pred, bins)
+    elif bins == 'fixed':
+        edges = FIXED_EDGES
+    elif bins == 'deciles':
+        edges = quantile_edges(y_pred, 10)
+    else:
+        raise ValueError(f"Unknown bins {bins}")
+
+    return LiftCounts.from_predictions(y_true, y_pred, edges).to_frame(ascending=ascending)
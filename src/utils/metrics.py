@@ -0,0 +1,133 @@
+import numpy as np
+
+# 2^16 bins over [0, 1] keep the AUC error bound well under 1e-4 on a few hundred thousand rows
+DEFAULT_BINS = 1 << 16
+
+
+class ScoreHistogram(object):
+    # Per-class counts of scores in fixed-width bins over [lower, upper]; scores outside are clipped into the
+    # end bins. Memory is fixed whatever the number of rows, and histograms from different chunks or processes
+    # merge by adding counts.
+    #
+    # Only pairs (positive, negative) that share a bin are not ordered by the histogram; they count as ties, so
+    # the AUC is off by at most auc_error_bound() = 0.5 * sum(pos_b * neg_b) / (P * N).
+    #
+    # exact=True keeps every score instead, and the results match sklearn (ties at 0.5, as roc_auc_score)
+    def __init__(self, n_bins=DEFAULT_BINS, lower=0.0, upper=1.0, exact=False):
+        self.n_bins = n_bins
+        self.lower = float(lower)
+        self.upper = float(upper)
+        self.exact = exact
+
+        if exact:
+            self.scores, self.labels = [], []
+        else:
+            self.pos = np.zeros(n_bins, dtype=np.int64)
+            self.neg = np.zeros(n_bins, dtype=np.int64)
+
+    def update(self, y_true, y_score):
+        y_true = np.asarray(y_true) != 0
+        y_score = np.asarray(y_score, dtype=np.float64)
+        if np.isnan(y_score).any():
+            raise ValueError("Scores contain NaN")
+
+        if self.exact:
+            self.scores.append(y_score.copy())
+            self.labels.append(y_true)
+            return self
+
+        index = (y_score - self.lower) * (self.n_bins / (self.upper - self.lower))
+        index = np.clip(index, 0, self.n_bins - 1).astype(np.int64)
+
+        self.pos += np.bincount(index[y_true], minlength=self.n_bins)
+        self.neg += np.bincount(index[~y_true], minlength=self.n_bins)
+
+        return self
+
+    def merge(self, other):
+        assert (self.exact, self.n_bins, self.lower, self.upper) == \
+            (other.exact, other.n_bins, other.lower, other.upper), "Histograms must share their binning"
+
+        res = ScoreHistogram(self.n_bins, self.lower, self.upper, exact=self.exact)
+        if self.exact:
+            res.scores, res.labels = self.scores + other.scores, self.labels + other.labels
+        else:
+            res.pos, res.neg = self.pos + other.pos, self.neg + other.neg
+
+        return res
+
+    def __add__(self, other):
+        return self.merge(other)
+
+    def counts(self):
+        # (thresholds, pos, neg) for the non-empty bins (or distinct scores) in ascending score order
+        if self.exact:
+            scores = np.concatenate(self.scores) if self.scores else np.empty(0)
+            labels = np.concatenate(self.labels) if self.labels else np.empty(0, dtype=bool)
+
+            thresholds, inverse = np.unique(scores, return_inverse=True)
+            pos = np.bincount(inverse[labels], minlength=len(thresholds))
+            neg = np.bincount(inverse[~labels], minlength=len(thresholds))
+
+            return thresholds, pos, neg
+
+        used = (self.pos + self.neg) > 0
+        # A bin's lower edge: every score in the bin is >= it
+        thresholds = self.lower + np.flatnonzero(used) * ((self.upper - self.lower) / self.n_bins)
+
+        return thresholds, self.pos[used], self.neg[used]
+
+    def auc(self):
+        _, pos, neg = self.counts()
+        n_pos, n_neg = pos.sum(), neg.sum()
+
+        # Mann-Whitney: each positive beats the negatives in lower bins and ties with those in its own
+        neg_below = np.cumsum(neg) - neg
+        return float(np.dot(pos, neg_below + 0.5 * neg) / (n_pos * n_neg))
+
+    def auc_error_bound(self):
+        if self.exact:
+            return 0.0
+
+        _, pos, neg = self.counts()
+        return float(0.5 * np.dot(pos, neg) / (pos.sum() * neg.sum()))
+
+    def gini(self):
+        return 2 * self.auc() - 1
+
+    def _descending(self):
+        thresholds, pos, neg = self.counts()
+
+        return thresholds[::-1], np.cumsum(pos[::-1]), np.cumsum(neg[::-1])
+
+    def roc_curve(self):
+        # As sklearn.metrics.roc_curve(drop_intermediate=False): descending thresholds, starting at (0, 0)
+        thresholds, tps, fps = self._descending()
+
+        fpr = np.concatenate([[0], fps / fps[-1]])
+        tpr = np.concatenate([[0], tps / tps[-1]])
+
+        return fpr, tpr, np.concatenate([[np.inf], thresholds])
+
+    def ks(self):
+        fpr, tpr, _ = self.roc_curve()
+
+        return float(np.max(tpr - fpr))
+
+    def pr_curve(self):
+        # As sklearn.metrics.precision_recall_curve(drop_intermediate=False): ascending thresholds, ending at (1, 0)
+        thresholds, tps, fps = self._descending()
+
+        precision = tps / (tps + fps)
+        recall = tps / tps[-1]
+
+        return np.concatenate([precision[::-1], [1]]), np.concatenate([recall[::-1], [0]]), thresholds[::-1]
+
+    def summary(self):
+        return {
+            'n': int(sum(map(len, self.scores))) if self.exact else int((self.pos + self.neg).sum()),
+            'auc': self.auc(),
+            'auc_error_bound': self.auc_error_bound(),
+            'gini': self.gini(),
+            'ks': self.ks(),
+        }
@@ -0,0 +1,70 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from concurrent.futures import Future
+
+
+def fingerprint(*parts):
+    h = hashlib.blake2b(digest_size=16)
+
+    for ipart in parts:
+        if hasattr(ipart, 'columns'):
+            # DataFrame: hash column by column so mixed dtypes never go through an object array
+            h.update(fingerprint(list(map(str, ipart.columns))).encode())
+            for icol in ipart.columns:
+                h.update(fingerprint(ipart[icol].to_numpy()).encode())
+
+        elif hasattr(ipart, 'to_numpy'):
+            h.update(fingerprint(str(ipart.name), ipart.to_numpy()).encode())
+
+        elif isinstance(ipart, np.ndarray) and ipart.dtype != object:
+            ipart = np.ascontiguousarray(ipart)
+            h.update(str((ipart.dtype.str, ipart.shape)).encode())
+            h.update(ipart.reshape(-1).view(np.uint8).data)
+
+        elif isinstance(ipart, np.ndarray):
+            h.update(fingerprint(ipart.tolist()).encode())
+
+        elif isinstance(ipart, bytes):
+            h.update(ipart)
+
+        else:
+            h.update(json.dumps(ipart, sort_keys=True, default=str).encode())
+
+    return h.hexdigest()
+
+
+def file_fingerprint(path, block_size=1 << 20):
+    h = hashlib.blake2b(digest_size=16)
+
+    with open(path, 'rb') as f:
+        for iblock in iter(lambda: f.read(block_size), b''):
+            h.update(iblock)
+
+    return h.hexdigest()
+
+
+def file_stat(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+class InlineExecutor(object):
+    # Runs submitted calls immediately, in place of a thread or process pool for single-threaded or tiny jobs
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+
+        return future
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
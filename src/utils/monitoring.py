@@ -0,0 +1,146 @@
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.data.transforms.woe_compiled import bin_codes, n_bin_codes
+from src.utils.lift import bucket_index, quantile_edges
+
+# Usual reading of PSI / CSI: below 0.1 stable, 0.1 to 0.25 some shift, above 0.25 a significant shift
+PSI_THRESHOLDS = (0.1, 0.25)
+
+# Empty bins get this share so that the log ratio stays finite
+MIN_SHARE = 1e-4
+
+SCORE = 'score'
+
+
+def psi(expected, actual, min_share=MIN_SHARE):
+    # Both are count vectors over the same bins
+    expected = np.maximum(np.asarray(expected, dtype=np.float64) / max(np.sum(expected), 1), min_share)
+    actual = np.maximum(np.asarray(actual, dtype=np.float64) / max(np.sum(actual), 1), min_share)
+
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+class StabilityMonitor(object):
+    # Characteristic stability (CSI) of every binned feature over its fitted WoE bins, and population stability
+    # (PSI) of the score over buckets cut at the training score deciles, both against the training counts.
+    # A batch is reduced to one count vector per feature (a snapshot of a few hundred integers), so trends over
+    # any number of batches are computed from the snapshots alone
+    def __init__(self, tables, score_edges, baseline):
+        self.tables = tables
+        self.score_edges = None if score_edges is None else np.asarray(score_edges, dtype=np.float64)
+        self.baseline = baseline
+
+    @classmethod
+    def fit(cls, woe_transform, df, scores=None, n_score_bins=10):
+        # tables: only what binning needs, so a saved monitor doesn't depend on the transform
+        tables = {icol: {'splits': itable['splits'], 'special_codes': itable['special_codes']}
+                  for icol, itable in woe_transform.compiled.tables.items()}
+        score_edges = None if scores is None else quantile_edges(scores, n_score_bins)
+
+        monitor = cls(tables, score_edges, baseline=None)
+        monitor.baseline = monitor.counts(df, scores=scores)
+
+        return monitor
+
+    def counts(self, df, scores=None):
+        res = {}
+        for icol, itable in self.tables.items():
+            x = np.asarray(df[icol], dtype=np.float64)
+            res[icol] = np.bincount(bin_codes(itable, x), minlength=n_bin_codes(itable))
+
+        if scores is not None and self.score_edges is not None:
+            scores = np.asarray(scores, dtype=np.float64)
+            res[SCORE] = np.bincount(bucket_index(self.score_edges, scores), minlength=len(self.score_edges) - 1)
+
+        return res
+
+    def snapshot(self, df, scores=None, batch=None):
+        return {
+            'batch': batch,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'n': len(df),
+            'counts': {icol: icounts.tolist() for icol, icounts in self.counts(df, scores=scores).items()},
+        }
+
+    def stability(self, counts):
+        # CSI per feature, and the score PSI when the snapshot has score counts
+        return {icol: psi(self.baseline[icol], icounts) for icol, icounts in counts.items() if icol in self.baseline}
+
+    def report(self, snapshots):
+        # One row per batch, one column per feature (+ 'score'), sorted as given
+        rows = []
+        for isnapshot in snapshots:
+            irow = {'batch': isnapshot['batch'], 'n': isnapshot['n']}
+            irow.update(self.stability(isnapshot['counts']))
+            rows.append(irow)
+
+        report = pd.DataFrame(rows).set_index('batch')
+        report['max_csi'] = report.drop(columns=['n', SCORE], errors='ignore').max(axis=1)
+
+        return report
+
+    @staticmethod
+    def flag(report, threshold=PSI_THRESHOLDS[1]):
+        # (batch, feature) pairs above the threshold
+        values = report.drop(columns=['n', 'max_csi'])
+        stacked = values.stack()
+
+        return stacked[stacked > threshold]
+
+    def save(self, path):
+        arrays = {}
+        meta = {'columns': {}, 'has_score_edges': self.score_edges is not None}
+
+        for i, (icol, itable) in enumerate(self.tables.items()):
+            meta['columns'][icol] = i
+            arrays[f"{i}_splits"] = itable['splits']
+            arrays[f"{i}_special_codes"] = itable['special_codes']
+            arrays[f"{i}_baseline"] = self.baseline[icol]
+
+        if self.score_edges is not None:
+            arrays['score_edges'] = self.score_edges
+            arrays['score_baseline'] = self.baseline[SCORE]
+
+        np.savez(path, meta=np.array(json.dumps(meta)), **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+
+            tables, baseline = {}, {}
+            for icol, i in meta['columns'].items():
+                tables[icol] = {'splits': data[f"{i}_splits"], 'special_codes': data[f"{i}_special_codes"]}
+                baseline[icol] = data[f"{i}_baseline"]
+
+            score_edges = None
+            if meta['has_score_edges']:
+                score_edges = data['score_edges']
+                baseline[SCORE] = data['score_baseline']
+
+        return cls(tables, score_edges, baseline)
+
+
+class SnapshotLog(object):
+    # Snapshots appended as JSON lines; a batch costs a few kB whatever its size
+    def __init__(self, path):
+        self.path = path
+
+    def append(self, snapshot):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(snapshot) + '\n')
+
+    def read(self):
+        if not os.path.exists(self.path):
+            return []
+
+        with open(self.path) as f:
+            return [json.loads(iline) for iline in f if iline.strip()]
@@ -0,0 +1,289 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.utils.misc import file_fingerprint, fingerprint
+
+# Rows kept per class for quantiles and histograms
+SAMPLE_SIZE = 100_000
+QUANTILES = (0.01, 0.25, 0.5, 0.75, 0.99)
+MOMENTS = ('n', 'na', 'mean', 'm2', 'm3', 'm4', 'min', 'max')
+
+
+def _seed_list(seed):
+    # An int or a tuple of ints, as np.random.default_rng takes them; a list once it has been through JSON
+    return [int(i) for i in np.atleast_1d(seed)]
+
+
+def _class_key(label):
+    return 'nan' if label != label else str(int(label))
+
+
+def _combine(a, b):
+    # Pairwise update of count, mean and central moment sums (Chan et al. / Pebay), one entry per column
+    n = a['n'] + b['n']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        d = b['mean'] - a['mean']
+        fa, fb = a['n'] / n, b['n'] / n
+
+        res = {
+            'n': n,
+            'na': a['na'] + b['na'],
+            'mean': a['mean'] + d * fb,
+            'm2': a['m2'] + b['m2'] + d ** 2 * a['n'] * fb,
+            'm3': (a['m3'] + b['m3'] + d ** 3 * a['n'] * fb * (fa - fb)
+                   + 3 * d * (fa * b['m2'] - fb * a['m2'])),
+            'm4': (a['m4'] + b['m4'] + d ** 4 * a['n'] * fb * (fa ** 2 - fa * fb + fb ** 2)
+                   + 6 * d ** 2 * (fa ** 2 * b['m2'] + fb ** 2 * a['m2']) + 4 * d * (fa * b['m3'] - fb * a['m3'])),
+            'min': np.fmin(a['min'], b['min']),
+            'max': np.fmax(a['max'], b['max']),
+        }
+
+    # A side with no values contributes nothing; the formulas above would turn its NaN mean into NaNs
+    for ikey in ('mean', 'm2', 'm3', 'm4'):
+        res[ikey] = np.where(a['n'] == 0, b[ikey], np.where(b['n'] == 0, a[ikey], res[ikey]))
+
+    return res
+
+
+def _chunk_moments(X):
+    isnan = np.isnan(X)
+    n = (~isnan).sum(axis=0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.nansum(X, axis=0) / n
+
+        # Missing values are centered to 0, so plain sums of products skip them
+        centered = np.where(isnan, 0., X - mean)
+        squared = centered * centered
+
+        res = {'n': n, 'na': isnan.sum(axis=0), 'mean': mean, 'm2': squared.sum(axis=0),
+               'm3': (squared * centered).sum(axis=0), 'm4': (squared * squared).sum(axis=0)}
+
+    res['min'] = np.fmin.reduce(X, axis=0) if len(X) else np.full(X.shape[1], np.nan)
+    res['max'] = np.fmax.reduce(X, axis=0) if len(X) else np.full(X.shape[1], np.nan)
+
+    return res
+
+
+def _empty_moments(n_columns):
+    res = {ikey: np.zeros(n_columns) for ikey in MOMENTS}
+    res['n'] = np.zeros(n_columns, dtype=np.int64)
+    res['na'] = np.zeros(n_columns, dtype=np.int64)
+    res['mean'] = np.full(n_columns, np.nan)
+    res['min'] = np.full(n_columns, np.nan)
+    res['max'] = np.full(n_columns, np.nan)
+
+    return res
+
+
+class DataProfile(object):
+    # One pass over a frame or a chunked CSV: per column and per class of ycol, exact NA counts, min/max and
+    # moments (merged chunk by chunk), plus a uniform sample of rows per class (bottom-k random keys, which also
+    # merges exactly) for quantiles and histograms. Profiles of different chunks or files merge; each needs its own
+    # seed, e.g. seed=(seed, part), or their rows would draw the same keys
+    def __init__(self, columns, ycol='SeriousDlqin2yrs', sample_size=SAMPLE_SIZE, seed=0):
+        self.columns = list(columns)
+        self.ycol = ycol
+        self.sample_size = sample_size
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+
+        self.moments = {}
+        self.samples = {}
+
+    def update(self, df):
+        X = np.column_stack([np.asarray(df[icol], dtype=np.float64) for icol in self.columns])
+
+        if self.ycol in df:
+            labels = np.asarray(df[self.ycol], dtype=np.float64)
+            classes = {_class_key(ilabel): ilabel for ilabel in pd.unique(labels)}
+        else:
+            labels, classes = None, {'nan': np.nan}
+
+        for ikey, ilabel in classes.items():
+            if labels is None:
+                iX = X
+            else:
+                iX = X[np.isnan(labels)] if ikey == 'nan' else X[labels == ilabel]
+
+            self._add(ikey, _chunk_moments(iX), self.rng.random(len(iX)), iX)
+
+        return self
+
+    def _add(self, key, moments, sample_keys, sample_values):
+        if key not in self.moments:
+            self.moments[key] = _empty_moments(len(self.columns))
+            self.samples[key] = (np.empty(0), np.empty((0, len(self.columns))))
+
+        self.moments[key] = _combine(self.moments[key], moments)
+
+        keys = np.concatenate([self.samples[key][0], sample_keys])
+        values = np.concatenate([self.samples[key][1], sample_values])
+        if len(keys) > self.sample_size:
+            keep = np.argpartition(keys, self.sample_size)[:self.sample_size]
+            keys, values = keys[keep], values[keep]
+
+        self.samples[key] = (keys, values)
+
+    def merge(self, other):
+        assert self.columns == other.columns
+        assert _seed_list(self.seed) != _seed_list(other.seed), "Profiles to merge need different seeds"
+
+        # Rows added to the merged profile later draw keys from neither part's stream
+        res = DataProfile(self.columns, ycol=self.ycol, sample_size=self.sample_size,
+                          seed=_seed_list(self.seed) + _seed_list(other.seed))
+        for iprofile in (self, other):
+            for ikey, imoments in iprofile.moments.items():
+                res._add(ikey, imoments, *iprofile.samples[ikey])
+
+        return res
+
+    def __add__(self, other):
+        return self.merge(other)
+
+    @property
+    def classes(self):
+        return sorted(self.moments)
+
+    def _overall(self):
+        res = _empty_moments(len(self.columns))
+        for ikey in self.classes:
+            res = _combine(res, self.moments[ikey])
+
+        return res
+
+    def _overall_sample(self):
+        # The rows with the smallest keys over all classes: each class sample holds its class's smallest keys, so
+        # this is the sample one bottom-k over every row would have kept, with no class over-represented
+        keys = np.concatenate([self.samples[ikey][0] for ikey in self.classes])
+        values = np.concatenate([self.samples[ikey][1] for ikey in self.classes])
+        if len(keys) > self.sample_size:
+            values = values[np.argpartition(keys, self.sample_size)[:self.sample_size]]
+
+        return values
+
+    def summary(self, key=None):
+        # One row per column: NA counts, exact min/max and moments, and quantiles from the sample. std, skew and
+        # kurtosis are the sample estimates pandas reports
+        moments = self._overall() if key is None else self.moments[key]
+        n, na = moments['n'], moments['na']
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            g1 = np.sqrt(n) * moments['m3'] / moments['m2'] ** 1.5
+            g2 = n * moments['m4'] / moments['m2'] ** 2 - 3
+
+            table = pd.DataFrame({
+                'N/A count': na,
+                'N/A fraction': na / (n + na),
+                'count': n,
+                'mean': moments['mean'],
+                'std': np.sqrt(moments['m2'] / (n - 1)),
+                'skew': np.sqrt(n * (n - 1)) / (n - 2) * g1,
+                'kurtosis': (n - 1) / ((n - 2) * (n - 3)) * ((n + 1) * g2 + 6),
+                'min': moments['min'],
+                'max': moments['max'],
+            }, index=pd.Index(self.columns, name='Variable Name'))
+
+        values = self.samples[key][1] if key is not None else self._overall_sample()
+        with np.errstate(all='ignore'):
+            quantiles = np.nanquantile(values, QUANTILES, axis=0) if len(values) else np.full(
+                (len(QUANTILES), len(self.columns)), np.nan)
+        for iq, iquantile in zip(QUANTILES, quantiles):
+            table[f"q{int(round(100 * iq)):02d}"] = iquantile
+
+        return table
+
+    def histogram(self, column, bins=50):
+        # Fixed bins over the exact [min, max]; counts per class estimated from its sample and scaled to the
+        # class's number of non-missing values
+        j = self.columns.index(column)
+        overall = self._overall()
+        edges = np.linspace(overall['min'][j], overall['max'][j], bins + 1)
+
+        counts = {}
+        for ikey in self.classes:
+            x = self.samples[ikey][1][:, j]
+            x = x[~np.isnan(x)]
+            icounts, _ = np.histogram(x, bins=edges)
+            counts[ikey] = icounts * (self.moments[ikey]['n'][j] / max(len(x), 1))
+
+        return edges, counts
+
+    def save(self, path):
+        arrays = {}
+        for i, ikey in enumerate(self.classes):
+            for imoment in MOMENTS:
+                arrays[f"{i}_{imoment}"] = self.moments[ikey][imoment]
+            arrays[f"{i}_sample_keys"], arrays[f"{i}_sample_values"] = self.samples[ikey]
+
+        meta = {'columns': self.columns, 'ycol': self.ycol, 'sample_size': self.sample_size,
+                'seed': _seed_list(self.seed), 'rng_state': self.rng.bit_generator.state, 'classes': self.classes}
+        np.savez(path, meta=np.array(json.dumps(meta)), **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+
+            profile = cls(meta['columns'], ycol=meta['ycol'], sample_size=meta['sample_size'],
+                          seed=meta.get('seed', 0))
+            # Later updates continue the key stream instead of repeating it
+            if 'rng_state' in meta:
+                profile.rng.bit_generator.state = meta['rng_state']
+            for i, ikey in enumerate(meta['classes']):
+                profile.moments[ikey] = {imoment: data[f"{i}_{imoment}"] for imoment in MOMENTS}
+                profile.samples[ikey] = (data[f"{i}_sample_keys"], data[f"{i}_sample_values"])
+
+        return profile
+
+
+def _profile_columns(columns, ycol, idcol='id'):
+    return [icol for icol in columns if icol not in (ycol, idcol)]
+
+
+def profile_df(df, ycol='SeriousDlqin2yrs', chunksize=1_000_000, sample_size=SAMPLE_SIZE, seed=0, cache_dir=None):
+    path = None
+    if cache_dir is not None:
+        key = fingerprint(df, ycol, sample_size, seed)
+        path = os.path.join(cache_dir, f"profile-{key}.npz")
+        if os.path.exists(path):
+            return DataProfile.load(path)
+
+    profile = DataProfile(_profile_columns(df.columns, ycol), ycol=ycol, sample_size=sample_size, seed=seed)
+    for istart in range(0, len(df), chunksize):
+        profile.update(df.iloc[istart:istart + chunksize])
+
+    if path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        profile.save(path)
+
+    return profile
+
+
+def profile_csv(input_csv, ycol='SeriousDlqin2yrs', chunksize=1_000_000, sample_size=SAMPLE_SIZE, seed=0,
+                cache_dir=None):
+    # Bounded memory whatever the file size; cached under the file's content hash
+    from src.utils.score import iter_csv_chunks
+
+    path = None
+    if cache_dir is not None:
+        key = fingerprint(file_fingerprint(input_csv), ycol, sample_size, seed)
+        path = os.path.join(cache_dir, f"profile-{key}.npz")
+        if os.path.exists(path):
+            return DataProfile.load(path)
+
+    profile = None
+    for ichunk in iter_csv_chunks(input_csv, chunksize):
+        if profile is None:
+            profile = DataProfile(_profile_columns(ichunk.columns, ycol), ycol=ycol, sample_size=sample_size,
+                                  seed=seed)
+        profile.update(ichunk)
+
+    if path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        profile.save(path)
+
+    return profile
@@ -0,0 +1,149 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from src.data.utils import get_xy
+from src.utils.instrument import span
+
+_WORKER_MODEL = None
+
+
+def iter_csv_chunks(input_csv, chunksize):
+    # Same column handling as read_df, one bounded chunk at a time
+    for ichunk in pd.read_csv(input_csv, chunksize=chunksize):
+        ichunk.rename(columns={ichunk.columns.values[0]: 'id'}, inplace=True)
+        yield ichunk
+
+
+def score_chunk(model, chunk):
+    with span('score_chunk', rows=len(chunk)):
+        tX, _ = get_xy(chunk)
+        typred = model.predict(tX)
+        if not isinstance(typred, np.ndarray):
+            typred = typred.to_numpy()
+
+    return pd.DataFrame({'id': chunk['id'].to_numpy(), 'Probability': typred})
+
+
+def _init_worker(model):
+    global _WORKER_MODEL
+    _WORKER_MODEL = model
+
+
+def _score_chunk_worker(chunk):
+    return score_chunk(_WORKER_MODEL, chunk)
+
+
+def score_csv(input_csv, model, output_csv, chunksize=100_000, n_jobs=1, max_in_flight=None):
+    with span('score_csv') as s:
+        report = _score_csv(input_csv, model, output_csv, chunksize, n_jobs, max_in_flight)
+        s.rows = report['rows']
+
+    return report
+
+
+def _score_csv(input_csv, model, output_csv, chunksize, n_jobs, max_in_flight):
+    start = time.perf_counter()
+    n_rows = 0
+
+    with open(output_csv, 'w', newline='') as f:
+        def write(pred_out, header):
+            pred_out.to_csv(f, header=header, index=False)
+            return len(pred_out)
+
+        if n_jobs == 1:
+            for ichunk_id, ichunk in enumerate(iter_csv_chunks(input_csv, chunksize)):
+                n_rows += write(score_chunk(model, ichunk), ichunk_id == 0)
+
+        else:
+            if max_in_flight is None:
+                max_in_flight = 2 * n_jobs
+
+            # The model is shipped once per worker. At most max_in_flight chunks are read ahead, which bounds
+            # memory, and results are written in submission order so the output follows the input
+            with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=(model,)) as executor:
+                in_flight = deque()
+                n_written = 0
+
+                for ichunk in iter_csv_chunks(input_csv, chunksize):
+                    if len(in_flight) >= max_in_flight:
+                        n_rows += write(in_flight.popleft().result(), n_written == 0)
+                        n_written += 1
+
+                    in_flight.append(executor.submit(_score_chunk_worker, ichunk))
+
+                while in_flight:
+                    n_rows += write(in_flight.popleft().result(), n_written == 0)
+                    n_written += 1
+
+    elapsed = time.perf_counter() - start
+
+    return {'rows': n_rows, 'seconds': elapsed, 'rows_per_second': n_rows / elapsed if elapsed > 0 else 0.0}
+
+
+def load_transform(name):
+    # Either a preset from src/data/transforms, or a fitted WoE transform given as '<class name>:<path>'
+    from src.data.transforms import null_transform, simple_transform, woe_transform
+
+    if ':' in name:
+        class_name, path = name.split(':', 1)
+        transform = getattr(woe_transform, class_name)()
+        transform.load(path)
+
+        return transform
+
+    for imodule in (null_transform, simple_transform):
+        if hasattr(imodule, name):
+            return getattr(imodule, name)
+
+    raise ValueError(f"Unknown transform {name}")
+
+
+def load_model(model_class, model_path, transform=None):
+    from src.models.ensemble import Ensemble
+    from src.models.registry import get_model_class
+
+    model = get_model_class(model_class)(model_path)
+    if transform is not None:
+        transform = load_transform(transform)
+
+    # A single member ensemble applies the transform, as in the notebooks
+    model_with_transform = Ensemble(n_jobs=1)
+    model_with_transform.add_model(model, weight=1.0, transform=transform)
+
+    return model_with_transform
+
+
+def main(argv=None):
+    from src.models.bundle import load_bundle
+
+    parser = argparse.ArgumentParser(description="Stream a CSV through a model in bounded memory")
+    parser.add_argument('input_csv')
+    parser.add_argument('output_csv')
+    parser.add_argument('--bundle', default=None, help="model bundle directory (see src/models/bundle.py)")
+    parser.add_argument('--model-class', default=None, help="e.g. XGBoostClassifier")
+    parser.add_argument('--model-path', default=None)
+    parser.add_argument('--transform', default=None,
+                        help="transform preset name, e.g. null_transform, or WoETransformV2:<path>")
+    parser.add_argument('--chunksize', type=int, default=100_000)
+    parser.add_argument('--n-jobs', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    if args.bundle is not None:
+        model = load_bundle(args.bundle)
+    else:
+        model = load_model(args.model_class, args.model_path, transform=args.transform)
+
+    report = score_csv(args.input_csv, model, args.output_csv, chunksize=args.chunksize, n_jobs=args.n_jobs)
+    print(f"Scored {report['rows']} rows in {report['seconds']:.2f}s ({report['rows_per_second']:.0f} rows/s) "
+          f"to {args.output_csv}")
+
+    return report
+
+
+if __name__ == '__main__':
+    main()
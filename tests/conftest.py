@@ -0,0 +1,8 @@
+import pytest
+
+from src.benchmarks.synthetic import make_synthetic_df
+
+
+@pytest.fixture(scope='session')
+def synthetic_df():
+    return make_synthetic_df(20_000, seed=0)
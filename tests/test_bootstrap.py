@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from sklearn.metrics import roc_auc_score
+from src.utils.bootstrap import bootstrap_compare, bootstrap_metrics, rank_bins
+
+
+@pytest.fixture(scope='module')
+def scores():
+    rng = np.random.default_rng(0)
+    n = 5000
+    y_true = (rng.random(n) < 0.1).astype(np.int64)
+    y_pred_a = y_true * 0.8 + rng.standard_normal(n)
+    y_pred_b = y_pred_a + 0.5 * rng.standard_normal(n)
+
+    # Rounded so that ties occur, as with scorecard points
+    return y_true, np.round(y_pred_a, 2), np.round(y_pred_b, 2)
+
+
+def test_rank_bins_keep_ties_together(scores):
+    _, y_pred, _ = scores
+    bins, n_bins = rank_bins(y_pred, 64)
+
+    assert n_bins <= 64
+    for ivalue in np.unique(y_pred)[:50]:
+        assert len(np.unique(bins[y_pred == ivalue])) == 1
+    assert (np.diff(bins[np.argsort(y_pred, kind='stable')]) >= 0).all()
+
+
+def test_estimates_are_exact(scores):
+    y_true, y_pred, _ = scores
+    res = bootstrap_metrics(y_true, y_pred, n_boot=100, n_jobs=1)
+
+    assert res.loc['auc', 'estimate'] == pytest.approx(roc_auc_score(y_true, y_pred), abs=1e-12)
+    assert res.loc['gini', 'estimate'] == pytest.approx(2 * roc_auc_score(y_true, y_pred) - 1, abs=1e-12)
+
+
+def test_spread_matches_naive_resampling(scores):
+    y_true, y_pred, _ = scores
+    res = bootstrap_metrics(y_true, y_pred, n_boot=1000, n_jobs=1)
+
+    rng = np.random.default_rng(1)
+    naive = []
+    for _ in range(500):
+        index = rng.integers(len(y_true), size=len(y_true))
+        naive.append(roc_auc_score(y_true[index], y_pred[index]))
+
+    assert res.loc['auc', 'std'] == pytest.approx(np.std(naive, ddof=1), rel=0.15)
+    assert res.loc['auc', 'lower'] < res.loc['auc', 'estimate'] < res.loc['auc', 'upper']
+
+
+def test_independent_of_n_jobs(scores):
+    y_true, y_pred, _ = scores
+    kwargs = dict(n_boot=250, seed=3)
+
+    assert bootstrap_metrics(y_true, y_pred, n_jobs=1, **kwargs).equals(
+        bootstrap_metrics(y_true, y_pred, n_jobs=2, **kwargs))
+
+
+def test_paired_difference(scores):
+    y_true, y_pred_a, y_pred_b = scores
+    res = bootstrap_compare(y_true, y_pred_a, y_pred_b, n_boot=500, n_jobs=1)
+
+    assert res.loc['auc', 'difference'] == pytest.approx(roc_auc_score(y_true, y_pred_b)
+                                                         - roc_auc_score(y_true, y_pred_a), abs=1e-12)
+    # b is a noisier copy of a: clearly worse, and the paired interval is much narrower than separate ones
+    assert res.loc['auc', 'upper'] < 0
+    assert res.loc['auc', 'p_value'] < 0.05
+
+    separate = [bootstrap_metrics(y_true, iy_pred, n_boot=500, n_jobs=1).loc['auc', 'std']
+                for iy_pred in (y_pred_a, y_pred_b)]
+    assert res.loc['auc', 'std'] < 0.8 * np.hypot(*separate)
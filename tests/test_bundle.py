@@ -0,0 +1,90 @@
+import json
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+from src.data.transforms.null_transform import null_transform
+from src.data.transforms.simple_transform import log_almost_all_vars_transform_v3
+from src.data.transforms.woe_transform import WoETransformV2
+from src.data.utils import get_xy
+from src.models.bundle import load_bundle, save_bundle, validate_manifest
+from src.models.ensemble import Ensemble
+from src.models.models import LightGBMClassifier, StatsModelsLogisticRegression, XGBoostClassifier
+
+
+@pytest.fixture(scope='module')
+def ensemble(synthetic_df):
+    woe = WoETransformV2()
+    woe.woe_fit(synthetic_df, n_jobs=1)
+
+    members = [
+        (StatsModelsLogisticRegression(), woe, 0.2),
+        (XGBoostClassifier(n_estimators=20, max_depth=3), null_transform, 0.5),
+        (LightGBMClassifier(n_estimators=20, num_leaves=7, verbose=-1), log_almost_all_vars_transform_v3, 0.3),
+    ]
+
+    ensemble = Ensemble(n_jobs=1)
+    for imodel, itransform, iweight in members:
+        imodel.fit(*get_xy(itransform(synthetic_df)[0]))
+        ensemble.add_model(imodel, weight=iweight, transform=itransform)
+
+    return ensemble
+
+
+@pytest.fixture(scope='module')
+def X(synthetic_df):
+    return get_xy(synthetic_df)[0]
+
+
+def test_roundtrip(tmp_path, ensemble, X):
+    directory = str(tmp_path / 'bundle')
+    save_bundle(ensemble, directory, metadata={'name': 'test'})
+
+    bundle = load_bundle(directory)
+    assert bundle.manifest['metadata'] == {'name': 'test'}
+    assert len(bundle.model.models) == 3
+
+    # XGBoost's own probabilities are float32
+    np.testing.assert_allclose(bundle.predict(X), ensemble.predict(X), rtol=0, atol=1e-6)
+    np.testing.assert_array_equal(load_bundle(directory, mmap=False).predict(X), bundle.predict(X))
+
+
+def test_pickles_as_path(tmp_path, ensemble, X):
+    directory = str(tmp_path / 'bundle')
+    save_bundle(ensemble, directory)
+    bundle = load_bundle(directory)
+
+    data = pickle.dumps(bundle)
+    assert len(data) < 1000
+    np.testing.assert_array_equal(pickle.loads(data).predict(X.iloc[:100]), bundle.predict(X.iloc[:100]))
+
+
+def test_cascade_settings_roundtrip(tmp_path, ensemble, X):
+    cascade = Ensemble(n_jobs=1, cascade_band=(0.3, 1.0))
+    for i, imodel in enumerate(ensemble.models):
+        cascade.add_model(imodel['model'], weight=imodel['weight'], transform=imodel['transform'], stage=min(i, 1))
+    cascade.fit_cascade(X)
+
+    directory = str(tmp_path / 'bundle')
+    save_bundle(cascade, directory)
+    bundle = load_bundle(directory)
+
+    assert bundle.model.cascade_band == [0.3, 1.0]
+    assert [imodel['stage'] for imodel in bundle.model.models] == [0, 1, 1]
+    np.testing.assert_allclose(bundle.predict(X), cascade.predict(X), rtol=0, atol=1e-6)
+
+
+def test_validation(tmp_path, ensemble):
+    directory = str(tmp_path / 'bundle')
+    manifest = save_bundle(ensemble, directory)
+
+    os.remove(os.path.join(directory, 'arrays', sorted(manifest['arrays'])[0] + '.npy'))
+    with pytest.raises(ValueError, match='missing'):
+        load_bundle(directory)
+
+    broken = json.loads(json.dumps(manifest))
+    broken['input_columns'] = [icol for icol in broken['input_columns'] if icol != 'age']
+    with pytest.raises(ValueError):
+        validate_manifest(broken, directory)
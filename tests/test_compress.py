@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.models.models import StatsModelsLogisticRegression, compress_design
+
+
+@pytest.fixture(scope='module')
+def xy():
+    # Few distinct values per column, so most rows are duplicates of another
+    rng = np.random.default_rng(0)
+    n = 20_000
+    X = pd.DataFrame({
+        'a': rng.integers(0, 4, n).astype(np.float64),
+        'b': rng.choice([-0.5, 0.25, 1.0], n),
+        'c': rng.integers(0, 3, n).astype(np.float64),
+    })
+    logit = -2 + 0.6 * X['a'] - 0.8 * X['b'] + 0.3 * X['c']
+    y = pd.Series((rng.random(n) < 1 / (1 + np.exp(-logit))).astype(np.int64), name='y')
+
+    return X, y
+
+
+def test_compress_design_groups_nan_rows():
+    X = pd.DataFrame({'a': [1.0, np.nan, 1.0, np.nan, np.nan, 2.0], 'b': [0.0, 5.0, 0.0, 5.0, 5.0, np.nan]})
+    y = np.array([0, 1, 0, 1, 0, 1])
+    weights = np.arange(1.0, 7.0)
+
+    X_c, y_c, w_c = compress_design(X, y, weights)
+
+    # NaN rows are grouped like any other value: (1, 0, 0), (nan, 5, 1), (nan, 5, 0), (2, nan, 1)
+    assert len(X_c) == 4
+    assert w_c.sum() == weights.sum()
+
+    expected = pd.DataFrame(X).assign(y=y, w=weights).groupby(['a', 'b', 'y'], dropna=False)['w'].sum()
+    actual = X_c.assign(y=y_c.to_numpy(), w=w_c).set_index(['a', 'b', 'y'])['w']
+    pd.testing.assert_series_equal(actual.sort_index(), expected.sort_index(), check_names=False)
+
+
+def test_compress_matches_full_fit(xy):
+    X, y = xy
+
+    full = StatsModelsLogisticRegression()
+    full.fit(X, y)
+
+    compressed = StatsModelsLogisticRegression(compress=True)
+    compressed.fit(X, y)
+
+    assert len(compressed.model.model.endog) <= 4 * 3 * 3 * 2
+    np.testing.assert_allclose(compressed.model.params, full.model.params, rtol=1e-9, atol=1e-12)
+    np.testing.assert_allclose(compressed.predict(X), full.predict(X), rtol=1e-9, atol=1e-12)
@@ -0,0 +1,98 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from src.data.utils import get_xy
+from src.models.datasets import PreparedDataset
+from src.models.fit import cross_validate
+from src.models.models import LightGBMClassifier, XGBoostClassifier
+
+MODELS = [
+    (XGBoostClassifier, {'n_estimators': 20, 'max_depth': 2}),
+    (LightGBMClassifier, {'n_estimators': 20, 'num_leaves': 7, 'verbose': -1}),
+]
+
+
+@pytest.fixture(scope='module')
+def df(synthetic_df):
+    return synthetic_df.iloc[:5_000].drop(columns=['id'])
+
+
+@pytest.mark.parametrize('model_class, model_kwargs', MODELS)
+def test_cross_validate_matches_frame(df, tmp_path, model_class, model_kwargs):
+    dataset = PreparedDataset.for_model(model_class, *get_xy(df), cache_dir=tmp_path)
+
+    frame = cross_validate(df, 3, model_class, model_kwargs, n_jobs=1, random_state=0)
+    # Workers reload the dataset from cache_dir
+    prepared = cross_validate(df, 3, model_class, model_kwargs, n_jobs=2, random_state=0, dataset=dataset)
+
+    for (itrain, itest), (jtrain, jtest) in zip(prepared['folds'], frame['folds']):
+        np.testing.assert_array_equal(itrain, jtrain)
+        np.testing.assert_array_equal(itest, jtest)
+
+    # Same rows, but the libraries bin a Dataset/DMatrix slightly differently from a frame
+    np.testing.assert_allclose(prepared['fold_auc'], frame['fold_auc'], rtol=0, atol=0.01)
+    assert prepared['final_model'] is not None
+
+
+@pytest.mark.parametrize('model_class', [XGBoostClassifier, LightGBMClassifier])
+def test_cache_hit_reloads(df, tmp_path, model_class):
+    X, y = get_xy(df)
+    built = PreparedDataset.for_model(model_class, X, y, cache_dir=tmp_path)
+    reloaded = PreparedDataset.for_model(model_class, X, y, cache_dir=tmp_path)
+
+    assert reloaded.path == built.path
+    assert reloaded._handle is None
+
+    index = np.arange(0, len(df), 3)
+    for idataset in (built, reloaded):
+        isubset = idataset.subset(index)
+        if model_class is LightGBMClassifier:
+            isubset = isubset.construct()
+        np.testing.assert_array_equal(isubset.get_label(), y.to_numpy()[index])
+
+    # A reloaded copy still pickles down to its path
+    assert pickle.loads(pickle.dumps(reloaded)).path == built.path
+
+
+def test_pickle_needs_cache_dir(df):
+    dataset = PreparedDataset.for_model(XGBoostClassifier, *get_xy(df))
+
+    with pytest.raises(ValueError, match="cache_dir"):
+        pickle.dumps(dataset)
+
+
+def _early_stopped(df, model_class, **model_kwargs):
+    X, y = get_xy(df)
+    dataset = PreparedDataset.for_model(model_class, X, y)
+
+    model = model_class(n_estimators=500, learning_rate=0.3, **model_kwargs)
+    model.fit(dataset.subset(np.arange(0, 4_000)), None, eval_set=[(dataset.subset(np.arange(4_000, len(df))), None)],
+              early_stopping_rounds=5)
+
+    return model, X.iloc[4_000:]
+
+
+def test_early_stopped_xgboost_booster_predicts_at_best_iteration(df):
+    import xgboost as xgb
+
+    model, X_valid = _early_stopped(df, XGBoostClassifier, max_depth=3)
+    booster = model.model
+    best_iteration = int(booster.attr('best_iteration'))
+
+    # The trees after the best iteration are kept but not used
+    assert best_iteration + 5 == booster.num_boosted_rounds() - 1
+    np.testing.assert_array_equal(model.predict(X_valid),
+                                  booster.predict(xgb.DMatrix(X_valid), iteration_range=(0, best_iteration + 1)))
+    assert not np.array_equal(model.predict(X_valid), booster.predict(xgb.DMatrix(X_valid)))
+
+
+def test_early_stopped_lightgbm_booster_predicts_at_best_iteration(df):
+    model, X_valid = _early_stopped(df, LightGBMClassifier, num_leaves=7, verbose=-1)
+    booster = model.model
+
+    # lgb.train keeps only the trees up to the best iteration
+    assert 0 < booster.best_iteration == booster.current_iteration() < 500
+    np.testing.assert_array_equal(model.predict(X_valid),
+                                  booster.predict(X_valid, num_iteration=booster.best_iteration))
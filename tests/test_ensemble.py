@@ -0,0 +1,144 @@
+import numpy as np
+import pytest
+
+from src.models.ensemble import Ensemble
+
+
+class _Model(object):
+    def __init__(self, scale):
+        self.scale = scale
+
+    def predict(self, X):
+        return 1 / (1 + np.exp(-self.scale * X['x'].to_numpy()))
+
+
+class _Shift(object):
+    def __init__(self, shift):
+        self.shift = shift
+        self.calls = 0
+
+    def __call__(self, df):
+        self.calls += 1
+        return df.assign(x=df['x'] + self.shift), None
+
+
+@pytest.fixture
+def members():
+    tr1, tr2 = _Shift(0.1), _Shift(-0.3)
+    # Interleaved transforms: groups run A, C then B, but the sum must follow A, B, C
+    return [(_Model(0.7), 0.3, tr1), (_Model(1.9), 1.1, tr2), (_Model(-0.4), 0.55, tr1)]
+
+
+def _serial(members, X):
+    results, weights = None, 0
+    for imodel, iweight, itr in members:
+        ires = iweight * imodel.predict(itr(X)[0])
+        results = ires if results is None else results + ires
+        weights += iweight
+
+    return results / weights
+
+
+@pytest.mark.parametrize('n_jobs', [1, 4])
+def test_predict_matches_serial_loop(synthetic_df, members, n_jobs):
+    X = synthetic_df[['id']].assign(x=np.random.default_rng(0).standard_normal(len(synthetic_df)) * 3)
+
+    ensemble = Ensemble(n_jobs=n_jobs)
+    for imodel, iweight, itr in members:
+        ensemble.add_model(imodel, weight=iweight, transform=itr)
+
+    np.testing.assert_array_equal(ensemble.predict(X), _serial(members, X))
+
+
+def test_shared_transform_runs_once(synthetic_df, members):
+    X = synthetic_df[['id']].assign(x=0.5)
+
+    ensemble = Ensemble(n_jobs=1)
+    for imodel, iweight, itr in members:
+        ensemble.add_model(imodel, weight=iweight, transform=itr)
+    ensemble.predict(X)
+
+    assert [itr.calls for itr in {id(itr): itr for _, _, itr in members}.values()] == [1, 1]
+
+
+class _Recorder(_Model):
+    def __init__(self, scale):
+        super().__init__(scale)
+        self.ids = []
+
+    def predict(self, X):
+        self.ids.append(X['id'].to_numpy())
+        return super().predict(X)
+
+
+@pytest.fixture
+def cascade_X(synthetic_df):
+    rng = np.random.default_rng(1)
+    X = synthetic_df[['id']].assign(x=rng.standard_normal(len(synthetic_df)) * 3)
+    # Positions, not labels, must drive the row selection
+    X.index = rng.permutation(len(X)) * 7
+
+    return X
+
+
+def _cascade(members, cascade_band=None):
+    # One cheap member at stage 0, two at stage 1; added in stage order
+    ensemble = Ensemble(n_jobs=1, cascade_band=cascade_band)
+    for istage, (imodel, iweight, itr) in zip([0, 1, 1], members):
+        ensemble.add_model(imodel, weight=iweight, transform=itr, stage=istage)
+
+    return ensemble
+
+
+@pytest.fixture
+def cascade_members():
+    tr1, tr2 = _Shift(0.1), _Shift(-0.3)
+    return [(_Recorder(0.7), 0.3, tr1), (_Recorder(1.9), 1.1, tr2), (_Recorder(-0.4), 0.55, tr1)]
+
+
+def _expected(members, X):
+    # Full ensemble and stage 0 running scores, from copies of the members that don't record their rows
+    members = [(_Model(imodel.scale), iweight, itr) for imodel, iweight, itr in members]
+    imodel, iweight, itr = members[0]
+
+    return _serial(members, X), iweight * imodel.predict(itr(X)[0]) / iweight
+
+
+def test_cascade_full_band_matches_predict(cascade_X, cascade_members):
+    full = _cascade(cascade_members).predict(cascade_X)
+
+    # Every running score lies in [0, 1], so every row reaches the last stage
+    np.testing.assert_array_equal(_cascade(cascade_members, cascade_band=(0, 1)).predict(cascade_X), full)
+    np.testing.assert_array_equal(full, _expected(cascade_members, cascade_X)[0])
+
+
+def test_cascade_narrow_band_escalates_in_band_rows(cascade_X, cascade_members):
+    res = _cascade(cascade_members, cascade_band=(0.4, 0.6)).predict(cascade_X)
+
+    full, stage0 = _expected(cascade_members, cascade_X)
+    in_band = (stage0 >= 0.4) & (stage0 <= 0.6)
+    assert 0 < in_band.sum() < len(cascade_X)
+
+    # Stage 1 members only saw the in-band rows, in input order
+    for imodel, _, _ in cascade_members[1:]:
+        assert len(imodel.ids) == 1
+        np.testing.assert_array_equal(imodel.ids[0], cascade_X['id'].to_numpy()[in_band])
+
+    # Out-of-band rows keep their stage 0 score, in-band rows get the full ensemble score, at their own position
+    np.testing.assert_array_equal(res[~in_band], stage0[~in_band])
+    np.testing.assert_array_equal(res[in_band], full[in_band])
+
+
+def test_cascade_report(cascade_X, cascade_members):
+    y = (np.random.default_rng(2).random(len(cascade_X)) < 0.1).astype(np.int64)
+    report = _cascade(cascade_members).cascade_report(cascade_X, y, cascade_band=(0.4, 0.6))
+
+    _, stage0 = _expected(cascade_members, cascade_X)
+    n_in_band = int(((stage0 >= 0.4) & (stage0 <= 0.6)).sum())
+    n = len(cascade_X)
+
+    assert report['stage_rows'] == {0: n, 1: n_in_band}
+    assert report['stage_fraction'] == {0: 1.0, 1: n_in_band / n}
+    # One member over every row, two over the in-band rows, out of three members over every row
+    assert report['member_predict_fraction'] == pytest.approx((n + 2 * n_in_band) / (3 * n), rel=1e-15)
+    assert report['auc_full'] != report['auc_cascade']
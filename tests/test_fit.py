@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from src.models.fit import cross_validate
+from src.models.models import LightGBMClassifier, XGBoostClassifier
+
+
+@pytest.fixture(scope='module')
+def df(synthetic_df):
+    return synthetic_df.iloc[:5_000].drop(columns=['id'])
+
+
+@pytest.mark.parametrize('model_class, model_kwargs', [
+    (XGBoostClassifier, {'n_estimators': 20, 'max_depth': 2}),
+    (LightGBMClassifier, {'n_estimators': 20, 'num_leaves': 7, 'verbose': -1}),
+])
+def test_parallel_matches_serial(df, model_class, model_kwargs):
+    # n_jobs=2 fits in worker processes on SharedFrame views of the same rows
+    serial = cross_validate(df, 3, model_class, model_kwargs, n_jobs=1, random_state=0)
+    parallel = cross_validate(df, 3, model_class, model_kwargs, n_jobs=2, random_state=0)
+
+    np.testing.assert_array_equal(parallel['oof_pred'], serial['oof_pred'])
+    assert parallel['fold_auc'] == serial['fold_auc']
+
+    # The refit model is built from model_kwargs, with the worker's thread limit undone
+    params = parallel['final_model'].model.get_params()
+    assert params['n_estimators'] == 20
+    assert params['n_jobs'] is None
+    assert all(params[ikey] == ivalue for ikey, ivalue in model_kwargs.items())
+
+
+def test_model_kwargs_n_jobs_kept(df):
+    cv = cross_validate(df, 2, XGBoostClassifier, {'n_estimators': 5, 'n_jobs': 1}, n_jobs=2, random_state=0)
+    assert cv['final_model'].model.get_params()['n_jobs'] == 1
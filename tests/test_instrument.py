@@ -0,0 +1,51 @@
+import tracemalloc
+
+import numpy as np
+
+from src.utils import instrument
+from src.utils.instrument import recording, span
+
+
+def test_disabled_spans_record_nothing():
+    assert instrument.get_recorder() is None
+    with span('idle', rows=10) as s:
+        s.rows = 20
+
+    assert s is instrument._NOOP_SPAN
+
+
+def test_records_nested_spans():
+    with recording() as recorder:
+        with span('outer', rows=100):
+            with span('inner', rows=50, stage='a'):
+                np.ones(1_000_000)
+
+    stats = {irow['name']: irow for irow in recorder.summary()}
+    assert stats['outer']['calls'] == 1 and stats['outer']['rows'] == 100
+    assert stats['inner']['parent'] == 'outer'
+    assert stats['inner']['labels'] == {'stage': 'a'}
+    # numpy reports its allocations to tracemalloc; the outer span sees the inner peak
+    assert stats['inner']['peak_bytes'] >= 8_000_000
+    assert stats['outer']['peak_bytes'] >= stats['inner']['peak_bytes']
+
+    text = recorder.to_prometheus()
+    assert 'credit_scoring_span_calls_total{span="outer"} 1' in text
+
+
+def test_leaves_callers_trace_running():
+    tracemalloc.start()
+    try:
+        with recording():
+            pass
+        assert tracemalloc.is_tracing()
+
+    finally:
+        tracemalloc.stop()
+
+
+def test_stops_its_own_trace():
+    assert not tracemalloc.is_tracing()
+    with recording():
+        assert tracemalloc.is_tracing()
+
+    assert not tracemalloc.is_tracing()
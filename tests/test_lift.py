@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.utils.lift import LiftCounts, lift_table, quantile_edges
+
+
+@pytest.fixture(scope='module')
+def scores():
+    rng = np.random.default_rng(0)
+    y_pred = rng.random(10_000)
+    y_true = (rng.random(10_000) < y_pred * 0.3).astype(np.int64)
+
+    return y_true, y_pred
+
+
+def test_fixed_bands_match_pandas(scores):
+    y_true, y_pred = scores
+
+    table = lift_table(y_true, y_pred)
+    expected = pd.Series(y_true).groupby(pd.cut(y_pred, np.linspace(0, 1, 11), right=False), observed=False)
+
+    np.testing.assert_array_equal(table['n'], expected.size())
+    np.testing.assert_array_equal(table['bads'], expected.sum())
+    assert table['cum_bad_share'].iloc[-1] == 1
+
+
+def test_deciles_have_equal_populations(scores):
+    y_true, y_pred = scores
+
+    table = lift_table(y_true, y_pred, bins='deciles', ascending=False)
+    assert (table['n'] == 1000).all()
+    assert table.index[0] == 9
+
+
+def test_chunks_merge(scores):
+    y_true, y_pred = scores
+    edges = quantile_edges(y_pred, 20)
+
+    merged = LiftCounts.from_predictions(y_true[:3000], y_pred[:3000], edges) + \
+        LiftCounts.from_predictions(y_true[3000:], y_pred[3000:], edges)
+
+    pd.testing.assert_frame_equal(merged.to_frame(), LiftCounts.from_predictions(y_true, y_pred, edges).to_frame())
+
+
+@pytest.mark.parametrize('y_pred', [np.full(4, .3), np.array([.3, .3, .3, .7]), np.full(4, np.nan)])
+def test_constant_or_tied_predictions(y_pred):
+    table = lift_table([0, 1, 0, 1], y_pred, bins=10)
+
+    assert len(table) >= 1
+    assert table['n'].sum() == (~np.isnan(y_pred)).sum()
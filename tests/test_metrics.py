@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from sklearn.metrics import precision_recall_curve, roc_auc_score, roc_curve
+from src.utils.metrics import ScoreHistogram
+
+
+@pytest.fixture(scope='module')
+def scores():
+    rng = np.random.default_rng(0)
+    y = (rng.random(50_000) < 0.07).astype(np.int64)
+    # Rounded so that some scores tie, within and across classes
+    score = np.round(1 / (1 + np.exp(-(rng.normal(-2.5, 1, len(y)) + 1.2 * y))), 4)
+
+    return y, score
+
+
+def test_exact_matches_sklearn(scores):
+    y, score = scores
+    hist = ScoreHistogram(exact=True).update(y, score)
+
+    assert hist.auc() == pytest.approx(roc_auc_score(y, score), abs=1e-12)
+
+    fpr, tpr, thresholds = hist.roc_curve()
+    sk_fpr, sk_tpr, sk_thresholds = roc_curve(y, score, drop_intermediate=False)
+    np.testing.assert_allclose(fpr, sk_fpr, rtol=0, atol=1e-12)
+    np.testing.assert_allclose(tpr, sk_tpr, rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(thresholds, sk_thresholds)
+
+    precision, recall, thresholds = hist.pr_curve()
+    sk_precision, sk_recall, sk_thresholds = precision_recall_curve(y, score, drop_intermediate=False)
+    np.testing.assert_allclose(precision, sk_precision, rtol=0, atol=1e-12)
+    np.testing.assert_allclose(recall, sk_recall, rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(thresholds, sk_thresholds)
+
+
+@pytest.mark.parametrize('n_bins', [64, 1024, 1 << 16])
+def test_binned_auc_within_bound(scores, n_bins):
+    y, score = scores
+    hist = ScoreHistogram(n_bins=n_bins).update(y, score)
+
+    assert abs(hist.auc() - roc_auc_score(y, score)) <= hist.auc_error_bound()
+
+
+@pytest.mark.parametrize('exact', [False, True])
+def test_merged_chunks_match_one_pass(scores, exact):
+    y, score = scores
+    one_pass = ScoreHistogram(n_bins=1024, exact=exact).update(y, score)
+
+    parts = [ScoreHistogram(n_bins=1024, exact=exact).update(y[i:i + 7_000], score[i:i + 7_000])
+             for i in range(0, len(y), 7_000)]
+    merged = parts[0]
+    for ipart in parts[1:]:
+        merged = merged + ipart
+
+    for iresult, iexpected in zip(merged.counts(), one_pass.counts()):
+        np.testing.assert_array_equal(iresult, iexpected)
+    assert merged.summary() == one_pass.summary()
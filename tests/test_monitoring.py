@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data.transforms.woe_transform import WoETransformV2
+from src.utils.monitoring import SCORE, SnapshotLog, StabilityMonitor
+
+
+@pytest.fixture(scope='module')
+def scores(synthetic_df):
+    return np.random.default_rng(0).random(len(synthetic_df))
+
+
+@pytest.fixture(scope='module')
+def monitor(synthetic_df, scores):
+    transform = WoETransformV2()
+    transform.woe_fit(synthetic_df, n_jobs=1)
+
+    return StabilityMonitor.fit(transform, synthetic_df, scores=scores)
+
+
+@pytest.fixture(scope='module')
+def snapshots(synthetic_df, scores, monitor):
+    shifted = synthetic_df.assign(age=synthetic_df['age'] + 15)
+
+    return [monitor.snapshot(synthetic_df, scores=scores, batch='baseline'),
+            monitor.snapshot(shifted, scores=scores, batch='shifted')]
+
+
+def test_baseline_is_stable(monitor, snapshots):
+    report = monitor.report(snapshots)
+
+    assert set(WoETransformV2.spec) | {SCORE} <= set(report.columns)
+    assert (report.loc['baseline'].drop('n') == 0).all()
+
+
+def test_flags_only_the_shifted_column(monitor, snapshots):
+    flagged = StabilityMonitor.flag(monitor.report(snapshots))
+
+    assert list(flagged.index) == [('shifted', 'age')]
+    assert flagged.iloc[0] > 0.25
+
+
+def test_save_load(monitor, snapshots, tmp_path):
+    monitor.save(tmp_path / 'monitor.npz')
+    loaded = StabilityMonitor.load(tmp_path / 'monitor.npz')
+
+    np.testing.assert_array_equal(loaded.score_edges, monitor.score_edges)
+    pd.testing.assert_frame_equal(loaded.report(snapshots), monitor.report(snapshots))
+
+
+def test_snapshot_log(monitor, snapshots, tmp_path):
+    log = SnapshotLog(tmp_path / 'logs' / 'snapshots.jsonl')
+    assert log.read() == []
+
+    for isnapshot in snapshots:
+        log.append(isnapshot)
+
+    assert log.read() == snapshots
+    pd.testing.assert_frame_equal(monitor.report(log.read()), monitor.report(snapshots))
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data.transforms import simple_transform
+from src.data.transforms.pipeline import Impute, MaxOf, Pipeline, SignedLog1p
+
+
+# The deepcopy / DataFrame.apply transforms the Pipeline presets replaced
+def _signed_log1p(x):
+    return np.sign(x) * np.log(1 + np.abs(x))
+
+
+def _reference(df, drop=(), loggable=None, non_loggable=('age', 'SeriousDlqin2yrs'), max_past_due=False):
+    id_col = df['id']
+    df = df.drop(columns=['id', *drop])
+    df['NumberOfDependents'] = df['NumberOfDependents'].fillna(0)
+    df['MonthlyIncome'] = df['MonthlyIncome'].fillna(0)
+
+    if max_past_due:
+        df['MaxPastDue'] = df[simple_transform.PAST_DUE_VARS].max(axis=1)
+        df = df.drop(columns=simple_transform.PAST_DUE_VARS)
+
+    for icol in df.columns:
+        if (icol in loggable) if loggable is not None else (icol not in non_loggable):
+            df[icol] = _signed_log1p(df[icol].astype(np.float64))
+
+    return df, id_col
+
+
+REFERENCES = {
+    'drop_correlated_vars_impute_transform': dict(drop=simple_transform.CORRELATED_VARS, loggable=()),
+    'log_balance_vars_transform': dict(drop=simple_transform.CORRELATED_VARS,
+                                       loggable=('MonthlyIncome', 'DebtRatio', 'RevolvingUtilizationOfUnsecuredLines')),
+    'log_almost_all_vars_transform': dict(drop=simple_transform.CORRELATED_VARS),
+    'log_almost_all_vars_transform_v2': dict(),
+    'log_almost_all_vars_transform_v3': dict(max_past_due=True),
+}
+
+
+@pytest.mark.parametrize('name', sorted(REFERENCES))
+def test_presets_match_reference(synthetic_df, name):
+    res, id_col = getattr(simple_transform, name)(synthetic_df)
+    expected, expected_id = _reference(synthetic_df, **REFERENCES[name])
+
+    assert list(res.columns) == list(expected.columns)
+    pd.testing.assert_frame_equal(res, expected, check_dtype=False, rtol=0, atol=0)
+    assert id_col.equals(expected_id)
+
+
+def test_spec_roundtrip(synthetic_df):
+    pipeline = simple_transform.log_almost_all_vars_transform_v3
+    restored = Pipeline.from_spec(pipeline.to_spec())
+
+    pd.testing.assert_frame_equal(restored(synthetic_df)[0], pipeline(synthetic_df)[0])
+
+
+def test_max_of_sources_unaffected_by_later_steps(synthetic_df):
+    # A step on a kept source column must not also run inside the max
+    columns = ['age', 'NumberOfOpenCreditLinesAndLoans']
+    pipeline = Pipeline([MaxOf('M', columns, drop=False), SignedLog1p(['age']), Impute(['age'], 0)])
+
+    res, _ = pipeline(synthetic_df)
+
+    np.testing.assert_array_equal(res['M'], synthetic_df[columns].max(axis=1).to_numpy(dtype=np.float64))
+    np.testing.assert_array_equal(res['age'], _signed_log1p(synthetic_df['age'].to_numpy(dtype=np.float64)))
+
+
+def test_nested_max_of(synthetic_df):
+    pipeline = Pipeline([SignedLog1p(['DebtRatio']), MaxOf('M1', ['DebtRatio', 'age'], drop=False),
+                         MaxOf('M2', ['M1', 'MonthlyIncome'], drop=False), SignedLog1p(['M1'])])
+
+    res, _ = pipeline(synthetic_df)
+
+    m1 = np.fmax(_signed_log1p(synthetic_df['DebtRatio'].to_numpy()), synthetic_df['age'].to_numpy(np.float64))
+    np.testing.assert_array_equal(res['M2'], np.fmax(m1, synthetic_df['MonthlyIncome'].to_numpy()))
+    np.testing.assert_array_equal(res['M1'], _signed_log1p(m1))
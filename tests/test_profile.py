@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.utils.profile import QUANTILES, DataProfile, profile_df
+
+MOMENT_COLUMNS = ['N/A count', 'count', 'mean', 'std', 'skew', 'kurtosis', 'min', 'max']
+
+
+@pytest.fixture(scope='module')
+def df():
+    # 6.7% bad rate, and the bad rows sit higher up, so over-weighting them moves the overall quantiles
+    rng = np.random.default_rng(0)
+    n = 60_000
+    y = (rng.random(n) < 0.067).astype(np.int64)
+    x = rng.lognormal(0, 1, n) + 3 * y
+    z = np.where(rng.random(n) < 0.1, np.nan, rng.normal(0, 1, n) - y)
+
+    return pd.DataFrame({'id': np.arange(n), 'SeriousDlqin2yrs': y, 'x': x, 'z': z})
+
+
+def _expected_summary(df):
+    X = df[['x', 'z']]
+    return pd.DataFrame({'N/A count': X.isna().sum(), 'count': X.count(), 'mean': X.mean(), 'std': X.std(),
+                         'skew': X.skew(), 'kurtosis': X.kurt(), 'min': X.min(), 'max': X.max()})
+
+
+def test_moments_match_pandas(df):
+    profile = profile_df(df, chunksize=7_000)
+
+    pd.testing.assert_frame_equal(profile.summary()[MOMENT_COLUMNS], _expected_summary(df), check_names=False,
+                                  check_dtype=False, rtol=1e-9)
+    for ikey, igroup in df.groupby('SeriousDlqin2yrs'):
+        pd.testing.assert_frame_equal(profile.summary(str(ikey))[MOMENT_COLUMNS], _expected_summary(igroup),
+                                      check_names=False, check_dtype=False, rtol=1e-9)
+
+
+def test_quantiles_on_imbalanced_frame(df):
+    # Every row fits in the sample: the quantiles are exact
+    exact = profile_df(df, chunksize=7_000, sample_size=len(df)).summary()
+    for iq in QUANTILES:
+        np.testing.assert_allclose(exact[f"q{int(round(100 * iq)):02d}"], np.nanquantile(df[['x', 'z']], iq, axis=0),
+                                   rtol=1e-12)
+
+    # Each class is capped at 20k rows; the overall sample still has the bad rate of the frame, so the estimated
+    # quantiles sit at the right rank
+    sampled = profile_df(df, chunksize=7_000, sample_size=20_000).summary()
+    for icol in ('x', 'z'):
+        x = df[icol].dropna().to_numpy()
+        for iq in QUANTILES:
+            assert np.mean(x <= sampled.loc[icol, f"q{int(round(100 * iq)):02d}"]) == pytest.approx(iq, abs=0.01)
+
+
+def test_merge_matches_one_pass(df):
+    columns = ['x', 'z']
+    one_pass = DataProfile(columns, sample_size=len(df)).update(df)
+
+    parts = [DataProfile(columns, sample_size=len(df), seed=(0, i)).update(df.iloc[i * 20_000:(i + 1) * 20_000])
+             for i in range(3)]
+    merged = parts[0] + parts[1] + parts[2]
+
+    pd.testing.assert_frame_equal(merged.summary(), one_pass.summary(), rtol=1e-9)
+    for ikey in one_pass.classes:
+        pd.testing.assert_frame_equal(merged.summary(ikey), one_pass.summary(ikey), rtol=1e-9)
+
+    # Parts with the same seed would draw the same sample keys
+    with pytest.raises(AssertionError):
+        DataProfile(columns).update(df.iloc[:100]) + DataProfile(columns).update(df.iloc[100:200])
+
+
+def test_save_load(df, tmp_path):
+    profile = profile_df(df, chunksize=7_000, sample_size=5_000, seed=3)
+    profile.save(tmp_path / 'profile.npz')
+    loaded = DataProfile.load(tmp_path / 'profile.npz')
+
+    assert loaded.classes == profile.classes
+    pd.testing.assert_frame_equal(loaded.summary(), profile.summary())
+
+    # The loaded profile continues the key stream where the saved one stopped
+    assert loaded.rng.random() == profile.rng.random()
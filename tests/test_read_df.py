@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.benchmarks.synthetic import write_synthetic_csv
+from src.data.utils import read_df
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    return str(write_synthetic_csv(str(tmp_path / 'train.csv'), 5_000))
+
+
+def test_cached_read_matches_csv(csv_path):
+    expected = read_df(csv_path, cache=False)
+
+    for _ in range(2):  # Miss, then hit
+        res = read_df(csv_path)
+        pd.testing.assert_frame_equal(res, expected)
+
+
+def test_downcast_is_opt_in(csv_path):
+    read_df(csv_path)
+    res = read_df(csv_path, downcast=True)
+
+    assert res['age'].dtype == np.int8
+    assert res['MonthlyIncome'].dtype == np.float32
+    assert res['DebtRatio'].dtype == np.float64
+    assert read_df(csv_path)['age'].dtype == np.int64
+
+
+def test_unwritable_cache_falls_back_to_csv(csv_path, tmp_path):
+    # A path below a regular file can't be created, whoever runs the tests
+    blocker = tmp_path / 'blocker'
+    blocker.write_text('')
+
+    res = read_df(csv_path, cache_dir=str(blocker / 'cache'))
+    pd.testing.assert_frame_equal(res, read_df(csv_path, cache=False))
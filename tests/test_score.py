@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.benchmarks.synthetic import write_synthetic_csv
+from src.data.utils import get_xy
+from src.models.models import XGBoostClassifier
+from src.utils.score import main, score_csv
+
+
+@pytest.fixture(scope='module')
+def model(synthetic_df):
+    model = XGBoostClassifier(n_estimators=10, max_depth=2)
+    model.fit(*get_xy(synthetic_df))
+    return model
+
+
+@pytest.fixture(scope='module')
+def input_csv(tmp_path_factory):
+    return write_synthetic_csv(tmp_path_factory.mktemp('score') / 'input.csv', 5_000, seed=1)
+
+
+def test_parallel_matches_serial(model, input_csv, tmp_path):
+    serial = score_csv(input_csv, model, tmp_path / 'serial.csv', chunksize=700, n_jobs=1)
+    # max_in_flight=1 makes every chunk wait for the one before it to be written
+    parallel = score_csv(input_csv, model, tmp_path / 'parallel.csv', chunksize=700, n_jobs=2, max_in_flight=1)
+
+    assert serial['rows'] == parallel['rows'] == 5_000
+    assert (tmp_path / 'parallel.csv').read_bytes() == (tmp_path / 'serial.csv').read_bytes()
+
+    out = pd.read_csv(tmp_path / 'parallel.csv')
+    assert list(out.columns) == ['id', 'Probability']
+    np.testing.assert_array_equal(out['id'], np.arange(1, 5_001))
+
+
+def test_main_prints_report(model, input_csv, tmp_path, capsys):
+    model.save(tmp_path / 'model.joblib')
+
+    report = main([str(input_csv), str(tmp_path / 'out.csv'), '--model-class', 'XGBoostClassifier',
+                   '--model-path', str(tmp_path / 'model.joblib')])
+
+    assert report['rows'] == 5_000
+    assert capsys.readouterr().out.startswith("Scored 5000 rows")
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from src.data.transforms.woe_transform import WoETransformV2
+from src.data.utils import get_xy
+from src.models.models import StatsModelsLogisticRegression
+from src.models.scorecard import Scorecard
+
+
+@pytest.fixture(scope='module')
+def fitted(synthetic_df):
+    transform = WoETransformV2()
+    transform.woe_fit(synthetic_df, n_jobs=1)
+
+    # The spec has no special codes; give one column the 96/98 codes so that path is covered too
+    table = transform.compiled.tables['NumberOfTimes90DaysLate']
+    table['special_codes'] = np.array([96.0, 98.0])
+    table['special_woe'] = np.array([0.5, 1.5])
+
+    tdf, _ = transform(synthetic_df)
+    model = StatsModelsLogisticRegression()
+    model.fit(*get_xy(tdf))
+
+    return transform, model, tdf
+
+
+def test_predict_matches_model(synthetic_df, fitted):
+    transform, model, tdf = fitted
+    X, _ = get_xy(tdf)
+
+    assert synthetic_df['MonthlyIncome'].isna().any()
+    assert synthetic_df['NumberOfTimes90DaysLate'].isin([96, 98]).any()
+
+    scorecard = Scorecard.from_model(model, transform)
+    np.testing.assert_allclose(scorecard.predict(synthetic_df), model.predict(X), rtol=0, atol=1e-15)
+
+
+def test_save_load(synthetic_df, fitted, tmp_path):
+    transform, model, _ = fitted
+    scorecard = Scorecard.from_model(model, transform)
+
+    scorecard.save(tmp_path / 'scorecard.npz')
+    loaded = Scorecard.load(tmp_path / 'scorecard.npz')
+
+    assert loaded.intercept == scorecard.intercept
+    assert loaded.linear == scorecard.linear
+    np.testing.assert_array_equal(loaded.predict(synthetic_df), scorecard.predict(synthetic_df))
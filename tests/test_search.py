@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from src.models.fit import _fit_fold, cross_validate
+from src.models.search import HyperparameterSearch, IntUniform
+
+
+@pytest.fixture(scope='module')
+def df(synthetic_df):
+    return synthetic_df.drop(columns=['id']).iloc[:5000]
+
+
+def test_budget_param_in_space_is_rejected(df):
+    with pytest.raises(ValueError, match='n_estimators'):
+        HyperparameterSearch(df, 'XGBoostClassifier', {'n_estimators': [10, 20]})
+
+
+def test_successive_halving_resumes_from_log(df, tmp_path):
+    log_path = str(tmp_path / 'trials.jsonl')
+    space = {'max_depth': IntUniform(2, 4), 'learning_rate': [0.1, 0.3]}
+
+    kwargs = dict(n_jobs=1, log_path=log_path, early_stopping_rounds=5)
+    res = HyperparameterSearch(df, 'XGBoostClassifier', space, **kwargs).successive_halving(3, 5, 15)
+
+    assert [itrial['budget'] for itrial in res['trials']] == [5, 5, 5, 15]
+    assert res['best_params']['n_estimators'] == 15
+    assert 0.5 < res['best_auc'] < 1
+
+    resumed = HyperparameterSearch(df, 'XGBoostClassifier', space, **kwargs).successive_halving(3, 5, 15)
+    assert resumed['trials'] == res['trials']
+
+
+def test_early_stopping_holds_out_training_rows(df, monkeypatch):
+    import src.models.fit as fit
+
+    eval_rows = []
+
+    def _record(model_class, model_kwargs, X, y, train_index, test_index, early_stopping_rounds=None, dataset=None,
+                valid_index=None):
+        eval_rows.append((train_index, test_index, valid_index))
+        return _fit_fold(model_class, model_kwargs, X, y, train_index, test_index, early_stopping_rounds, dataset,
+                         valid_index)
+
+    monkeypatch.setattr(fit, '_fit_fold', _record)
+    cv = cross_validate(df, 3, 'XGBoostClassifier', model_kwargs={'n_estimators': 10}, n_jobs=1, random_state=0,
+                        early_stopping_rounds=3, refit=False, validation_fraction=0.2)
+
+    assert 0.5 < cv['oof_auc'] < 1
+    for itrain, itest, ivalid in eval_rows:
+        assert len(ivalid) > 0
+        assert not np.intersect1d(ivalid, itest).size
+        assert not np.intersect1d(ivalid, itrain).size
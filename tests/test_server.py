@@ -0,0 +1,92 @@
+import http.client
+import json
+import threading
+
+import numpy as np
+import pytest
+
+from src.serve.loadgen import run_load
+from src.serve.server import make_server
+
+
+class _AgeModel(object):
+    def predict(self, X):
+        return X['age'].to_numpy() / 1000
+
+
+@pytest.fixture
+def server():
+    server = make_server(_AgeModel(), port=0, max_batch_size=16, max_wait_ms=5.0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+def _request(server, method, path, payload=None):
+    conn = http.client.HTTPConnection(*server.server_address[:2])
+    conn.request(method, path, body=None if payload is None else json.dumps(payload).encode(),
+                 headers={'Content-Type': 'application/json'})
+    resp = conn.getresponse()
+    res = resp.status, json.loads(resp.read())
+    conn.close()
+
+    return res
+
+
+def test_loadgen(server):
+    res = run_load(*server.server_address[:2], n_clients=8, n_requests=50)
+
+    assert res['requests'] == 400
+    assert res['errors'] == 0
+
+    stats = _request(server, 'GET', '/metrics')[1]
+    assert stats['requests'] == 400
+    assert stats['batches'] < 400  # Concurrent requests were batched
+    assert stats['latency_p99_ms'] >= stats['latency_p50_ms']
+
+
+def test_scores_records(server):
+    status, res = _request(server, 'POST', '/score', {'records': [{'age': 40}, {'age': '55', 'MonthlyIncome': None}]})
+
+    assert status == 200
+    np.testing.assert_allclose(res['probability'], [0.04, 0.055])
+
+
+def test_bad_record_fails_alone(server):
+    results = {}
+
+    def _post(key, payload):
+        results[key] = _request(server, 'POST', '/score', payload)
+
+    # Sent together so they land in the same micro-batch window
+    threads = [threading.Thread(target=_post, args=(i, {'age': 30 + i})) for i in range(4)]
+    threads.append(threading.Thread(target=_post, args=('bad', {'age': 'abc'})))
+    for ithread in threads:
+        ithread.start()
+    for ithread in threads:
+        ithread.join()
+
+    assert results['bad'][0] == 400
+    assert 'age' in results['bad'][1]['error']
+    for i in range(4):
+        assert results[i] == (200, {'probability': [(30 + i) / 1000]})
+
+
+def test_failing_batch_is_retried_per_request(server):
+    class _Picky(object):
+        def predict(self, X):
+            if (X['age'] < 0).any():
+                raise ValueError("negative age")
+            return X['age'].to_numpy() / 1000
+
+    server.batcher.model = _Picky()
+    futures = [server.batcher.submit([{'age': iage}]) for iage in (20, -1, 30)]
+
+    assert futures[0].result(timeout=5) == [0.02]
+    assert futures[2].result(timeout=5) == [0.03]
+    with pytest.raises(ValueError):
+        futures[1].result(timeout=5)
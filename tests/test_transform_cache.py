@@ -0,0 +1,106 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.benchmarks.synthetic import write_synthetic_csv
+from src.data.transforms.cache import CachedTransform, transform_state
+from src.data.transforms.simple_transform import log_almost_all_vars_transform_v3
+from src.data.utils import read_df
+from src.utils.misc import fingerprint
+
+
+def _scale(k):
+    def transform(df):
+        return df[['age']] * k, df['id']
+
+    return transform
+
+
+def _offset(df, k=1):
+    return df[['age']] + k, df['id']
+
+
+class _Opaque(object):
+    def __call__(self, df):
+        return df[['age']], df['id']
+
+
+@pytest.fixture
+def df(synthetic_df):
+    return synthetic_df.iloc[:1000]
+
+
+def test_hit_returns_transform_output(df, tmp_path):
+    cached = CachedTransform(log_almost_all_vars_transform_v3, str(tmp_path))
+    expected, expected_id = log_almost_all_vars_transform_v3(df)
+
+    for _ in range(2):  # Miss, then hit
+        res, id_col = cached(df)
+        pd.testing.assert_frame_equal(res, expected)
+        pd.testing.assert_series_equal(id_col, expected_id)
+
+    assert len(cached.entries()) == 1
+
+
+def test_closure_values_are_keyed(df, tmp_path):
+    CachedTransform(_scale(1), str(tmp_path))(df)
+    res, _ = CachedTransform(_scale(10), str(tmp_path))(df)
+
+    np.testing.assert_array_equal(res['age'], df['age'] * 10)
+
+
+def test_defaults_are_keyed():
+    def offset2(df, k=2):
+        return df[['age']] + k, df['id']
+
+    offset2.__qualname__, offset2.__module__ = _offset.__qualname__, _offset.__module__
+    assert fingerprint(*transform_state(_offset)) != fingerprint(*transform_state(offset2))
+
+
+def test_unfingerprintable_state_needs_version(df, tmp_path):
+    with pytest.raises(ValueError, match='version='):
+        CachedTransform(_Opaque(), str(tmp_path))
+
+    res, _ = CachedTransform(_Opaque(), str(tmp_path), version='v1')(df)
+    pd.testing.assert_frame_equal(res, df[['age']])
+
+
+def test_index_is_keyed(df, tmp_path):
+    cached = CachedTransform(log_almost_all_vars_transform_v3, str(tmp_path))
+    cached(df)
+
+    shifted = df.set_axis(df.index + 100)
+    res, id_col = cached(shifted)
+
+    assert res.index.equals(shifted.index)
+    assert id_col.index.equals(shifted.index)
+
+
+def test_from_csv(tmp_path):
+    path = write_synthetic_csv(str(tmp_path / 'train.csv'), 2000)
+    cached = CachedTransform(log_almost_all_vars_transform_v3, str(tmp_path / 'cache'))
+
+    expected, _ = log_almost_all_vars_transform_v3(read_df(path, cache=False))
+    for _ in range(2):
+        pd.testing.assert_frame_equal(cached.from_csv(path)[0], expected)
+
+    assert len(cached.entries()) == 1
+
+
+def test_evicts_least_recently_used(synthetic_df, tmp_path):
+    cached = CachedTransform(log_almost_all_vars_transform_v3, str(tmp_path))
+    chunks = [synthetic_df.iloc[i * 1000:(i + 1) * 1000] for i in range(3)]
+
+    cached(chunks[0])
+    entry_bytes = cached.entries()[0][1]
+    cached.max_bytes = 2 * entry_bytes + entry_bytes // 2
+
+    cached(chunks[1])
+    first = cached._entry_dir(fingerprint(chunks[0].index, chunks[0]))
+    os.utime(first, ns=(0, 0))  # The first chunk is now the least recently used
+    cached(chunks[2])
+
+    assert len(cached.entries()) == 2
+    assert not os.path.exists(first)
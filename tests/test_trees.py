@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from src.models.models import LightGBMClassifier, XGBoostClassifier
+from src.models.trees import CompiledTrees, compile_lightgbm, compile_xgboost
+
+
+@pytest.fixture(scope='module')
+def xy(synthetic_df):
+    X = synthetic_df.drop(columns=['id', 'SeriousDlqin2yrs'])
+    return X, synthetic_df['SeriousDlqin2yrs']
+
+
+@pytest.fixture(scope='module')
+def xgboost_model(xy):
+    model = XGBoostClassifier(n_estimators=30, max_depth=4)
+    model.fit(*xy)
+    return model
+
+
+@pytest.fixture(scope='module')
+def lightgbm_model(xy):
+    model = LightGBMClassifier(n_estimators=30, num_leaves=15, verbose=-1)
+    model.fit(*xy)
+    return model
+
+
+def test_xgboost_matches_predict_proba(xy, xgboost_model):
+    X, _ = xy
+    # XGBoost reports float32 probabilities
+    np.testing.assert_allclose(compile_xgboost(xgboost_model).predict(X), xgboost_model.predict(X),
+                               rtol=0, atol=1e-6)
+
+
+def test_lightgbm_matches_predict_proba(xy, lightgbm_model):
+    X, _ = xy
+    np.testing.assert_allclose(compile_lightgbm(lightgbm_model).predict(X), lightgbm_model.predict(X),
+                               rtol=0, atol=1e-12)
+
+
+def test_missing_values(xy, xgboost_model, lightgbm_model):
+    X, _ = xy
+    X = X.iloc[:200].copy()
+    X.iloc[::3, :] = np.nan
+
+    for imodel, icompile, iatol in ((xgboost_model, compile_xgboost, 1e-6), (lightgbm_model, compile_lightgbm, 1e-12)):
+        np.testing.assert_allclose(icompile(imodel).predict(X), imodel.predict(X), rtol=0, atol=iatol)
+
+
+def test_save_load(tmp_path, xy, lightgbm_model):
+    X, _ = xy
+    compiled = compile_lightgbm(lightgbm_model)
+
+    path = str(tmp_path / 'trees.npz')
+    compiled.save(path)
+
+    np.testing.assert_array_equal(CompiledTrees.load(path).predict(X), compiled.predict(X))
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from src.data.transforms.woe_compiled import CompiledWoETable, lookup_woe
+from src.data.transforms.woe_transform import WoETransformV2, fit_binnings
+
+
+@pytest.fixture(scope='module')
+def binnings(synthetic_df):
+    return fit_binnings(synthetic_df, WoETransformV2.spec, n_jobs=1)
+
+
+def test_lookup_matches_optbinning(synthetic_df, binnings):
+    compiled = CompiledWoETable.from_binnings(binnings)
+
+    for icol, ioptb in binnings.items():
+        x = synthetic_df[icol].to_numpy(dtype=np.float64)
+        expected = ioptb.transform(x, metric='woe')
+        np.testing.assert_allclose(lookup_woe(compiled.tables[icol], x), expected, rtol=0, atol=1e-12)
+
+
+def test_missing_values_get_missing_woe(binnings):
+    compiled = CompiledWoETable.from_binnings(binnings)
+
+    x = np.array([np.nan, 1.0, np.nan])
+    res = lookup_woe(compiled.tables['MonthlyIncome'], x)
+    assert res[0] == res[2] == compiled.tables['MonthlyIncome']['missing_woe']
+
+
+def test_transform_keeps_untouched_columns(synthetic_df, binnings):
+    compiled = CompiledWoETable.from_binnings(binnings)
+
+    res = compiled.transform(synthetic_df, drop_columns=['NumberOfTimes90DaysLate'])
+    assert 'NumberOfTimes90DaysLate' not in res.columns
+    assert (res['id'] == synthetic_df['id']).all()
+    assert res.index.equals(synthetic_df.index)
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from src.data.transforms.woe_stats import N_FINE_PREBINS, WoEStats
+from src.data.transforms.woe_transform import WoETransformV2, fit_binnings
+
+SPEC = WoETransformV2.spec
+CONTINUOUS = ['DebtRatio', 'MonthlyIncome', 'RevolvingUtilizationOfUnsecuredLines']
+
+
+@pytest.fixture(scope='module')
+def stats(synthetic_df):
+    return WoEStats.from_sample(synthetic_df, SPEC).update(synthetic_df)
+
+
+@pytest.fixture(scope='module')
+def binnings(synthetic_df):
+    return fit_binnings(synthetic_df, SPEC, n_jobs=1)
+
+
+def _assert_stats_equal(result, expected):
+    assert result.ycol == expected.ycol
+    assert list(result.columns) == list(expected.columns)
+
+    for xcol, istats in expected.columns.items():
+        jstats = result.columns[xcol]
+        for ikey in ('edges', 'events', 'totals', 'minimum'):
+            np.testing.assert_array_equal(getattr(jstats, ikey), getattr(istats, ikey))
+        assert (jstats.missing_events, jstats.missing_totals) == (istats.missing_events, istats.missing_totals)
+
+
+def test_chunks_merge_to_one_update(synthetic_df, stats):
+    parts = [stats.empty().update(synthetic_df.iloc[i:i + 3_000]) for i in range(0, len(synthetic_df), 3_000)]
+
+    merged = parts[0]
+    for ipart in parts[1:]:
+        merged = merged + ipart
+
+    assert merged.n_rows == len(synthetic_df)
+    _assert_stats_equal(merged, stats)
+
+
+def test_save_load(stats, tmp_path):
+    stats.save(tmp_path / 'stats.npz')
+    _assert_stats_equal(WoEStats.load(tmp_path / 'stats.npz'), stats)
+
+
+def test_solve_matches_fit_binnings(synthetic_df, stats, binnings):
+    solved = stats.solve(SPEC)
+
+    for xcol in SPEC:
+        if xcol in CONTINUOUS:
+            continue
+
+        # User splits, or few enough distinct values that every value has its own pre-bin
+        assert 'user_splits' in SPEC[xcol] or synthetic_df[xcol].nunique() <= N_FINE_PREBINS
+
+        expected, result = binnings[xcol].binning_table.build(), solved[xcol].binning_table.build()
+        np.testing.assert_array_equal(result['Count'], expected['Count'])
+        np.testing.assert_array_equal(result['Event'], expected['Event'])
+
+        x = synthetic_df[xcol].to_numpy(dtype=np.float64)
+        np.testing.assert_allclose(solved[xcol].transform(x, metric='woe'),
+                                   binnings[xcol].transform(x, metric='woe'), rtol=0, atol=1e-12)
+
+
+def test_solve_continuous_drift_is_bounded(stats, binnings):
+    solved = stats.solve(SPEC)
+
+    for xcol in CONTINUOUS:
+        # Splits fall on pre-bin edges, and the binning keeps nearly all of the raw fit's information value
+        assert np.isin(solved[xcol].splits, stats.columns[xcol].edges).all()
+
+        expected_iv = binnings[xcol].binning_table.build()['IV'].iloc[-1]
+        result_iv = solved[xcol].binning_table.build()['IV'].iloc[-1]
+        assert abs(result_iv / expected_iv - 1) < 0.05